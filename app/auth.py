@@ -1,24 +1,48 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 from app.database import get_db
-from app import models, schemas
+from app import models, schemas, passwords
+from app.cache import TTLCache
+from app.passwords import pwd_context
+from app.refresh_tokens import revoked_families
+from app.structured_logging import SAMPLED
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Access-токен короткий: дальше клиент обменивает refresh-токен (app.refresh_tokens)
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+
+# Кэш пользователей по id из токена: запрос с токеном не читает users.
+# Изменения пользователя через ORM сбрасывают запись после commit в этом воркере;
+# в остальных воркерах деактивированный пользователь теряет доступ не позже чем через TTL.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
+
+user_cache = TTLCache(USER_CACHE_TTL, max_entries=USER_CACHE_SIZE, metric_key="auth.users")
 
+# В кэше - значения колонок без хэша пароля; его читают только вход и смена пароля
+_USER_COLUMNS = [
+    column.key for column in models.User.__table__.columns if column.key != "hashed_password"
+]
+_CHANGED_USERS = "auth.changed_users"
+
+# Синхронные версии - для скриптов (init_db, generate_dataset); роуты используют app.passwords
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -35,34 +59,116 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db: Session, email: str, password: str):
+def token_data(user: models.User, family_id: Optional[str] = None) -> dict:
+    """
+    Данные токена: id пользователя в sub, роль - для клиента (права проверяются по записи),
+    sid - цепочка refresh-токенов входа: ее отзыв закрывает и выданные по ней access-токены
+    """
+    data = {"sub": str(user.id), "role": user.role.value if user.role else None}
+    if family_id:
+        data["sid"] = family_id
+    return data
+
+def _snapshot(user: models.User) -> dict:
+    return {key: getattr(user, key) for key in _USER_COLUMNS}
+
+def cache_user(user: models.User):
+    """Положить загруженного пользователя в кэш (например, сразу после входа)"""
+    user_cache.get_or_load(user.id, lambda: _snapshot(user))
+
+def _user_by_id(db: Session, user_id: int) -> Optional[models.User]:
+    loaded = {}
+
+    def load():
+        user = loaded["user"] = db.get(models.User, user_id)
+        return _snapshot(user) if user is not None else None
+
+    snapshot = user_cache.get_or_load(user_id, load)
+    if snapshot is None:
+        return None
+    if "user" in loaded:
+        return loaded["user"]
+    # Объект из кэша присоединяется к сессии запроса без SELECT: роуты меняют
+    # и сохраняют его как загруженный; незакэшированные атрибуты догрузятся при обращении
+    user = models.User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def _user_from_token(db: Session, token: str) -> Optional[models.User]:
     try:
-        user = db.query(models.User).filter(models.User.email == email).first()
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    if subject is None:
+        return None
+    # Вход отозван (выход или повторное использование refresh-токена); проверка без базы
+    if payload.get("sid") in revoked_families:
+        return None
+    if subject.isdigit():
+        return _user_by_id(db, int(subject))
+    # Токены, выданные до перехода на id (sub - email), живут не дольше ACCESS_TOKEN_EXPIRE_MINUTES
+    return db.query(models.User).filter(models.User.email == subject).first()
+
+def _collect_changed_users(session, flush_context, instances):
+    changed = session.info.setdefault(_CHANGED_USERS, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User) and inspect(obj).key is not None:
+            changed.add(inspect(obj).key[1][0])
+
+def _invalidate_changed_users(session):
+    changed = session.info.pop(_CHANGED_USERS, None)
+    if changed:
+        user_cache.delete(*changed)
+
+def _forget_changed_users(session, *args):
+    session.info.pop(_CHANGED_USERS, None)
+
+def install_user_cache():
+    """Сбрасывать кэш пользователей после commit изменений users через ORM"""
+    if not event.contains(Session, "before_flush", _collect_changed_users):
+        event.listen(Session, "before_flush", _collect_changed_users)
+        event.listen(Session, "after_commit", _invalidate_changed_users)
+        event.listen(Session, "after_rollback", _forget_changed_users)
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    try:
+        result = await db.execute(select(models.User).where(models.User.email == email))
+        user = result.scalars().first()
         if not user:
-            print(f"User not found: {email}")
+            logger.info("Пользователь не найден", extra={"email": email})
             return False
         if not user.hashed_password:
-            print(f"User {email} has no password hash")
+            logger.warning("У пользователя нет хэша пароля", extra={"email": email})
             return False
         try:
-            is_valid = verify_password(password, user.hashed_password)
+            is_valid, new_hash = await passwords.verify_and_update(password, user.hashed_password)
             if not is_valid:
-                print(f"Invalid password for user: {email}")
+                logger.info("Неверный пароль", extra={"email": email})
                 return False
-            print(f"User {email} authenticated successfully")
+            if new_hash:
+                # Стоимость bcrypt изменилась (BCRYPT_ROUNDS) - сохраняем хэш с текущей
+                user.hashed_password = new_hash
+                await db.commit()
+                await db.refresh(user)
+                logger.info("Хэш пароля пересохранен с текущей стоимостью bcrypt", extra={"user_id": user.id})
+            logger.info("Пароль проверен", extra={"user_id": user.id, **SAMPLED})
             return user
-        except Exception as e:
-            print(f"Password verification error for {email}: {e}")
-            import traceback
-            print(traceback.format_exc())
+        except HTTPException:
+            # Очередь пула паролей переполнена (503)
+            raise
+        except Exception:
+            logger.exception("Ошибка проверки пароля", extra={"email": email})
             return False
-    except Exception as e:
-        print(f"Database error during authentication for {email}: {e}")
-        import traceback
-        print(traceback.format_exc())
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Ошибка базы при аутентификации", extra={"email": email})
         return False
 
-async def get_current_user(
+# Обычные def: чтение пользователя через синхронную сессию (промах кэша, merge, токены
+# с email) FastAPI выполняет в пуле потоков, а не в цикле событий асинхронных роутов
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
@@ -71,14 +177,7 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = _user_from_token(db, token)
     if user is None:
         raise credentials_exception
     return user
@@ -90,8 +189,8 @@ async def get_current_active_user(
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-async def get_current_user_optional(
-    token: Optional[str] = Depends(oauth2_scheme),
+def get_current_user_optional(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
     db: Session = Depends(get_db)
 ) -> Optional[models.User]:
     """
@@ -101,15 +200,7 @@ async def get_current_user_optional(
     if not token:
         return None
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-    except JWTError:
-        return None
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = _user_from_token(db, token)
     if user is None or user.is_active is False:
         return None
     return user
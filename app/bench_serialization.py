@@ -0,0 +1,124 @@
+"""
+Микробенчмарк сериализации ответа: стоимость одной строки для страницы из 100 строк.
+
+Сравниваются три пути для товаров (ProductResponse) и постов блога (BlogPostResponse):
+  - legacy: model_validate(...).model_dump() на строку, затем валидация и сериализация
+    FastAPI по response_model (как было в обработчиках, которые патчили словари)
+  - response_model: ORM-объекты отдаются FastAPI, он валидирует и сериализует их сам
+  - single_pass: app.serialization.dump_json - одна валидация и сразу JSON-байты
+
+База данных не нужна: строки собираются в памяти из transient ORM-объектов.
+
+Запуск:
+    python -m app.bench_serialization --rows 100 --repeat 200
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import List
+
+def build_products(rows: int) -> list:
+    from app import models
+    from app.models import UserRole
+
+    now = datetime.now(timezone.utc)
+    seller = models.User(
+        id=1, email="seller@example.com", phone="+996555000001", full_name="Seller",
+        role=UserRole.PROFESSIONAL, is_active=True, rating=4.9, total_reviews=12, created_at=now
+    )
+    category = models.ProductCategory(id=1, slug="care", name="Care", is_active=True, created_at=now)
+    products = []
+    for i in range(rows):
+        product = models.Product(
+            id=i + 1, seller_id=1, category_id=1, name=f"Product {i}", name_ru=f"Товар {i}",
+            description="Описание товара " * 5, price=100 + i, currency="KGS", stock_qty=10,
+            is_active=True, created_at=now, updated_at=now
+        )
+        product.seller = seller
+        product.category = category
+        product.images = [
+            models.ProductImage(id=i * 3 + n, product_id=i + 1, image_url=f"/img/{i}-{n}.jpg", sort_order=n, created_at=now)
+            for n in range(3)
+        ]
+        products.append(product)
+    return products
+
+def build_posts(rows: int) -> list:
+    from app import models
+    from app.models import UserRole, BlogPostStatus
+
+    now = datetime.now(timezone.utc)
+    author = models.User(
+        id=1, email="author@example.com", phone="+996555000002", full_name="Author",
+        role=UserRole.CLIENT, is_active=True, rating=0.0, total_reviews=0, created_at=now
+    )
+    category = models.BlogCategory(id=1, slug="tips", name="Tips", is_active=True, created_at=now)
+    tags = [models.BlogTag(id=n + 1, name=f"tag{n}", created_at=now) for n in range(3)]
+    posts = []
+    for i in range(rows):
+        post = models.BlogPost(
+            id=i + 1, author_id=1, category_id=1, title=f"Post {i}", title_ru=f"Пост {i}",
+            content="Текст поста " * 50, status=BlogPostStatus.PUBLISHED,
+            published_at=now, created_at=now, updated_at=now
+        )
+        post.author = author
+        post.category = category
+        post.tags = [models.BlogPostTag(post_id=i + 1, tag_id=tag.id, tag=tag) for tag in tags]
+        posts.append(post)
+    return posts
+
+def fastapi_serialize(field, content):
+    """Валидация и сериализация ответа так, как это делает FastAPI по response_model"""
+    from fastapi.routing import serialize_response
+    return asyncio.run(serialize_response(field=field, response_content=content, dump_json=True))
+
+def measure(function, repeat: int) -> float:
+    function()  # прогрев: сборка валидаторов и кэшей
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    from fastapi.utils import create_model_field
+    from app import schemas
+    from app.routers.blog import post_data, post_response
+    from app.serialization import dump_json
+
+    products = build_products(args.rows)
+    posts = build_posts(args.rows)
+    product_field = create_model_field("Response", List[schemas.ProductResponse], mode="serialization")
+    post_field = create_model_field("Response", List[schemas.BlogPostResponse], mode="serialization")
+
+    cases = {
+        "products": {
+            "legacy": lambda: fastapi_serialize(
+                product_field, [schemas.ProductResponse.model_validate(p).model_dump() for p in products]
+            ),
+            "response_model": lambda: fastapi_serialize(product_field, products),
+            "single_pass": lambda: dump_json(List[schemas.ProductResponse], products),
+        },
+        "blog_posts": {
+            "legacy": lambda: fastapi_serialize(post_field, [post_response(p) for p in posts]),
+            "response_model": lambda: fastapi_serialize(post_field, [post_data(p) for p in posts]),
+            "single_pass": lambda: dump_json(List[schemas.BlogPostResponse], [post_data(p) for p in posts]),
+        },
+    }
+
+    print(f"Строк на страницу: {args.rows}, повторов: {args.repeat}\n")
+    print(f"{'Ответ':<12} {'Путь':<16} {'мкс/стр.':>10} {'мкс/строка':>12} {'x':>6}")
+    for name, paths in cases.items():
+        timings = {path: measure(function, args.repeat) for path, function in paths.items()}
+        baseline = timings["legacy"]
+        for path, seconds in timings.items():
+            print(f"{name:<12} {path:<16} {seconds * 1e6:>10.0f} {seconds * 1e6 / args.rows:>12.2f} "
+                  f"{baseline / seconds:>6.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Кэш справочных данных в памяти процесса: TTL, теги для инвалидации и
+схлопывание одновременных промахов (single-flight). С max_entries кэш
+ограничен по размеру и вытесняет давно не читанные записи (LRU).
+
+Значения должны быть готовыми к ответу данными (dict/list или заранее сериализованное
+тело app.compression.PrecompressedBody), а не ORM-объектами -
+сессия, в которой они загружены, закрывается после запроса. Кэш локален для
+воркера: после записи админ-роут инвалидирует теги в своем процессе, остальные
+воркеры увидят изменения не позже чем через TTL.
+
+Загрузчики читают с основной базы (get_db), а не с реплики: промах после инвалидации
+обычно приходится на анонимный запрос, который не закреплен за основной базой, и
+отстающая реплика вернула бы в кэш данные до записи на весь TTL. Сессия подключается
+к базе только при первом запросе, поэтому попадания в кэш базу не трогают.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Iterable, Optional
+
+from prometheus_client import Counter
+
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+
+CACHE_REQUESTS = Counter(
+    "reference_cache_requests_total", "Обращения к кэшу справочных данных",
+    ["key", "result"]
+)
+
+class TTLCache:
+    """Потокобезопасный кэш с TTL и тегами"""
+
+    def __init__(self, default_ttl: float = REFERENCE_CACHE_TTL, max_entries: Optional[int] = None,
+                 metric_key: Optional[str] = None):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        # Метка key в метрике: у кэша с неограниченным набором ключей (id) - одна на весь кэш
+        self.metric_key = metric_key
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value), от давно читанных к недавним
+        self._tags = {}  # tag -> set(keys)
+        self._inflight = {}  # key -> Future загрузки
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # промахи, дождавшиеся чужой загрузки
+        self.evictions = 0
+
+    def _count(self, key, result: str):
+        CACHE_REQUESTS.labels(self.metric_key or str(key), result).inc()
+
+    def get_or_load(self, key: str, loader: Callable, ttl: float = None, tags: Iterable[str] = ()):
+        """Вернуть значение из кэша или загрузить его; одновременные промахи ждут одну загрузку"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                self._count(key, "hit")
+                return entry[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                generation = self._generation
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            self._count(key, "coalesced")
+            return future.result()
+        self._count(key, "miss")
+
+        try:
+            value = loader()
+        except BaseException as error:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(error)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            # Если во время загрузки была инвалидация, значение могло устареть - не сохраняем
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + (ttl or self.default_ttl), value)
+                self._entries.move_to_end(key)
+                for tag in tags:
+                    self._tags.setdefault(tag, set()).add(key)
+                self._evict()
+        future.set_result(value)
+        return value
+
+    def _evict(self):
+        if self.max_entries is None:
+            return
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            for keys in self._tags.values():
+                keys.discard(key)
+
+    def invalidate(self, *tags: str):
+        """Удалить все записи с любым из тегов"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._entries.pop(key, None)
+
+    def delete(self, *keys):
+        """Удалить записи по ключам"""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self.hits = 0
+            self.misses = 0
+            self.coalesced = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "ttl_seconds": self.default_ttl,
+                "max_entries": self.max_entries,
+                "tags": {tag: sorted(keys) for tag, keys in self._tags.items()},
+            }
+
+reference_cache = TTLCache()
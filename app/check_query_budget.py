@@ -0,0 +1,332 @@
+"""
+Проверка бюджета SQL-запросов для GET-эндпоинтов роутеров.
+
+Каждый эндпоинт вызывается дважды: на базе, где у каждой сущности одна строка,
+и после добавления еще --rows строк. Число SQL-запросов не должно расти вместе
+с размером ответа (иначе это N+1) и не должно превышать бюджет из QUERY_BUDGETS.
+При нарушении печатаются формы запросов, которые повторялись.
+
+Запуск:
+    python -m app.check_query_budget --rows 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+# Бюджеты: (путь, роль, максимум SQL-запросов на один вызов).
+# Роль None - анонимный запрос; в путь подставляются id из seed().
+# Пользователь по токену берется из кэша (app.auth.user_cache), вход кладет его туда -
+# авторизованный запрос не читает users.
+QUERY_BUDGETS = [
+    ("/api/auth/me", "client", 0),
+    ("/api/users/", None, 1),
+    ("/api/users/professionals?min_rating=0", None, 1),
+    ("/api/users/{professional_id}", None, 1),
+    ("/api/services/", None, 1),
+    ("/api/services/{service_id}", None, 1),
+    ("/api/services/categories", None, 0),
+    ("/api/bookings/", "client", 1),
+    ("/api/bookings/{booking_id}", "client", 3),
+    ("/api/reviews/", None, 1),
+    ("/api/reviews/{review_id}", None, 1),
+    ("/api/admin/stats", "admin", 1),
+    ("/api/admin/analytics/timeseries?granularity=week", "admin", 1),
+    ("/api/admin/users", "admin", 1),
+    ("/api/admin/users/{client_id}", "admin", 1),
+    ("/api/admin/services", "admin", 1),
+    ("/api/admin/bookings", "admin", 1),
+    ("/api/admin/reviews", "admin", 1),
+    ("/api/professional/stats", "professional", 2),
+    ("/api/professional/services", "professional", 1),
+    ("/api/professional/bookings", "professional", 1),
+    ("/api/professional/reviews", "professional", 1),
+    ("/api/client/stats", "client", 2),
+    ("/api/client/bookings", "client", 1),
+    ("/api/client/bookings/{booking_id}", "client", 3),
+    ("/api/client/reviews", "client", 1),
+    ("/api/client/favorites/professionals", "client", 1),
+    ("/api/tracker/public", None, 0),
+    ("/api/tracker/public/programs", None, 2),
+    ("/api/tracker/public/programs/{template_id}/demo-day", None, 3),
+    ("/api/tracker/programs/current", "client", 2),
+    ("/api/tracker/days/current", "client", 5),
+    ("/api/tracker/days/1", "client", 5),
+    ("/api/tracker/progress", "client", 2),
+    ("/api/admin/tracker/templates", "admin", 1),
+    ("/api/admin/tracker/habits", "admin", 2),
+    ("/api/admin/tracker/templates/{template_id}/days/simple", "admin", 1),
+    ("/api/admin/tracker/templates/{template_id}/days", "admin", 2),
+    ("/api/blog/categories", None, 1),
+    ("/api/blog/tags", None, 1),
+    ("/api/blog/posts?limit=100", "client", 2),
+    ("/api/blog/posts/{post_id}", "client", 2),
+    ("/api/admin/blog/categories", "admin", 1),
+    ("/api/admin/blog/tags", "admin", 1),
+    ("/api/admin/blog/posts", "admin", 2),
+    ("/api/news/categories", None, 1),
+    ("/api/news/sources", None, 1),
+    ("/api/news/items?limit=100", None, 1),
+    ("/api/news/items/{news_item_id}", None, 1),
+    ("/api/admin/news/sources", "admin", 1),
+    ("/api/admin/news/categories", "admin", 1),
+    ("/api/admin/news/items", "admin", 1),
+    ("/api/products/categories", None, 1),
+    ("/api/products/products?limit=100", None, 2),
+    ("/api/products/products/{product_id}", None, 2),
+    ("/api/products/sellers", None, 1),
+    ("/api/professional/products/products", "professional", 2),
+    ("/api/professional/products/orders", "professional", 3),
+    ("/api/product-orders/orders", "client", 3),
+    ("/api/admin/products/products", "admin", 2),
+    ("/api/admin/products/categories", "admin", 1),
+]
+
+PASSWORD = "budget-password"
+
+def seed(db, password_hash: str) -> dict:
+    """Базовый набор: администратор, клиент, мастер и по одной строке каждой сущности"""
+    from app import models
+    from app.models import UserRole, ProgramStatus, DayStatus
+
+    users = {}
+    for role in (UserRole.ADMIN, UserRole.CLIENT, UserRole.PROFESSIONAL):
+        user = models.User(
+            email=f"{role.value}@budget.example.com", phone=f"+996000000{len(users)}",
+            full_name=f"Budget {role.value}", hashed_password=password_hash, role=role, rating=4.9
+        )
+        db.add(user)
+        users[role] = user
+
+    template = models.TrackerProgramTemplate(name="Budget program", days_count=30, is_active=True)
+    db.add(template)
+    db.flush()
+
+    first_day = models.TrackerProgramDay(program_template_id=template.id, day_number=1, focus_text="Day 1")
+    user_program = models.TrackerUserProgram(
+        user_id=users[UserRole.CLIENT].id, program_template_id=template.id, status=ProgramStatus.ACTIVE
+    )
+    db.add_all([first_day, user_program])
+    db.flush()
+    user_day = models.TrackerUserDay(
+        user_program_id=user_program.id, day_number=1, status=DayStatus.OPEN,
+        opened_at=datetime.now(timezone.utc)
+    )
+    db.add(user_day)
+    db.flush()
+
+    context = {
+        "users": users,
+        "template": template,
+        "first_day": first_day,
+        "user_day": user_day,
+        "admin_id": users[UserRole.ADMIN].id,
+        "client_id": users[UserRole.CLIENT].id,
+        "professional_id": users[UserRole.PROFESSIONAL].id,
+        "template_id": template.id,
+    }
+    ids = grow(db, context, 0, 1, password_hash)
+    db.commit()
+    context.update(ids)
+    return context
+
+def grow(db, context: dict, start: int, count: int, password_hash: str) -> dict:
+    """Добавить count строк каждой сущности; у каждой строки свои связанные объекты"""
+    from app import models
+    from app.models import (
+        UserRole, ServiceCategory, BookingStatus, HabitCategory, BlogPostStatus,
+        NewsItemStatus, ProductOrderStatus
+    )
+
+    now = datetime.now(timezone.utc)
+    client = context["users"][UserRole.CLIENT]
+    professional = context["users"][UserRole.PROFESSIONAL]
+    ids = {}
+
+    for i in range(start, start + count):
+        seller = models.User(
+            email=f"pro{i}@budget.example.com", phone=f"+99670{i:07d}", full_name=f"Pro {i}",
+            hashed_password=password_hash, role=UserRole.PROFESSIONAL, rating=4.9
+        )
+        db.add(seller)
+        db.flush()
+
+        service = models.Service(
+            name=f"Service {i}", category=ServiceCategory.NAIL_CARE, price=1000.0,
+            duration_minutes=60, professional_id=seller.id
+        )
+        own_service = models.Service(
+            name=f"Own service {i}", category=ServiceCategory.BEAUTY, price=1500.0,
+            duration_minutes=90, professional_id=professional.id
+        )
+        db.add_all([service, own_service])
+        db.flush()
+
+        booking = models.Booking(
+            client_id=client.id, professional_id=professional.id, service_id=own_service.id,
+            booking_date=now + timedelta(days=1, minutes=i), address="Бишкек", phone="+996555000000",
+            status=BookingStatus.COMPLETED, total_price=1500.0
+        )
+        db.add(booking)
+        db.flush()
+        review = models.Review(
+            booking_id=booking.id, client_id=client.id, professional_id=professional.id, rating=5
+        )
+
+        blog_category = models.BlogCategory(slug=f"blog-{i}", name=f"Blog {i}")
+        tag = models.BlogTag(name=f"tag-{i}")
+        news_source = models.NewsSource(name=f"Source {i}", base_url=f"https://source{i}.test")
+        news_category = models.NewsCategory(slug=f"news-{i}", name=f"News {i}")
+        product_category = models.ProductCategory(slug=f"product-{i}", name=f"Product {i}")
+        template = models.TrackerProgramTemplate(name=f"Template {i}", days_count=30, is_active=True)
+        habit = models.TrackerHabit(category=HabitCategory.FACE, title=f"Habit {i}")
+        db.add_all([review, blog_category, tag, news_source, news_category, product_category, template, habit])
+        db.flush()
+
+        post = models.BlogPost(
+            author_id=seller.id, category_id=blog_category.id, title=f"Post {i}", content="...",
+            status=BlogPostStatus.PUBLISHED, published_at=now - timedelta(minutes=i)
+        )
+        news_item = models.NewsItem(
+            source_id=news_source.id, category_id=news_category.id, title=f"News {i}",
+            original_url=f"https://source{i}.test/{i}", status=NewsItemStatus.ACTIVE,
+            published_at=now - timedelta(minutes=i)
+        )
+        product = models.Product(
+            seller_id=professional.id, category_id=product_category.id, name=f"Product {i}", price=100.0
+        )
+        day = models.TrackerProgramDay(
+            program_template_id=context["template"].id, day_number=i + 2, focus_text=f"Day {i + 2}"
+        )
+        db.add_all([post, news_item, product, day])
+        db.flush()
+
+        order = models.ProductOrder(
+            client_id=client.id, seller_id=professional.id, status=ProductOrderStatus.PENDING, total_price=100.0
+        )
+        db.add(order)
+        db.flush()
+        db.add_all([
+            models.BlogPostTag(post_id=post.id, tag_id=tag.id),
+            models.ProductImage(product_id=product.id, image_url=f"/img/{i}-0.jpg", sort_order=0),
+            models.ProductImage(product_id=product.id, image_url=f"/img/{i}-1.jpg", sort_order=1),
+            models.ProductOrderItem(order_id=order.id, product_id=product.id, qty=1, unit_price=100.0),
+            models.TrackerProgramDay(program_template_id=template.id, day_number=1),
+            models.TrackerProgramDayHabit(program_day_id=context["first_day"].id, habit_id=habit.id, sort_order=i),
+            models.TrackerProgramDayHabit(program_day_id=day.id, habit_id=habit.id, sort_order=0),
+            models.TrackerUserDayLog(user_day_id=context["user_day"].id, habit_id=habit.id, completed=i % 2 == 0),
+        ])
+
+        if not ids:
+            ids = {
+                "service_id": service.id,
+                "booking_id": booking.id,
+                "review_id": review.id,
+                "post_id": post.id,
+                "news_item_id": news_item.id,
+                "product_id": product.id,
+            }
+    db.flush()
+    return ids
+
+class StatementRecorder:
+    """Собирает выполненные SQL-выражения со всех движков приложения"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def reset(self):
+        self.statements = []
+
+def measure(client, recorder, path: str, headers: dict):
+    recorder.reset()
+    response = client.get(path, headers=headers)
+    return response.status_code, list(recorder.statements)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Проверка бюджета SQL-запросов эндпоинтов")
+    parser.add_argument("--rows", type=int, default=50, help="Сколько строк каждой сущности добавить во втором проходе")
+    parser.add_argument("--database-url", default=None, help="База для проверки (по умолчанию временная SQLite)")
+    args = parser.parse_args()
+
+    # База и реплика задаются до импорта приложения: движки создаются при импорте
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'query_budget.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.pop("DATABASE_READ_URL", None)
+    os.environ.pop("ASYNC_DATABASE_READ_URL", None)
+
+    from sqlalchemy import event
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.database import SessionLocal, all_sync_engines
+    from app.cache import reference_cache
+    from app.auth import get_password_hash
+    from app.models import UserRole
+    from app.query_stats import statement_shape
+
+    db = SessionLocal()
+    password_hash = get_password_hash(PASSWORD)
+    context = seed(db, password_hash)
+
+    recorder = StatementRecorder()
+    for sync_engine in all_sync_engines():
+        event.listen(sync_engine, "after_cursor_execute", recorder)
+
+    with TestClient(app, raise_server_exceptions=False) as client:
+        headers = {None: {}}
+        for role in (UserRole.ADMIN, UserRole.CLIENT, UserRole.PROFESSIONAL):
+            response = client.post(
+                "/api/auth/login", data={"username": f"{role.value}@budget.example.com", "password": PASSWORD}
+            )
+            response.raise_for_status()
+            headers[role.value] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        def run_all():
+            # Справочники из кэша не дошли бы до базы - измеряем их загрузку
+            reference_cache.clear()
+            results = {}
+            for path, role, _ in QUERY_BUDGETS:
+                results[path] = measure(client, recorder, path.format(**context), headers[role])
+            return results
+
+        small = run_all()
+        grow(db, context, 1, args.rows, password_hash)
+        db.commit()
+        db.close()
+        large = run_all()
+
+    failures = 0
+    print(f"{'Эндпоинт':<60} {'1 стр.':>7} {args.rows + 1:>5} стр. {'бюджет':>7}")
+    for path, role, budget in QUERY_BUDGETS:
+        small_status, small_statements = small[path]
+        large_status, large_statements = large[path]
+        problems = []
+        if small_status != 200 or large_status != 200:
+            problems.append(f"HTTP {small_status}/{large_status}")
+        if len(large_statements) > len(small_statements):
+            problems.append("число запросов растет вместе с размером ответа")
+        if len(large_statements) > budget:
+            problems.append("превышен бюджет")
+
+        mark = "FAIL" if problems else "ok"
+        print(f"{path:<60} {len(small_statements):>7} {len(large_statements):>10} {budget:>7}  {mark}")
+        if problems:
+            failures += 1
+            print(f"    {'; '.join(problems)}")
+            for shape, repeats in Counter(statement_shape(s) for s in large_statements).most_common(3):
+                print(f"    {repeats}x {shape[:160]}")
+
+    if failures:
+        print(f"\n[ERROR] Эндпоинтов с превышением бюджета: {failures}")
+        return 1
+    print(f"\n[OK] Все {len(QUERY_BUDGETS)} эндпоинтов укладываются в бюджет")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
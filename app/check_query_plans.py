@@ -0,0 +1,205 @@
+"""
+Проверка планов горячих запросов роутеров через EXPLAIN QUERY PLAN.
+
+Наполняет отдельную SQLite-базу объемом, близким к боевому (по умолчанию 1M бронирований),
+и проверяет, что каждый горячий запрос использует индекс, а не полное сканирование таблицы.
+
+Запуск:
+    python -m app.check_query_plans --database-url sqlite:///./query_plans.db --bookings 1000000
+"""
+import argparse
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.dialects import sqlite
+
+from app.database import Base
+from app.generate_dataset import DEFAULT_SCALE, generate
+from app.pagination import paginate, select_page
+from app.search import apply_search
+from app import models
+from app.models import (
+    BookingStatus, ServiceCategory, DayStatus, ProgramStatus,
+    BlogPostStatus, NewsItemStatus
+)
+
+def seed(engine, bookings: int, seed_value: int = 42):
+    """Наполнить базу генератором данных в пропорциях боевого объема (только если она пустая)"""
+    with engine.connect() as connection:
+        existing = connection.execute(select(func.count()).select_from(models.Booking.__table__)).scalar()
+    if existing >= bookings:
+        print(f"База уже содержит {existing} бронирований, наполнение пропущено")
+        return
+    if existing:
+        # Частично заполненная база проверки планов пересоздается целиком
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+    factor = bookings / DEFAULT_SCALE["bookings"]
+    scale = {name: max(int(value * factor), 10) for name, value in DEFAULT_SCALE.items()}
+    scale["services_per_professional"] = DEFAULT_SCALE["services_per_professional"]
+    scale["users"] = max(scale["users"], scale["professionals"] * 2)
+    scale["bookings"] = bookings
+
+    print(f"Наполнение: {scale}...")
+    generate(engine, scale, seed_value)
+
+def keyset_page(query, keyset, *values, limit: int = 20):
+    """Страница списка по курсору со значениями ключа values, как ее выбирает app.pagination"""
+    cursor = None
+    if values:
+        cursor = keyset.cursor(SimpleNamespace(**{column.key: value for column, value in zip(keyset.columns, values)}))
+    return paginate(query, keyset, cursor, 0, limit)
+
+def search_page(query, model, keyset, search: str, limit: int = 20):
+    """Выдача поиска по релевантности, как в роутерах с параметром search"""
+    query, rank = apply_search(query, model, search, "sqlite")
+    return select_page(query, keyset, None, 0, limit, rank)[0]
+
+def hot_queries():
+    """Запросы в той форме, в какой их строят роутеры: (название, таблица, запрос)"""
+    from app.routers.admin import USER_KEYSET
+    from app.routers.admin_analytics import timeseries_query
+    from app.routers.blog import POST_KEYSET
+    from app.routers.bookings import BOOKING_KEYSET, BOOKING_DATE_KEYSET
+    from app.routers.news import ITEM_KEYSET
+    from app.routers.product_orders import ORDER_KEYSET
+    from app.routers.products import PRODUCT_KEYSET
+    from app.routers.reviews import REVIEW_KEYSET
+
+    B = models.Booking
+    R = models.Review
+    anchor = datetime(2024, 6, 1)
+    return [
+        ("professional.get_my_bookings by status", "bookings",
+         select(B).where(B.professional_id == 7, B.status == BookingStatus.PENDING).order_by(B.booking_date.desc())),
+        ("professional.get_professional_stats recent bookings", "bookings",
+         select(func.count()).select_from(B).where(B.professional_id == 7, B.created_at >= datetime.now(timezone.utc) - timedelta(days=30))),
+        ("client.get_client_stats recent bookings", "bookings",
+         select(func.count()).select_from(B).where(B.client_id == 5000, B.created_at >= datetime.now(timezone.utc) - timedelta(days=30))),
+        ("client.get_my_bookings", "bookings",
+         keyset_page(select(B).where(B.client_id == 5000), BOOKING_DATE_KEYSET, limit=100)),
+        ("client.get_my_bookings next page", "bookings",
+         keyset_page(select(B).where(B.client_id == 5000), BOOKING_DATE_KEYSET, anchor, 1000, limit=100)),
+        ("professional.get_my_bookings next page", "bookings",
+         keyset_page(select(B).where(B.professional_id == 7), BOOKING_DATE_KEYSET, anchor, 1000, limit=100)),
+        ("admin.get_all_bookings", "bookings",
+         keyset_page(select(B), BOOKING_KEYSET, limit=100)),
+        ("admin.get_all_bookings next page", "bookings",
+         keyset_page(select(B), BOOKING_KEYSET, anchor, 1000, limit=100)),
+        ("admin.get_all_bookings by status", "bookings",
+         keyset_page(select(B).where(B.status == BookingStatus.CONFIRMED), BOOKING_KEYSET, limit=100)),
+        ("bookings.read_bookings client next page", "bookings",
+         keyset_page(select(B).where(B.client_id == 5000), BOOKING_KEYSET, anchor, 1000, limit=100)),
+        ("reviews.read_reviews by professional", "reviews",
+         keyset_page(select(R).where(R.professional_id == 7), REVIEW_KEYSET, limit=100)),
+        ("reviews.read_reviews next page", "reviews",
+         keyset_page(select(R), REVIEW_KEYSET, anchor, 1000, limit=100)),
+        ("admin.get_all_users next page", "users",
+         keyset_page(select(models.User), USER_KEYSET, anchor, 1000, limit=100)),
+        ("product_orders.get_my_orders next page", "product_orders",
+         keyset_page(select(models.ProductOrder).where(models.ProductOrder.client_id == 50), ORDER_KEYSET, anchor, 1000, limit=100)),
+        ("tracker user day by number", "tracker_user_days",
+         select(models.TrackerUserDay).where(models.TrackerUserDay.user_program_id == 3, models.TrackerUserDay.day_number == 5)),
+        ("tracker open day", "tracker_user_days",
+         select(models.TrackerUserDay).where(models.TrackerUserDay.user_program_id == 3, models.TrackerUserDay.status == DayStatus.OPEN)),
+        ("tracker day logs", "tracker_user_day_logs",
+         select(models.TrackerUserDayLog).where(models.TrackerUserDayLog.user_day_id == 65, models.TrackerUserDayLog.habit_id == 2)),
+        ("tracker active program", "tracker_user_programs",
+         select(models.TrackerUserProgram).where(models.TrackerUserProgram.user_id == 2500, models.TrackerUserProgram.status == ProgramStatus.ACTIVE)),
+        ("product images", "product_images",
+         select(models.ProductImage).where(models.ProductImage.product_id == 10).order_by(models.ProductImage.sort_order)),
+        ("blog post tags", "blog_post_tags",
+         select(models.BlogPostTag).where(models.BlogPostTag.post_id == 10)),
+        ("blog.get_posts", "blog_posts",
+         keyset_page(select(models.BlogPost).where(models.BlogPost.status == BlogPostStatus.PUBLISHED), POST_KEYSET)),
+        ("blog.get_posts next page", "blog_posts",
+         keyset_page(select(models.BlogPost).where(models.BlogPost.status == BlogPostStatus.PUBLISHED),
+                     POST_KEYSET, anchor, anchor, 1000)),
+        ("news.get_items", "news_items",
+         keyset_page(select(models.NewsItem).where(models.NewsItem.status == NewsItemStatus.ACTIVE), ITEM_KEYSET)),
+        ("news.get_items next page", "news_items",
+         keyset_page(select(models.NewsItem).where(models.NewsItem.status == NewsItemStatus.ACTIVE),
+                     ITEM_KEYSET, anchor, anchor, 1000)),
+        ("services.read_services by category", "services",
+         select(models.Service).where(models.Service.is_active == True, models.Service.category == ServiceCategory.SPA).limit(100)),
+        ("services.read_services by professional", "services",
+         select(models.Service).where(models.Service.is_active == True, models.Service.professional_id == 7).limit(100)),
+        ("products.get_products", "products",
+         keyset_page(select(models.Product).where(models.Product.is_active == True), PRODUCT_KEYSET)),
+        ("products.get_products next page", "products",
+         keyset_page(select(models.Product).where(models.Product.is_active == True), PRODUCT_KEYSET, anchor, 1000)),
+        ("blog.get_posts search", "blog_posts",
+         search_page(select(models.BlogPost).where(models.BlogPost.status == BlogPostStatus.PUBLISHED),
+                     models.BlogPost, POST_KEYSET, "post")),
+        ("news.get_items search", "news_items",
+         search_page(select(models.NewsItem).where(models.NewsItem.status == NewsItemStatus.ACTIVE),
+                     models.NewsItem, ITEM_KEYSET, "news")),
+        ("products.get_products search", "products",
+         search_page(select(models.Product).where(models.Product.is_active == True),
+                     models.Product, PRODUCT_KEYSET, "product")),
+        ("admin_analytics.get_timeseries year", "booking_daily_rollups",
+         timeseries_query(anchor.date() - timedelta(days=365), anchor.date())),
+        ("admin_analytics.get_timeseries professional by category", "booking_daily_rollups",
+         timeseries_query(anchor.date() - timedelta(days=365), anchor.date(), ServiceCategory.SPA, 7)),
+        ("products.get_products by category", "products",
+         keyset_page(select(models.Product).where(models.Product.is_active == True, models.Product.category_id == 3),
+                     PRODUCT_KEYSET)),
+        ("refresh_tokens.rotate", "refresh_tokens",
+         select(models.RefreshToken).where(models.RefreshToken.token_hash == "0" * 64)),
+        ("refresh_tokens.sync", "refresh_tokens",
+         select(models.RefreshToken.family_id).where(models.RefreshToken.revoked_at >= anchor)),
+    ]
+
+def explain(connection, query) -> list:
+    sql = str(query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    return [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+def uses_index(plan: list, table: str) -> bool:
+    """Запрос к таблице должен идти через индекс, без полного SCAN"""
+    # Целым словом: шаги по FTS-таблице (<table>_fts) проверяются отдельно
+    steps = [step for step in plan if re.search(rf"\b{table}\b", step)]
+    if not steps:
+        return False
+    return all("USING" in step for step in steps)
+
+def uses_fts(plan: list, table: str) -> bool:
+    """Поиск должен идти через полнотекстовый индекс (MATCH), а не перебором FTS-таблицы"""
+    steps = [step for step in plan if f"{table}_fts" in step]
+    return all("VIRTUAL TABLE INDEX" in step and ":M" in step for step in steps)
+
+def check(engine) -> bool:
+    ok = True
+    with engine.connect() as connection:
+        for name, table, query in hot_queries():
+            plan = explain(connection, query)
+            passed = uses_index(plan, table) and uses_fts(plan, table)
+            ok = ok and passed
+            print(f"[{'OK' if passed else 'FAIL'}] {name}")
+            for step in plan:
+                print(f"       {step}")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./query_plans.db")
+    parser.add_argument("--bookings", type=int, default=1000000)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    if not args.skip_seed:
+        seed(engine, args.bookings)
+
+    if not check(engine):
+        print("\n[ERROR] Некоторые горячие запросы не используют индекс")
+        return 1
+    print("\n[OK] Все горячие запросы используют индексы")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
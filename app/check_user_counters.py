@@ -0,0 +1,145 @@
+"""
+Проверка счетчиков кабинетов (app.user_counters): стороны клиента и мастера не смешиваются.
+
+Мастер A записывается к мастеру B как клиент и сам принимает записи клиента C, оба
+оставляют отзывы. Ответы /api/professional/stats для A и /api/client/stats для C
+должны совпасть с ожидаемыми - сначала по счетчикам, обновленным при flush, затем
+после полной пересборки (rebuild_range).
+
+Запуск:
+    python -m app.check_user_counters
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+EXPECTED_PROFESSIONAL = {
+    "services": {"total": 1},
+    # Записи A к мастеру B сюда не входят, выручка - только от клиента C
+    "bookings": {"total": 2, "completed": 1, "pending": 1, "recent_30_days": 2},
+    "revenue": {"total": 250.0},
+}
+EXPECTED_CLIENT = {
+    "bookings": {"total": 2, "completed": 1, "pending": 1, "recent_30_days": 2},
+    "spending": {"total": 250.0},
+    "reviews": {"total": 1},
+}
+# Клиентская сторона мастера A: его запись к мастеру B и его отзыв
+EXPECTED_PROFESSIONAL_AS_CLIENT = {
+    "bookings_total": 1, "bookings_completed": 1, "bookings_pending": 0,
+    "completed_amount": 100.0, "reviews": 1, "services_active": 0,
+}
+
+def seed(db) -> dict:
+    """Клиент C, мастера A и B с услугой у каждого, записи и отзывы в обе стороны"""
+    from app import models
+    from app.models import BookingStatus, ServiceCategory, UserRole
+
+    def user(name: str, role: UserRole, number: int):
+        user = models.User(
+            email=f"{name}@counters.example.com", phone=f"+99670000000{number}",
+            full_name=f"Counters {name}", hashed_password="-", role=role,
+        )
+        db.add(user)
+        return user
+
+    client = user("client", UserRole.CLIENT, 1)
+    master_a = user("master-a", UserRole.PROFESSIONAL, 2)
+    master_b = user("master-b", UserRole.PROFESSIONAL, 3)
+    db.flush()
+
+    def service(professional):
+        service = models.Service(
+            name=f"Service of {professional.full_name}", category=ServiceCategory.BEAUTY,
+            price=100, duration_minutes=60, professional_id=professional.id,
+        )
+        db.add(service)
+        return service
+
+    service_a, service_b = service(master_a), service(master_b)
+    db.flush()
+
+    def booking(client_user, service, price: float):
+        booking = models.Booking(
+            client_id=client_user.id, professional_id=service.professional_id, service_id=service.id,
+            booking_date=datetime.now(timezone.utc) + timedelta(days=1), address="-", phone="-",
+            status=BookingStatus.PENDING, total_price=price,
+        )
+        db.add(booking)
+        return booking
+
+    a_at_b = booking(master_a, service_b, 100)
+    c_at_a = booking(client, service_a, 250)
+    booking(client, service_a, 80)
+    db.commit()
+
+    # Смена статуса - через изменение, как в professional.update_booking_status
+    a_at_b.status = BookingStatus.COMPLETED
+    c_at_a.status = BookingStatus.COMPLETED
+    db.commit()
+
+    db.add_all([
+        models.Review(booking_id=a_at_b.id, client_id=master_a.id, professional_id=master_b.id, rating=5),
+        models.Review(booking_id=c_at_a.id, client_id=client.id, professional_id=master_a.id, rating=4),
+    ])
+    db.commit()
+    return {"client": client, "master_a": master_a}
+
+def check(db, users: dict, stage: str) -> list:
+    """Расхождения ответов эндпоинтов с ожидаемыми"""
+    from app import user_counters
+    from app.models import UserRole
+    from app.routers.client import get_client_stats
+    from app.routers.professional import get_professional_stats
+
+    professional = get_professional_stats(current_user=users["master_a"], db=db)
+    client = get_client_stats(current_user=users["client"], db=db)
+    as_client = user_counters.counters_for(db, users["master_a"].id, UserRole.CLIENT)
+
+    problems = []
+    for name, actual, expected in (
+        ("/api/professional/stats (мастер A)", {key: professional[key] for key in EXPECTED_PROFESSIONAL}, EXPECTED_PROFESSIONAL),
+        ("/api/client/stats (клиент C)", client, EXPECTED_CLIENT),
+        ("клиентские счетчики мастера A", as_client, EXPECTED_PROFESSIONAL_AS_CLIENT),
+    ):
+        if actual != expected:
+            problems.append(f"{stage}: {name}\n    ожидалось {expected}\n    получено  {actual}")
+    return problems
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Проверка счетчиков кабинетов клиента и мастера")
+    parser.add_argument("--database-url", default=None, help="Пустая база для проверки (по умолчанию временная SQLite)")
+    args = parser.parse_args()
+
+    # База задается до импорта приложения: движки создаются при импорте
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'user_counters.db')}"
+    os.environ.pop("DATABASE_READ_URL", None)
+
+    from app import user_counters
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    user_counters.install()
+
+    db = SessionLocal()
+    try:
+        users = seed(db)
+        problems = check(db, users, "после flush")
+        with engine.begin() as connection:
+            user_counters.rebuild_range(connection)
+        db.expire_all()
+        problems += check(db, users, "после пересборки")
+    finally:
+        db.close()
+
+    for problem in problems:
+        print(f"[FAIL] {problem}")
+    if problems:
+        return 1
+    print("[OK] Счетчики клиента и мастера считаются раздельно")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Сжатие ответов: выбор gzip/brotli по Accept-Encoding, порог минимального размера,
+отключение для отдельных маршрутов и заранее сжатые тела для кэшируемых ответов.
+
+brotli - необязательная зависимость: если пакет не установлен, используется только gzip.
+"""
+import gzip
+import os
+import threading
+import time
+import zlib
+
+from fastapi import Request, Response
+from prometheus_client import Counter, Histogram
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+# Тела меньше порога не сжимаем: выигрыш меньше накладных расходов
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Заранее сжатые тела сжимаются один раз, поэтому можно сжимать сильнее
+PRECOMPRESSED_GZIP_LEVEL = 9
+PRECOMPRESSED_BROTLI_QUALITY = 11
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "text/", "application/javascript", "application/xml", "image/svg+xml"
+)
+
+# Порядок предпочтения при одинаковом q
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSION_INPUT = Counter(
+    "http_compression_input_bytes_total", "Байт до сжатия", ["encoding"]
+)
+COMPRESSION_OUTPUT = Counter(
+    "http_compression_output_bytes_total", "Байт после сжатия", ["encoding"]
+)
+COMPRESSION_CPU = Counter(
+    "http_compression_cpu_seconds_total", "Процессорное время на сжатие", ["encoding", "mode"]
+)
+COMPRESSION_RATIO = Histogram(
+    "http_compression_ratio", "Отношение размера после сжатия к исходному",
+    ["encoding"], buckets=(0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0)
+)
+
+def negotiate(accept_encoding: str) -> str:
+    """Лучшая поддерживаемая кодировка из Accept-Encoding или None"""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip()] = quality
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress(body: bytes, encoding: str, precompressed: bool = False) -> bytes:
+    started = time.thread_time()
+    if encoding == "br":
+        result = brotli.compress(body, quality=PRECOMPRESSED_BROTLI_QUALITY if precompressed else BROTLI_QUALITY)
+    else:
+        result = gzip.compress(body, compresslevel=PRECOMPRESSED_GZIP_LEVEL if precompressed else GZIP_LEVEL, mtime=0)
+    _record(encoding, len(body), len(result), time.thread_time() - started, "precompressed" if precompressed else "response")
+    return result
+
+def _record(encoding: str, input_size: int, output_size: int, cpu: float, mode: str):
+    COMPRESSION_INPUT.labels(encoding).inc(input_size)
+    COMPRESSION_OUTPUT.labels(encoding).inc(output_size)
+    COMPRESSION_CPU.labels(encoding, mode).inc(cpu)
+    if input_size:
+        COMPRESSION_RATIO.labels(encoding).observe(output_size / input_size)
+
+class _StreamCompressor:
+    """Потоковое сжатие для ответов из нескольких частей (StreamingResponse)"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self.input_size = 0
+        self.output_size = 0
+        self.cpu = 0.0
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def _run(self, function, *args) -> bytes:
+        started = time.thread_time()
+        result = function(*args)
+        self.cpu += time.thread_time() - started
+        self.output_size += len(result)
+        return result
+
+    def chunk(self, data: bytes) -> bytes:
+        self.input_size += len(data)
+        # Сбрасываем буфер после каждой части, чтобы клиент получал данные по мере генерации
+        if self.encoding == "br":
+            return self._run(lambda: self._compressor.process(data) + self._compressor.flush())
+        return self._run(lambda: self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def finish(self) -> bytes:
+        result = self._run(self._compressor.finish if self.encoding == "br" else self._compressor.flush)
+        _record(self.encoding, self.input_size, self.output_size, self.cpu, "stream")
+        return result
+
+def disable_compression(request: Request):
+    """Зависимость маршрута: не сжимать ответ (dependencies=[Depends(disable_compression)])"""
+    request.scope["compression.disabled"] = True
+
+def _is_compressible(headers: list) -> bool:
+    for name, value in headers:
+        if name.lower() == b"content-type":
+            content_type = value.decode("latin-1").lower()
+            return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+    return False
+
+def _has_header(headers: list, name: bytes) -> bool:
+    return any(key.lower() == name for key, _ in headers)
+
+def _set_header(headers: list, name: bytes, value: bytes) -> list:
+    return [(key, val) for key, val in headers if key.lower() != name] + [(name, value)]
+
+def _prepare_headers(headers: list, encoding: str, length: int = None) -> list:
+    headers = _set_header(headers, b"content-encoding", encoding.encode())
+    headers = [(key, value) for key, value in headers if key.lower() != b"content-length"]
+    if length is not None:
+        headers.append((b"content-length", str(length).encode()))
+    # Сжатое представление отличается побайтно - сильный ETag становится слабым
+    for index, (key, value) in enumerate(headers):
+        if key.lower() == b"etag" and not value.startswith(b"W/"):
+            headers[index] = (key, b"W/" + value)
+    return headers
+
+def _add_vary(headers: list) -> list:
+    for index, (key, value) in enumerate(headers):
+        if key.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[index] = (key, value + b", Accept-Encoding")
+            return headers
+    return headers + [(b"vary", b"Accept-Encoding")]
+
+class CompressionMiddleware:
+    """Сжимает ответы подходящих типов размером от MIN_SIZE байт"""
+
+    def __init__(self, app, min_size: int = MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding) if accept_encoding else None
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is not None:
+                data = compressor.chunk(body) if body else b""
+                if not more_body:
+                    data += compressor.finish()
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            # Первая часть тела: решаем, сжимать ли ответ
+            headers = list(start_message.get("headers", []))
+            compressible = _is_compressible(headers) and not _has_header(headers, b"content-encoding")
+            if compressible:
+                headers = _add_vary(headers)
+            if (
+                not compressible
+                or encoding is None
+                or scope.get("compression.disabled")
+                or (not more_body and len(body) < self.min_size)
+            ):
+                passthrough = True
+                await send({**start_message, "headers": headers})
+                await send(message)
+                return
+
+            if more_body:
+                compressor = _StreamCompressor(encoding)
+                await send({**start_message, "headers": _prepare_headers(headers, encoding)})
+                await send({"type": "http.response.body", "body": compressor.chunk(body), "more_body": True})
+                return
+
+            compressed = compress(body, encoding)
+            await send({**start_message, "headers": _prepare_headers(headers, encoding, len(compressed))})
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
+
+class PrecompressedBody:
+    """
+    Тело ответа для кэша: JSON-байты и их сжатые варианты. Каждый вариант
+    сжимается один раз при первом запросе с такой кодировкой.
+    """
+
+    __slots__ = ("identity", "_encoded", "_lock")
+
+    def __init__(self, body: bytes):
+        self.identity = body
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self._encoded.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(encoding)
+                if body is None:
+                    body = self._encoded[encoding] = compress(self.identity, encoding, precompressed=True)
+        return body
+
+def precompressed_response(request: Request, body: PrecompressedBody, media_type: str = "application/json") -> Response:
+    """Ответ из заранее сжатого тела; CompressionMiddleware его уже не трогает"""
+    encoding = None
+    if len(body.identity) >= MIN_SIZE and not request.scope.get("compression.disabled"):
+        encoding = negotiate(request.headers.get("accept-encoding", ""))
+    if encoding is None:
+        return Response(content=body.identity, media_type=media_type, headers={"Vary": "Accept-Encoding"})
+    return Response(
+        content=body.encoded(encoding),
+        media_type=media_type,
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
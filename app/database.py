@@ -1,23 +1,275 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from fastapi import Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import functions
+from typing import Optional
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Database URL - используем SQLite для простоты, можно заменить на PostgreSQL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./beauty_services.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+# Асинхронные драйверы для тех же баз данных
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Преобразовать синхронный URL базы данных в URL асинхронного драйвера"""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database dialect: {dialect}")
+    return f"{_ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Реплика только для чтения. Если не задана, чтение идет с основной базы.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+ASYNC_DATABASE_READ_URL = os.getenv("ASYNC_DATABASE_READ_URL") or (
+    to_async_url(DATABASE_READ_URL) if DATABASE_READ_URL else None
+)
+
+# Сколько секунд после записи запросы клиента продолжают читать с основной базы
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+PRIMARY_PIN_COOKIE = "db_primary_until"
+
+# Профили настройки движка. Значения по умолчанию можно переопределить через env.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-64000")),  # отрицательное значение - в KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    "foreign_keys": os.getenv("SQLITE_FOREIGN_KEYS", "OFF"),
+}
+
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+}
+
+# Размер кэша скомпилированных SQL-выражений SQLAlchemy
+QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+# Размер кэша подготовленных выражений драйвера asyncpg
+PG_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PG_STATEMENT_CACHE_SIZE", "500"))
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_PG_STATEMENT_TIMEOUT_MS", "30000"))
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Параметры create_engine для выбранной базы данных"""
+    options = {"query_cache_size": QUERY_CACHE_SIZE}
+    if is_sqlite(url):
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        # In-memory базы используют собственный пул без настроек размера
+        if make_url(url).database not in (None, "", ":memory:"):
+            options.update(POOL_SETTINGS)
+        return options
+
+    options.update(POOL_SETTINGS)
+    if is_async:
+        options["connect_args"] = {
+            "statement_cache_size": PG_STATEMENT_CACHE_SIZE,
+            "server_settings": {"statement_timeout": str(PG_STATEMENT_TIMEOUT_MS)},
+        }
+    else:
+        options["connect_args"] = {"options": f"-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+@compiles(functions.now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    # CURRENT_TIMESTAMP в SQLite точен до секунды, а updated_at служит валидатором ETag -
+    # две правки за секунду не должны давать одинаковую версию строки
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
+
+def configure_engine(sync_engine, url: str):
+    """Подключить обработчики соединений для профиля базы данных"""
+    if is_sqlite(url):
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    return sync_engine
+
+def describe_engine(sync_engine, read_pragmas: bool = True) -> dict:
+    """Фактические настройки движка (для логов и диагностики)"""
+    pool = sync_engine.pool
+    settings = {
+        "url": sync_engine.url.render_as_string(hide_password=True),
+        "pool": type(pool).__name__,
+        "pool_size": pool.size() if hasattr(pool, "size") else None,
+        "max_overflow": getattr(pool, "_max_overflow", None),
+        "pool_recycle": getattr(pool, "_recycle", None),
+        "pool_timeout": getattr(pool, "_timeout", None),
+        "query_cache_size": QUERY_CACHE_SIZE,
+    }
+    if sync_engine.dialect.name == "sqlite":
+        if read_pragmas:
+            # Читаем значения обратно из соединения, чтобы видеть, что реально применилось
+            with sync_engine.connect() as connection:
+                for name in SQLITE_PRAGMAS:
+                    settings[name] = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        else:
+            settings.update(SQLITE_PRAGMAS)
+    else:
+        settings["statement_cache_size"] = PG_STATEMENT_CACHE_SIZE
+        settings["statement_timeout_ms"] = PG_STATEMENT_TIMEOUT_MS
+    return settings
+
+def log_engine_settings():
+    """Записать в лог эффективные настройки движков при старте приложения"""
+    logger.info("Database engine settings: %s", describe_engine(engine))
+    # Синхронное соединение через асинхронный движок открыть нельзя - показываем конфигурацию
+    logger.info("Async database engine settings: %s", describe_engine(async_engine.sync_engine, read_pragmas=False))
+    if DATABASE_READ_URL:
+        logger.info("Read replica engine settings: %s", describe_engine(read_engine))
+
+engine = configure_engine(
+    create_engine(DATABASE_URL, **engine_options(DATABASE_URL)),
+    DATABASE_URL
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок работает параллельно с синхронным на время миграции роутеров
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+configure_engine(async_engine.sync_engine, ASYNC_DATABASE_URL)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+if DATABASE_READ_URL:
+    read_engine = configure_engine(
+        create_engine(DATABASE_READ_URL, **engine_options(DATABASE_READ_URL)),
+        DATABASE_READ_URL
+    )
+    async_read_engine = create_async_engine(
+        ASYNC_DATABASE_READ_URL, **engine_options(ASYNC_DATABASE_READ_URL, is_async=True)
+    )
+    configure_engine(async_read_engine.sync_engine, ASYNC_DATABASE_READ_URL)
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+
+def named_sync_engines() -> dict:
+    """Движки приложения по именам (для асинхронных - их синхронная часть), без повторов"""
+    engines = {}
+    for name, candidate in (
+        ("primary", engine),
+        ("primary_async", async_engine.sync_engine),
+        ("replica", read_engine),
+        ("replica_async", async_read_engine.sync_engine),
+    ):
+        if all(candidate is not existing for existing in engines.values()):
+            engines[name] = candidate
+    return engines
+
+def all_sync_engines() -> list:
+    """Все движки приложения (для асинхронных - их синхронная часть), без повторов"""
+    return list(named_sync_engines().values())
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
+# Read-your-writes: клиенты, которые недавно писали, временно читают с основной базы.
+# Отметка хранится в cookie (работает между воркерами) и в памяти процесса
+# по токену авторизации (для клиентов, которые не отправляют cookie).
+_primary_pins = {}
+_MAX_PRIMARY_PINS = 10000
+
+def _pin_key(request) -> Optional[str]:
+    authorization = request.headers.get("authorization")
+    return authorization or None
+
+def pin_to_primary(request, now: Optional[float] = None) -> float:
+    """Закрепить клиента запроса за основной базой на READ_YOUR_WRITES_SECONDS"""
+    now = now or time.time()
+    until = now + READ_YOUR_WRITES_SECONDS
+    key = _pin_key(request)
+    if key:
+        if len(_primary_pins) >= _MAX_PRIMARY_PINS:
+            for expired in [k for k, v in _primary_pins.items() if v <= now]:
+                _primary_pins.pop(expired, None)
+        _primary_pins[key] = until
+    return until
+
+def is_pinned_to_primary(request, now: Optional[float] = None) -> bool:
+    if read_engine is engine:
+        return True
+    now = now or time.time()
+    key = _pin_key(request)
+    if key and _primary_pins.get(key, 0) > now:
+        return True
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > now
+    except ValueError:
+        return False
+
+class ReadYourWritesMiddleware:
+    """Отмечает успешные изменяющие запросы, чтобы последующие чтения шли на основную базу"""
+
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self.SAFE_METHODS or read_engine is engine:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = pin_to_primary(request)
+                cookie = (
+                    f"{PRIMARY_PIN_COOKIE}={until:.3f}; Max-Age={int(READ_YOUR_WRITES_SECONDS) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -25,3 +277,19 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db(request: Request):
+    """Сессия для публичных чтений: реплика, либо основная база сразу после записи"""
+    db = SessionLocal() if is_pinned_to_primary(request) else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db(request: Request):
+    session_factory = AsyncSessionLocal if is_pinned_to_primary(request) else AsyncReadSessionLocal
+    async with session_factory() as db:
+        yield db
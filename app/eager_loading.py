@@ -0,0 +1,64 @@
+"""
+Опции загрузки связей по схеме ответа.
+
+load_options(Model, Schema) проходит по вложенным полям схемы (в том числе Optional[...]
+и List[...]) и для каждого поля, которому соответствует relationship модели с тем же
+именем, строит опцию загрузки: joinedload для ссылки на одну строку и selectinload для
+коллекции, вложенные связи - рекурсивно. Сериализация страницы из N строк тогда
+выполняет фиксированное число запросов вместо ленивой загрузки каждой связи по строке.
+
+Поля схемы без одноименной связи (заполняются обработчиком вручную) пропускаются.
+Если коллекция схемы идет через ассоциативную модель (теги поста - BlogPostTag.tag),
+переход указывается в through: {"tags": "tag"}.
+"""
+import typing
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+
+def _nested_schema(annotation):
+    """Вложенная схема поля: Optional[X], List[X], Optional[List[X]] -> X; иначе None"""
+    if isinstance(annotation, type):
+        return annotation if issubclass(annotation, BaseModel) else None
+    for argument in typing.get_args(annotation):
+        schema = _nested_schema(argument)
+        if schema is not None:
+            return schema
+    return None
+
+def _loader(relationship_property, parent=None):
+    loader = selectinload if relationship_property.uselist else joinedload
+    if parent is None:
+        return loader(relationship_property.class_attribute)
+    return getattr(parent, loader.__name__)(relationship_property.class_attribute)
+
+def _options(model, schema, through: tuple, path: frozenset) -> tuple:
+    relationships = inspect(model).relationships
+    through = dict(through)
+    options = []
+    for name, field in schema.model_fields.items():
+        nested = _nested_schema(field.annotation)
+        if nested is None or name not in relationships or nested in path:
+            continue
+        relationship_property = relationships[name]
+        option = _loader(relationship_property)
+        target = relationship_property.mapper.class_
+        if name in through:
+            # Ассоциативная модель: загружаем ее и сразу связь, которую отдает схема
+            relationship_property = inspect(target).relationships[through[name]]
+            option = _loader(relationship_property, option)
+            target = relationship_property.mapper.class_
+        children = _options(target, nested, (), path | {nested})
+        options.append(option.options(*children) if children else option)
+    return tuple(options)
+
+@lru_cache(maxsize=None)
+def _cached_options(model, schema, through: tuple) -> tuple:
+    return _options(model, schema, through, frozenset({schema}))
+
+def load_options(model, schema, through: Optional[dict] = None) -> tuple:
+    """Опции для query.options(*...): все связи, которые сериализует schema для model"""
+    return _cached_options(model, schema, tuple(sorted((through or {}).items())))
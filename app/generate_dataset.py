@@ -0,0 +1,426 @@
+"""
+Генератор синтетических данных в объеме, близком к боевому.
+
+В отличие от init_db.py / init_tracker.py (несколько демо-записей через ORM) заполняет
+все таблицы, с которыми работают роутеры, пачками через SQLAlchemy Core executemany.
+Пароль хешируется один раз и переиспользуется для всех пользователей. При одинаковых
+--seed и --anchor результат полностью повторяется.
+
+Запуск:
+    python -m app.generate_dataset --database-url sqlite:///./dataset.db --reset
+    python -m app.generate_dataset --bookings 200000 --users 10000 --professionals 2000
+
+Администратор: admin@example.com, остальные пользователи: user<id>@example.com;
+пароль у всех один (--password).
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, select, func, update, literal
+
+from app.database import DATABASE_URL, Base
+from app import models, rollups, stats_snapshot, user_counters
+from app.models import (
+    UserRole, BookingStatus, ServiceCategory, HabitCategory, ProgramStatus, DayStatus,
+    BlogPostStatus, NewsItemStatus, ProductOrderStatus
+)
+
+BATCH_SIZE = 50000
+
+DEFAULT_SCALE = {
+    "users": 100000,
+    "professionals": 20000,
+    "services_per_professional": 5,
+    "bookings": 2000000,
+    "reviews": 500000,
+    "day_logs": 1000000,
+    "products": 50000,
+    "product_orders": 100000,
+    "blog_posts": 20000,
+    "news_items": 100000,
+}
+
+# Справочники небольшого размера
+PROGRAM_TEMPLATES = 3
+PROGRAM_DAYS = 30
+HABITS = 40
+HABITS_PER_DAY = 4
+BLOG_CATEGORIES = 8
+BLOG_TAGS = 100
+NEWS_SOURCES = 20
+NEWS_CATEGORIES = 10
+PRODUCT_CATEGORIES = 20
+
+class BatchWriter:
+    """Копит строки по таблицам и вставляет их пачками через executemany.
+
+    При переполнении любой пачки сбрасываются все таблицы в порядке зависимостей,
+    чтобы родительские строки всегда попадали в базу раньше дочерних.
+    """
+
+    def __init__(self, connection, batch_size: int = BATCH_SIZE):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.rows = {}
+        self.counts = {}
+        self._order = {table: i for i, table in enumerate(Base.metadata.sorted_tables)}
+
+    def add(self, model, row: dict):
+        table = model.__table__
+        self.rows.setdefault(table, []).append(row)
+        if len(self.rows[table]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table in sorted(self.rows, key=self._order.__getitem__):
+            rows = self.rows[table]
+            if rows:
+                self.connection.execute(table.insert(), rows)
+                self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+                rows.clear()
+
+def _timestamp(rnd, anchor: datetime, days: int) -> datetime:
+    """Случайный момент в пределах последних days дней от anchor"""
+    return anchor - timedelta(seconds=rnd.randint(0, days * 24 * 3600))
+
+def _users(writer, rnd, scale, anchor, password_hash):
+    professionals = scale["professionals"]
+    writer.add(models.User, {
+        "id": 1, "email": "admin@example.com", "phone": "+996555000000", "full_name": "Администратор Системы",
+        "hashed_password": password_hash, "role": UserRole.ADMIN, "is_active": True, "created_at": anchor,
+    })
+    for user_id in range(2, scale["users"] + 1):
+        is_professional = user_id <= professionals + 1
+        writer.add(models.User, {
+            "id": user_id,
+            "email": f"user{user_id}@example.com",
+            "phone": f"+996{user_id:09d}",
+            "full_name": f"{'Master' if is_professional else 'Client'} {user_id}",
+            "hashed_password": password_hash,
+            "role": UserRole.PROFESSIONAL if is_professional else UserRole.CLIENT,
+            "is_active": rnd.random() > 0.02,
+            "rating": 0.0,
+            "total_reviews": 0,
+            "experience_years": rnd.randint(1, 20) if is_professional else None,
+            "created_at": _timestamp(rnd, anchor, 1000),
+        })
+
+def _services(writer, rnd, scale, anchor):
+    categories = list(ServiceCategory)
+    service_id = 0
+    for professional_id in range(2, scale["professionals"] + 2):
+        for _ in range(scale["services_per_professional"]):
+            service_id += 1
+            writer.add(models.Service, {
+                "id": service_id,
+                "name": f"Service {service_id}",
+                "category": rnd.choice(categories),
+                "price": float(rnd.randint(5, 100) * 100),
+                "duration_minutes": rnd.choice((30, 45, 60, 90, 120)),
+                "professional_id": professional_id,
+                "is_active": rnd.random() > 0.1,
+                "created_at": _timestamp(rnd, anchor, 900),
+            })
+    return service_id
+
+def _bookings(writer, rnd, scale, anchor, services):
+    """Бронирования за два года; статус зависит от того, прошла ли дата визита"""
+    first_client = scale["professionals"] + 2
+    services_per_professional = scale["services_per_professional"]
+    for booking_id in range(1, scale["bookings"] + 1):
+        service_id = rnd.randint(1, services)
+        created_at = _timestamp(rnd, anchor, 730)
+        booking_date = created_at + timedelta(days=rnd.randint(0, 30), hours=rnd.randint(9, 20))
+        if booking_date > anchor:
+            status = rnd.choice((BookingStatus.PENDING, BookingStatus.CONFIRMED))
+        else:
+            status = BookingStatus.CANCELLED if rnd.random() < 0.1 else BookingStatus.COMPLETED
+        writer.add(models.Booking, {
+            "id": booking_id,
+            "client_id": rnd.randint(first_client, scale["users"]),
+            "professional_id": (service_id - 1) // services_per_professional + 2,
+            "service_id": service_id,
+            "booking_date": booking_date,
+            "address": "Бишкек",
+            "phone": "+996555000000",
+            "status": status,
+            "total_price": float(rnd.randint(5, 100) * 100),
+            "created_at": created_at,
+        })
+
+def _reviews(connection, scale):
+    """Отзывы на каждое k-е бронирование; клиент и мастер берутся из самого бронирования"""
+    if not scale["reviews"] or not scale["bookings"]:
+        return 0
+    step = max(scale["bookings"] // scale["reviews"], 1)
+    B = models.Booking
+    source = select(
+        B.id, B.client_id, B.professional_id, (B.id * 7 % 5 + 1).label("rating"),
+        literal("Отличный мастер").label("comment"), B.booking_date
+    ).where(B.id % step == 0, B.id <= step * scale["reviews"])
+    connection.execute(models.Review.__table__.insert().from_select(
+        ["booking_id", "client_id", "professional_id", "rating", "comment", "created_at"], source
+    ))
+
+    # Рейтинг мастеров пересчитывается по созданным отзывам
+    R = models.Review
+    U = models.User
+    connection.execute(update(U).where(U.role == UserRole.PROFESSIONAL).values(
+        total_reviews=select(func.count(R.id)).where(R.professional_id == U.id).scalar_subquery(),
+        rating=select(func.coalesce(func.round(func.avg(R.rating), 2), 0.0)).where(R.professional_id == U.id).scalar_subquery(),
+    ))
+    return connection.execute(select(func.count()).select_from(R)).scalar()
+
+def _tracker(writer, rnd, scale, anchor):
+    """Шаблоны программ и программы клиентов, пока число логов не достигнет day_logs"""
+    categories = list(HabitCategory)
+    for habit_id in range(1, HABITS + 1):
+        writer.add(models.TrackerHabit, {
+            "id": habit_id, "category": categories[habit_id % len(categories)],
+            "title": f"Habit {habit_id}", "is_active": True, "created_at": anchor,
+        })
+
+    day_habits = {}
+    for template_id in range(1, PROGRAM_TEMPLATES + 1):
+        writer.add(models.TrackerProgramTemplate, {
+            "id": template_id, "name": f"30 Days Program {template_id}", "days_count": PROGRAM_DAYS,
+            "version": 1, "is_active": True, "created_at": anchor,
+        })
+        for day_number in range(1, PROGRAM_DAYS + 1):
+            day_id = (template_id - 1) * PROGRAM_DAYS + day_number
+            writer.add(models.TrackerProgramDay, {
+                "id": day_id, "program_template_id": template_id, "day_number": day_number,
+                "focus_text": f"Day {day_number}",
+            })
+            day_habits[(template_id, day_number)] = rnd.sample(range(1, HABITS + 1), HABITS_PER_DAY)
+            for sort_order, habit_id in enumerate(day_habits[(template_id, day_number)]):
+                writer.add(models.TrackerProgramDayHabit, {
+                    "program_day_id": day_id, "habit_id": habit_id, "sort_order": sort_order,
+                })
+
+    first_client = scale["professionals"] + 2
+    clients = list(range(first_client, scale["users"] + 1))
+    rnd.shuffle(clients)
+    logs = 0
+    user_day_id = 0
+    for program_id, user_id in enumerate(clients, start=1):
+        if logs >= scale["day_logs"]:
+            break
+        template_id = rnd.randint(1, PROGRAM_TEMPLATES)
+        progress = rnd.randint(1, PROGRAM_DAYS)
+        finished = progress == PROGRAM_DAYS
+        started_at = anchor - timedelta(days=progress, hours=rnd.randint(0, 23))
+        writer.add(models.TrackerUserProgram, {
+            "id": program_id, "user_id": user_id, "program_template_id": template_id,
+            "started_at": started_at, "finished_at": anchor if finished else None,
+            "status": ProgramStatus.FINISHED if finished else ProgramStatus.ACTIVE,
+            "allowed_skips": 3, "used_skips": 0,
+        })
+        for day_number in range(1, PROGRAM_DAYS + 1):
+            user_day_id += 1
+            opened_at = started_at + timedelta(days=day_number - 1)
+            if day_number < progress or finished:
+                status = DayStatus.SKIPPED if rnd.random() < 0.05 else DayStatus.COMPLETED
+            elif day_number == progress:
+                status = DayStatus.OPEN
+            else:
+                status = DayStatus.LOCKED
+            writer.add(models.TrackerUserDay, {
+                "id": user_day_id, "user_program_id": program_id, "day_number": day_number, "status": status,
+                "opened_at": opened_at if status != DayStatus.LOCKED else None,
+                "closed_at": opened_at + timedelta(hours=20) if status in (DayStatus.COMPLETED, DayStatus.SKIPPED) else None,
+            })
+            if status in (DayStatus.COMPLETED, DayStatus.OPEN):
+                for habit_id in day_habits[(template_id, day_number)]:
+                    completed = status == DayStatus.COMPLETED or rnd.random() < 0.5
+                    writer.add(models.TrackerUserDayLog, {
+                        "user_day_id": user_day_id, "habit_id": habit_id, "completed": completed,
+                        "completed_at": opened_at + timedelta(hours=rnd.randint(1, 18)) if completed else None,
+                    })
+                    logs += 1
+
+def _blog(writer, rnd, scale, anchor):
+    for category_id in range(1, BLOG_CATEGORIES + 1):
+        writer.add(models.BlogCategory, {
+            "id": category_id, "slug": f"blog-category-{category_id}", "name": f"Category {category_id}",
+            "is_active": True, "created_at": anchor,
+        })
+    for tag_id in range(1, BLOG_TAGS + 1):
+        writer.add(models.BlogTag, {"id": tag_id, "name": f"tag-{tag_id}", "created_at": anchor})
+
+    statuses = (BlogPostStatus.PUBLISHED,) * 8 + (BlogPostStatus.DRAFT, BlogPostStatus.SUBMITTED)
+    for post_id in range(1, scale["blog_posts"] + 1):
+        status = rnd.choice(statuses)
+        created_at = _timestamp(rnd, anchor, 730)
+        writer.add(models.BlogPost, {
+            "id": post_id,
+            "author_id": rnd.randint(2, scale["users"]),
+            "category_id": rnd.randint(1, BLOG_CATEGORIES),
+            "title": f"Post {post_id}",
+            "content": "Lorem ipsum dolor sit amet. " * 20,
+            "status": status,
+            "published_at": created_at + timedelta(hours=rnd.randint(1, 48)) if status == BlogPostStatus.PUBLISHED else None,
+            "created_at": created_at,
+        })
+        for tag_id in rnd.sample(range(1, BLOG_TAGS + 1), rnd.randint(0, 3)):
+            writer.add(models.BlogPostTag, {"post_id": post_id, "tag_id": tag_id, "created_at": created_at})
+
+def _news(writer, rnd, scale, anchor):
+    for source_id in range(1, NEWS_SOURCES + 1):
+        writer.add(models.NewsSource, {
+            "id": source_id, "name": f"Source {source_id}", "base_url": f"https://news{source_id}.example.com",
+            "language": rnd.choice(("ru", "ky", "en")), "is_active": True, "created_at": anchor,
+        })
+    for category_id in range(1, NEWS_CATEGORIES + 1):
+        writer.add(models.NewsCategory, {
+            "id": category_id, "slug": f"news-category-{category_id}", "name": f"News category {category_id}",
+            "is_active": True, "created_at": anchor,
+        })
+    for item_id in range(1, scale["news_items"] + 1):
+        published_at = _timestamp(rnd, anchor, 365)
+        source_id = rnd.randint(1, NEWS_SOURCES)
+        writer.add(models.NewsItem, {
+            "id": item_id,
+            "source_id": source_id,
+            "category_id": rnd.randint(1, NEWS_CATEGORIES),
+            "title": f"News {item_id}",
+            "excerpt": "Короткое описание новости. " * 3,
+            "original_url": f"https://news{source_id}.example.com/{item_id}",
+            "published_at": published_at,
+            "status": NewsItemStatus.HIDDEN if rnd.random() < 0.03 else NewsItemStatus.ACTIVE,
+            "created_at": published_at + timedelta(minutes=rnd.randint(1, 120)),
+        })
+
+def _products(writer, rnd, scale, anchor):
+    for category_id in range(1, PRODUCT_CATEGORIES + 1):
+        writer.add(models.ProductCategory, {
+            "id": category_id, "slug": f"product-category-{category_id}", "name": f"Product category {category_id}",
+            "is_active": True, "created_at": anchor,
+        })
+
+    products_by_seller = {}
+    prices = {}
+    for product_id in range(1, scale["products"] + 1):
+        seller_id = rnd.randint(2, scale["professionals"] + 1)
+        price = float(rnd.randint(2, 500) * 10)
+        products_by_seller.setdefault(seller_id, []).append(product_id)
+        prices[product_id] = price
+        writer.add(models.Product, {
+            "id": product_id,
+            "seller_id": seller_id,
+            "category_id": rnd.randint(1, PRODUCT_CATEGORIES),
+            "name": f"Product {product_id}",
+            "price": price,
+            "currency": "KGS",
+            "stock_qty": rnd.choice((None, rnd.randint(0, 100))),
+            "is_active": rnd.random() > 0.1,
+            "created_at": _timestamp(rnd, anchor, 730),
+        })
+        for sort_order in range(rnd.randint(1, 3)):
+            writer.add(models.ProductImage, {
+                "product_id": product_id, "image_url": f"/uploads/products/{product_id}-{sort_order}.jpg",
+                "sort_order": sort_order,
+            })
+
+    if not products_by_seller:
+        return
+    sellers = sorted(products_by_seller)
+    first_client = scale["professionals"] + 2
+    statuses = list(ProductOrderStatus)
+    for order_id in range(1, scale["product_orders"] + 1):
+        seller_id = rnd.choice(sellers)
+        seller_products = products_by_seller[seller_id]
+        items = rnd.sample(seller_products, min(len(seller_products), rnd.randint(1, 3)))
+        quantities = [rnd.randint(1, 3) for _ in items]
+        writer.add(models.ProductOrder, {
+            "id": order_id,
+            "client_id": rnd.randint(first_client, scale["users"]),
+            "seller_id": seller_id,
+            "status": rnd.choice(statuses),
+            "total_price": sum(prices[product_id] * qty for product_id, qty in zip(items, quantities)),
+            "address": "Бишкек",
+            "phone": "+996555000000",
+            "created_at": _timestamp(rnd, anchor, 365),
+        })
+        for product_id, qty in zip(items, quantities):
+            writer.add(models.ProductOrderItem, {
+                "order_id": order_id, "product_id": product_id, "qty": qty, "unit_price": prices[product_id],
+            })
+
+def generate(engine, scale: dict, seed_value: int = 42, anchor: datetime = None,
+             password_hash: str = None) -> dict:
+    """Заполнить пустую базу; возвращает число вставленных строк по таблицам"""
+    if scale["professionals"] >= scale["users"] - 1:
+        raise ValueError("users must be greater than professionals + 1 (admin)")
+    if password_hash is None:
+        from app.auth import get_password_hash
+        password_hash = get_password_hash("password123")
+    anchor = anchor or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    rnd = random.Random(seed_value)
+
+    with engine.begin() as connection:
+        writer = BatchWriter(connection)
+        steps = (
+            ("пользователи", lambda: _users(writer, rnd, scale, anchor, password_hash)),
+            ("услуги и бронирования", lambda: _bookings(writer, rnd, scale, anchor, _services(writer, rnd, scale, anchor))),
+            ("трекер", lambda: _tracker(writer, rnd, scale, anchor)),
+            ("блог", lambda: _blog(writer, rnd, scale, anchor)),
+            ("новости", lambda: _news(writer, rnd, scale, anchor)),
+            ("товары и заказы", lambda: _products(writer, rnd, scale, anchor)),
+        )
+        for title, step in steps:
+            started = time.perf_counter()
+            step()
+            writer.flush()
+            print(f"  {title}: {time.perf_counter() - started:.1f} с")
+
+        started = time.perf_counter()
+        writer.counts["reviews"] = _reviews(connection, scale)
+        print(f"  отзывы и рейтинги: {time.perf_counter() - started:.1f} с")
+
+        # Строки вставлены в обход ORM - снимок статистики, сводки и счетчики строятся заново
+        stats_snapshot.reconcile(connection)
+        rollups.rebuild_range(connection)
+        user_counters.rebuild_range(connection)
+
+        # Статистика планировщика под реальный объем данных
+        connection.exec_driver_sql("ANALYZE")
+    return writer.counts
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--reset", action="store_true", help="Удалить и заново создать все таблицы")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=lambda value: datetime.fromisoformat(value).replace(tzinfo=timezone.utc),
+                        default=None, help="Дата «сейчас» для генерации (YYYY-MM-DD), по умолчанию сегодня")
+    parser.add_argument("--password", default="password123")
+    for name, value in DEFAULT_SCALE.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=value, dest=name)
+    args = parser.parse_args(argv)
+
+    scale = {name: getattr(args, name) for name in DEFAULT_SCALE}
+    engine = create_engine(args.database_url)
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        if connection.execute(select(func.count()).select_from(models.User.__table__)).scalar():
+            print("[ERROR] База уже содержит данные. Используйте --reset или другую --database-url")
+            return 1
+
+    from app.auth import get_password_hash
+    print(f"Генерация данных (seed={args.seed}): {scale}")
+    started = time.perf_counter()
+    counts = generate(engine, scale, args.seed, args.anchor, get_password_hash(args.password))
+    for table, count in sorted(counts.items()):
+        print(f"  {table}: {count}")
+    print(f"[OK] Данные сгенерированы за {time.perf_counter() - started:.1f} с")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
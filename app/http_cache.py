@@ -0,0 +1,87 @@
+"""
+Условные GET-запросы: ETag и Last-Modified по версиям строк, ответы 304 и Cache-Control.
+
+Валидаторы считаются из id и updated_at (или created_at, если строка не менялась)
+уже загруженных строк - тело ответа для этого не сериализуется. Точность updated_at -
+миллисекунды (на SQLite func.now() переопределен в app.database).
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+# Публичные карточки: браузер и прокси могут отдавать копию недолго, дальше - перепроверка по ETag
+CACHE_CONTROL_DETAIL = "public, max-age=30, must-revalidate"
+# Ленты меняются чаще карточек
+CACHE_CONTROL_LIST = "public, max-age=15, must-revalidate"
+# Ответ зависит от пользователя (например, черновик поста) - только браузер и только с перепроверкой
+CACHE_CONTROL_PRIVATE = "private, no-cache"
+
+def row_timestamp(row) -> Optional[datetime]:
+    timestamp = getattr(row, "updated_at", None) or getattr(row, "created_at", None)
+    if timestamp is not None and timestamp.tzinfo is None:
+        # SQLite возвращает время без зоны; func.now() там пишет UTC
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+def row_version(row) -> tuple:
+    return (row.__tablename__, row.id, row_timestamp(row))
+
+def make_etag(rows: Iterable, extra: tuple = ()) -> str:
+    """Сильный ETag по версиям строк и параметрам, влияющим на ответ"""
+    parts = (extra, tuple(row_version(row) for row in rows if row is not None))
+    return '"%s"' % hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Для GET допускается слабое сравнение: W/"x" совпадает с "x"
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match важнее If-Modified-Since (RFC 9110, 13.1.3)
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    rows: Iterable,
+    cache_control: str,
+    extra: tuple = (),
+    with_last_modified: bool = True
+) -> Optional[Response]:
+    """
+    Проставить ETag, Last-Modified и Cache-Control. Если версия у клиента актуальна,
+    вернуть готовый ответ 304, иначе None - обработчик отдает тело как обычно.
+
+    Для списков with_last_modified=False: исчезновение строки из выборки не меняет
+    максимальное время изменения, и по If-Modified-Since клиент получил бы устаревший список.
+    """
+    rows = [row for row in rows if row is not None]
+    etag = make_etag(rows, extra)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    last_modified = None
+    if with_last_modified:
+        timestamps = [timestamp for timestamp in map(row_timestamp, rows) if timestamp is not None]
+        if timestamps:
+            last_modified = max(timestamps)
+            headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
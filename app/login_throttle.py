@@ -0,0 +1,181 @@
+"""
+Ограничение попыток входа перед проверкой пароля.
+
+Каждая попытка /api/auth/login сначала расходует токен из двух корзин: по IP клиента
+(LOGIN_IP_CAPACITY попыток подряд, пополнение LOGIN_IP_PER_MINUTE в минуту) и по email
+(LOGIN_EMAIL_CAPACITY, LOGIN_EMAIL_PER_MINUTE). Пустая корзина - 429 с Retry-After, до
+authenticate_user и bcrypt запрос не доходит. Пока поток попыток не прекращается,
+корзина остается пустой.
+
+Неудачные входы по email считаются подряд: после LOGIN_FREE_FAILURES каждая следующая
+ошибка блокирует email на LOGIN_BACKOFF_BASE * 2^n секунд (не больше LOGIN_BACKOFF_MAX).
+Успешный вход сбрасывает счетчик.
+
+Состояние хранится в таблице login_throttle основной базы: ограничения общие для всех
+воркеров uvicorn, корзина расходуется одним UPSERT ... RETURNING. Известные блокировки
+дополнительно помнятся в памяти воркера - повторные попытки в это время отклоняются
+без обращения к базе. Email в ключе хранится хэшем. IP берется из соединения; за
+прокси uvicorn запускается с --proxy-headers.
+
+Удаление давно неактивных строк:
+    python -m app.login_throttle
+"""
+import hashlib
+import math
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException, status
+from prometheus_client import Counter
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+LOGIN_IP_CAPACITY = float(os.getenv("LOGIN_IP_CAPACITY", "20"))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", "10"))
+LOGIN_EMAIL_CAPACITY = float(os.getenv("LOGIN_EMAIL_CAPACITY", "5"))
+LOGIN_EMAIL_PER_MINUTE = float(os.getenv("LOGIN_EMAIL_PER_MINUTE", "2"))
+LOGIN_FREE_FAILURES = int(os.getenv("LOGIN_FREE_FAILURES", "5"))
+LOGIN_BACKOFF_BASE = float(os.getenv("LOGIN_BACKOFF_BASE", "2"))
+LOGIN_BACKOFF_MAX = float(os.getenv("LOGIN_BACKOFF_MAX", "900"))
+# Строки без попыток дольше этого срока удаляет python -m app.login_throttle
+IDLE_SECONDS = 24 * 3600
+
+THROTTLE = models.LoginThrottle.__table__
+
+LOGIN_THROTTLED = Counter(
+    "login_throttled_total", "Попытки входа, отклоненные до проверки пароля",
+    ["reason"]
+)
+
+class _BlockCache:
+    """Известные блокировки ключей в памяти воркера: key -> blocked_until"""
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._until = {}
+
+    def get(self, key: str, now: float) -> float:
+        until = self._until.get(key, 0.0)
+        return until if until > now else 0.0
+
+    def set(self, key: str, until: float, now: float):
+        with self._lock:
+            if len(self._until) >= self.MAX_ENTRIES:
+                self._until = {k: v for k, v in self._until.items() if v > now}
+            self._until[key] = until
+
+    def discard(self, key: str):
+        with self._lock:
+            self._until.pop(key, None)
+
+blocks = _BlockCache()
+
+def ip_key(ip: str) -> str:
+    return f"ip:{ip}"[:64]
+
+def email_key(email: str) -> str:
+    return "email:" + hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+def _rejected(reason: str, retry_after: float) -> HTTPException:
+    LOGIN_THROTTLED.labels(reason).inc()
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts, retry later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+async def _consume(db: AsyncSession, key: str, capacity: float, per_second: float, now: float):
+    """Пополнить корзину за прошедшее время и взять токен; (токенов осталось, blocked_until)"""
+    refilled = THROTTLE.c.tokens + (now - THROTTLE.c.updated_at) * per_second
+    taken = case((refilled > capacity, capacity), else_=refilled) - 1
+    # Не ниже -1: отклоненные попытки не копят долг, корзина пополняется с паузы в потоке
+    tokens = case((taken < -1, -1.0), else_=taken)
+    dialect = db.bind.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(THROTTLE).values(
+            key=key, tokens=capacity - 1, updated_at=now, failures=0, blocked_until=0.0
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[THROTTLE.c.key], set_={"tokens": tokens, "updated_at": now}
+        ).returning(THROTTLE.c.tokens, THROTTLE.c.blocked_until)
+        return (await db.execute(statement)).one()
+    result = await db.execute(
+        update(THROTTLE).where(THROTTLE.c.key == key).values(tokens=tokens, updated_at=now)
+    )
+    if result.rowcount == 0:
+        await db.execute(insert(THROTTLE).values(
+            key=key, tokens=capacity - 1, updated_at=now, failures=0, blocked_until=0.0
+        ))
+    return (await db.execute(
+        select(THROTTLE.c.tokens, THROTTLE.c.blocked_until).where(THROTTLE.c.key == key)
+    )).one()
+
+async def check(db: AsyncSession, ip: Optional[str], email: str):
+    """Взять токены попытки входа по IP и email; 429, если корзина пуста или email заблокирован"""
+    now = time.time()
+    account = email_key(email)
+    # Дешевый путь: блокировка уже известна этому воркеру
+    blocked_until = blocks.get(account, now)
+    if blocked_until:
+        raise _rejected("backoff", blocked_until - now)
+
+    buckets = [(account, LOGIN_EMAIL_CAPACITY, LOGIN_EMAIL_PER_MINUTE, "email_rate")]
+    if ip:
+        buckets.insert(0, (ip_key(ip), LOGIN_IP_CAPACITY, LOGIN_IP_PER_MINUTE, "ip_rate"))
+    try:
+        for key, capacity, per_minute, reason in buckets:
+            tokens, blocked_until = await _consume(db, key, capacity, per_minute / 60, now)
+            if blocked_until > now:
+                blocks.set(key, blocked_until, now)
+                raise _rejected("backoff", blocked_until - now)
+            if tokens < 0:
+                # Следующая попытка пройдет, когда в корзине наберется целый токен
+                raise _rejected(reason, (1 - tokens) / (per_minute / 60) if per_minute > 0 else LOGIN_BACKOFF_MAX)
+    finally:
+        # Блокировки строк не держим на время bcrypt
+        await db.commit()
+
+async def record_failure(db: AsyncSession, email: str):
+    """Неудачный вход: после LOGIN_FREE_FAILURES ошибок подряд - блокировка с удвоением"""
+    now = time.time()
+    key = email_key(email)
+    await db.execute(update(THROTTLE).where(THROTTLE.c.key == key).values(failures=THROTTLE.c.failures + 1))
+    failures = (await db.execute(select(THROTTLE.c.failures).where(THROTTLE.c.key == key))).scalar() or 0
+    if failures > LOGIN_FREE_FAILURES:
+        blocked_until = now + min(LOGIN_BACKOFF_MAX, LOGIN_BACKOFF_BASE * 2 ** min(failures - LOGIN_FREE_FAILURES - 1, 30))
+        await db.execute(update(THROTTLE).where(THROTTLE.c.key == key).values(blocked_until=blocked_until))
+        blocks.set(key, blocked_until, now)
+    await db.commit()
+
+async def record_success(db: AsyncSession, email: str):
+    """Успешный вход сбрасывает счетчик ошибок email; сохраняет вызывающий commit"""
+    key = email_key(email)
+    await db.execute(update(THROTTLE).where(THROTTLE.c.key == key).values(failures=0, blocked_until=0.0))
+    blocks.discard(key)
+
+def purge_idle(connection, now: Optional[float] = None) -> int:
+    """Удалить строки без попыток дольше IDLE_SECONDS и без действующей блокировки"""
+    now = now or time.time()
+    return connection.execute(delete(THROTTLE).where(
+        THROTTLE.c.updated_at < now - IDLE_SECONDS, THROTTLE.c.blocked_until < now
+    )).rowcount
+
+if __name__ == "__main__":
+    from app.database import engine, Base
+
+    Base.metadata.create_all(bind=engine, tables=[THROTTLE])
+    try:
+        with engine.begin() as connection:
+            removed = purge_idle(connection)
+        print(f"[OK] Удалено неактивных строк ограничения входа: {removed}")
+    except Exception as e:
+        print(f"[ERROR] Ошибка: {e}")
+        sys.exit(1)
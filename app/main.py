@@ -1,19 +1,71 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import timedelta
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from app.database import engine, Base, log_engine_settings, ReadYourWritesMiddleware, all_sync_engines, named_sync_engines
+from app import (
+    compression, metrics, passwords, query_stats, refresh_tokens, rollups, search, stats_snapshot, user_counters
+)
+from app.auth import install_user_cache, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.pagination import NEXT_CURSOR_HEADER
+from app.structured_logging import configure_logging, RequestIdMiddleware, REQUEST_ID_HEADER
 from app.routers import (
     auth, users, services, bookings, reviews, admin, professional, client, tracker,
     admin_tracker, blog, admin_blog, news, admin_news, products, professional_products,
-    product_orders, admin_products
+    product_orders, admin_products, admin_export, admin_analytics
 )
 
+# JSON-логи через очередь и фоновый писатель (app.structured_logging)
+configure_logging()
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
+# Полнотекстовые индексы для баз, созданных до появления поиска
+search.ensure_search_indexes(engine)
+
+# Учет SQL-запросов для заголовков X-DB-* и сводки /api/admin/perf/queries
+for sync_engine in all_sync_engines():
+    query_stats.instrument(sync_engine)
+
+# Дневные сводки и счетчики кабинетов для баз, созданных до их появления, - до того,
+# как flush начнет прибавлять к ним изменения
+rollups.ensure_built(engine)
+user_counters.ensure_built(engine)
+
+# Снимок статистики, дневные сводки и счетчики кабинетов обновляются при каждой записи через ORM
+stats_snapshot.install()
+rollups.install()
+user_counters.install()
+# Кэш пользователей по токену сбрасывается после commit изменений users
+install_user_cache()
+
+# Метрики Prometheus: пулы соединений и счетчики SQL по каждому движку
+for name, sync_engine in named_sync_engines().items():
+    metrics.instrument(sync_engine, name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_engine_settings()
+    sampler = asyncio.create_task(metrics.sample_periodically(named_sync_engines()))
+    reconciler = asyncio.create_task(stats_snapshot.reconcile_periodically(engine))
+    counters_reconciler = asyncio.create_task(user_counters.reconcile_periodically(engine))
+    # Отозванные входы: access-токены старше ACCESS_TOKEN_EXPIRE_MINUTES истекают сами
+    revocations = asyncio.create_task(
+        refresh_tokens.sync_periodically(engine, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    )
+    yield
+    sampler.cancel()
+    reconciler.cancel()
+    counters_reconciler.cancel()
+    revocations.cancel()
+    passwords.shutdown()
 
 app = FastAPI(
     title="Suluu",
     description="Beauty Services",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -23,8 +75,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Курсор следующей страницы списков (app.pagination)
+    expose_headers=[NEXT_CURSOR_HEADER, REQUEST_ID_HEADER],
 )
 
+# Чтение своих записей: после изменений клиент временно читает с основной базы
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(query_stats.QueryStatsMiddleware)
+# Сжатие ответов gzip/brotli; снаружи от него метрики видят итоговый размер ответа
+app.add_middleware(compression.CompressionMiddleware)
+# Внешний слой: время ответа включает все остальные middleware
+app.add_middleware(metrics.MetricsMiddleware)
+# request_id задается до всех остальных слоев - их логи тоже с ним
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
@@ -44,6 +108,8 @@ app.include_router(products.router, prefix="/api/products", tags=["products"])
 app.include_router(professional_products.router, prefix="/api/professional/products", tags=["professional-products"])
 app.include_router(product_orders.router, prefix="/api/product-orders", tags=["product-orders"])
 app.include_router(admin_products.router, prefix="/api/admin/products", tags=["admin-products"])
+app.include_router(admin_export.router, prefix="/api/admin/export", tags=["admin-export"])
+app.include_router(admin_analytics.router, prefix="/api/admin/analytics", tags=["admin-analytics"])
 
 @app.get("/")
 async def root():
@@ -53,3 +119,8 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    metrics.sample_pools(named_sync_engines())
+    return metrics.render_metrics()
+
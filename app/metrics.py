@@ -0,0 +1,166 @@
+"""
+Метрики приложения в формате Prometheus (эндпоинт /metrics).
+
+Каждый воркер пишет значения только в свои счетчики, без общих блокировок между
+процессами. При запуске нескольких воркеров uvicorn задайте PROMETHEUS_MULTIPROC_DIR
+(пустой каталог, общий для воркеров) - тогда /metrics любого воркера отдает сумму по всем.
+Каталог нужно очищать перед стартом сервера, иначе останутся значения прошлых запусков.
+"""
+import asyncio
+import os
+import time
+from functools import wraps
+
+from anyio import to_thread
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from starlette.responses import Response
+
+from app.query_stats import route_template
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Как часто обновлять показатели пулов соединений и потоков, секунды
+SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Размер тела ответа",
+    ["method", "route"], buckets=SIZE_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Запросы в обработке",
+    ["method"], multiprocess_mode="livesum"
+)
+THREADPOOL_BUSY = Gauge(
+    "threadpool_busy_threads", "Занятые потоки пула для синхронных обработчиков",
+    multiprocess_mode="livesum"
+)
+THREADPOOL_SIZE = Gauge(
+    "threadpool_max_threads", "Размер пула потоков для синхронных обработчиков",
+    multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Соединения, выданные из пула",
+    ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Соединения сверх pool_size",
+    ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Настроенный размер пула соединений",
+    ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds", "Ожидание соединения из пула (включая открытие нового)",
+    ["engine"], buckets=LATENCY_BUCKETS
+)
+DB_STATEMENTS = Counter(
+    "db_statements_total", "Выполненные SQL-выражения",
+    ["engine", "operation"]
+)
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+def _statement_operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].upper()
+    return operation if operation in _OPERATIONS else "OTHER"
+
+def _time_pool_checkout(pool, name: str):
+    """Обернуть выдачу соединения пулом замером времени ожидания"""
+    do_get = pool._do_get
+    histogram = DB_POOL_CHECKOUT.labels(name)
+
+    @wraps(do_get)
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    pool._do_get = timed_do_get
+
+def instrument(sync_engine, name: str):
+    """Подключить метрики пула и SQL-выражений к движку"""
+    counters = {operation: DB_STATEMENTS.labels(name, operation) for operation in _OPERATIONS | {"OTHER"}}
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counters[_statement_operation(statement)].inc()
+
+    def engine_disposed(conn):
+        # dispose() создает новый пул - оборачиваем и его
+        _time_pool_checkout(sync_engine.pool, name)
+
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(sync_engine, "engine_disposed", engine_disposed)
+    _time_pool_checkout(sync_engine.pool, name)
+
+def sample_pools(engines: dict):
+    """Снять показатели пулов соединений и пула потоков (вызывать из event loop)"""
+    for name, sync_engine in engines.items():
+        pool = sync_engine.pool
+        if hasattr(pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.labels(name).set(pool.checkedout())
+            DB_POOL_OVERFLOW.labels(name).set(max(pool.overflow(), 0))
+            DB_POOL_SIZE.labels(name).set(pool.size())
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+
+async def sample_periodically(engines: dict):
+    """Фоновая задача: обновлять показатели пулов раз в SAMPLE_INTERVAL секунд"""
+    while True:
+        sample_pools(engines)
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+def render_metrics() -> Response:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+class MetricsMiddleware:
+    """Время ответа, размер тела и число запросов в обработке"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = route_template(scope)
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(time.perf_counter() - started)
+            RESPONSE_SIZE.labels(method, route).observe(size)
@@ -0,0 +1,43 @@
+"""
+Скрипт для миграции: создание составных и частичных индексов, объявленных в моделях.
+Индекс с тем же именем, но другим набором колонок пересоздается.
+"""
+from sqlalchemy import inspect
+from app.database import engine, Base
+from app import models  # noqa: F401 - регистрирует модели в Base.metadata
+
+def migrate_indexes():
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = 0
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            # Таблица будет создана целиком вместе с индексами через create_all
+            continue
+
+        existing_indexes = {index["name"]: index["column_names"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            columns = [column.name for column in index.columns]
+            if index.name in existing_indexes:
+                if existing_indexes[index.name] == columns:
+                    continue
+                print(f"Пересоздание индекса {index.name} на {table.name}: {columns}...")
+                index.drop(bind=engine)
+            else:
+                print(f"Создание индекса {index.name} на {table.name}...")
+            index.create(bind=engine)
+            created += 1
+
+    # Обновляем статистику планировщика, чтобы новые индексы сразу учитывались
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+    print(f"[OK] Создано индексов: {created}")
+
+if __name__ == "__main__":
+    try:
+        migrate_indexes()
+    except Exception as e:
+        print(f"\n[ERROR] Ошибка при создании индексов: {e}")
+        raise
@@ -0,0 +1,35 @@
+"""
+Скрипт для миграции: добавление колонки updated_at в таблицы, где ее объявили в моделях
+(services, reviews, news_items и категории), для ETag/Last-Modified
+"""
+from sqlalchemy import inspect
+from app.database import engine, Base
+from app import models  # noqa: F401 - регистрирует модели в Base.metadata
+
+def migrate_updated_at():
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = 0
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables or "updated_at" not in table.columns:
+                continue
+
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            if "updated_at" in columns:
+                continue
+
+            column_type = table.columns["updated_at"].type.compile(dialect=engine.dialect)
+            print(f"Добавление поля 'updated_at' в {table.name}...")
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN updated_at {column_type}")
+            added += 1
+
+    print(f"[OK] Добавлено колонок: {added}")
+
+if __name__ == "__main__":
+    try:
+        migrate_updated_at()
+    except Exception as e:
+        print(f"\n[ERROR] Ошибка при выполнении миграции: {e}")
+        raise
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from app import search
 import enum
 
 class UserRole(str, enum.Enum):
@@ -56,6 +57,11 @@ class User(Base):
     products_sold = relationship("Product", foreign_keys="Product.seller_id")
     product_orders_as_client = relationship("ProductOrder", foreign_keys="ProductOrder.client_id")
     product_orders_as_seller = relationship("ProductOrder", foreign_keys="ProductOrder.seller_id")
+    
+    __table_args__ = (
+        Index("ix_users_role_rating", "role", "rating"),
+        Index("ix_users_created_at", "created_at", "id"),
+    )
 
 class Service(Base):
     __tablename__ = "services"
@@ -74,9 +80,19 @@ class Service(Base):
     image_url = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     professional = relationship("User", back_populates="services")
     bookings = relationship("Booking", back_populates="service")
+    
+    __table_args__ = (
+        Index("ix_services_professional_created", "professional_id", "created_at"),
+        # Публичный каталог почти всегда фильтрует is_active == True
+        Index("ix_services_active_category", "category",
+              sqlite_where=is_active == True, postgresql_where=is_active == True),
+        Index("ix_services_active_professional", "professional_id",
+              sqlite_where=is_active == True, postgresql_where=is_active == True),
+    )
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -99,6 +115,17 @@ class Booking(Base):
     professional = relationship("User", foreign_keys=[professional_id], back_populates="bookings_as_professional")
     service = relationship("Service", back_populates="bookings")
     review = relationship("Review", back_populates="booking", uselist=False)
+    
+    # Индексы лент заканчиваются на id - это ключ курсорной пагинации (app.pagination)
+    __table_args__ = (
+        Index("ix_bookings_professional_status_date", "professional_id", "status", "booking_date"),
+        Index("ix_bookings_professional_date", "professional_id", "booking_date", "id"),
+        Index("ix_bookings_professional_created", "professional_id", "created_at", "id"),
+        Index("ix_bookings_client_created", "client_id", "created_at", "id"),
+        Index("ix_bookings_client_date", "client_id", "booking_date", "id"),
+        Index("ix_bookings_status_created", "status", "created_at", "id"),
+        Index("ix_bookings_created_at", "created_at", "id"),
+    )
 
 class Review(Base):
     __tablename__ = "reviews"
@@ -110,10 +137,17 @@ class Review(Base):
     rating = Column(Integer, nullable=False)  # 1-5
     comment = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     booking = relationship("Booking", back_populates="review")
     client = relationship("User", foreign_keys=[client_id], back_populates="reviews_given")
     professional = relationship("User", foreign_keys=[professional_id], back_populates="reviews_received")
+    
+    __table_args__ = (
+        Index("ix_reviews_professional_created", "professional_id", "created_at", "id"),
+        Index("ix_reviews_client_created", "client_id", "created_at"),
+        Index("ix_reviews_created_at", "created_at", "id"),
+    )
 
 # Beauty Tracker Models
 class HabitCategory(str, enum.Enum):
@@ -184,6 +218,10 @@ class TrackerProgramDay(Base):
     # Relationships
     template = relationship("TrackerProgramTemplate", back_populates="program_days")
     day_habits = relationship("TrackerProgramDayHabit", back_populates="program_day", order_by="TrackerProgramDayHabit.sort_order")
+    
+    __table_args__ = (
+        Index("ix_tracker_program_days_template_day", "program_template_id", "day_number"),
+    )
 
 class TrackerProgramDayHabit(Base):
     __tablename__ = "tracker_program_day_habits"
@@ -196,6 +234,11 @@ class TrackerProgramDayHabit(Base):
     # Relationships
     program_day = relationship("TrackerProgramDay", back_populates="day_habits")
     habit = relationship("TrackerHabit", back_populates="program_day_habits")
+    
+    __table_args__ = (
+        Index("ix_tracker_program_day_habits_day_sort", "program_day_id", "sort_order"),
+        Index("ix_tracker_program_day_habits_habit", "habit_id"),
+    )
 
 class TrackerUserProgram(Base):
     __tablename__ = "tracker_user_programs"
@@ -213,6 +256,10 @@ class TrackerUserProgram(Base):
     user = relationship("User")
     template = relationship("TrackerProgramTemplate", back_populates="user_programs")
     user_days = relationship("TrackerUserDay", back_populates="user_program", order_by="TrackerUserDay.day_number")
+    
+    __table_args__ = (
+        Index("ix_tracker_user_programs_user_status", "user_id", "status"),
+    )
 
 class TrackerUserDay(Base):
     __tablename__ = "tracker_user_days"
@@ -228,6 +275,11 @@ class TrackerUserDay(Base):
     user_program = relationship("TrackerUserProgram", back_populates="user_days")
     program_day = relationship("TrackerProgramDay", foreign_keys="TrackerProgramDay.day_number", primaryjoin="TrackerUserDay.day_number == TrackerProgramDay.day_number", viewonly=True)
     logs = relationship("TrackerUserDayLog", back_populates="user_day")
+    
+    __table_args__ = (
+        Index("ix_tracker_user_days_program_day", "user_program_id", "day_number"),
+        Index("ix_tracker_user_days_program_status", "user_program_id", "status"),
+    )
 
 class TrackerUserDayLog(Base):
     __tablename__ = "tracker_user_day_logs"
@@ -241,6 +293,10 @@ class TrackerUserDayLog(Base):
     # Relationships
     user_day = relationship("TrackerUserDay", back_populates="logs")
     habit = relationship("TrackerHabit", back_populates="user_day_logs")
+    
+    __table_args__ = (
+        Index("ix_tracker_user_day_logs_day_habit", "user_day_id", "habit_id"),
+    )
 
 # Blog Models
 class BlogPostStatus(str, enum.Enum):
@@ -260,6 +316,7 @@ class BlogCategory(Base):
     name_ky = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     posts = relationship("BlogPost", back_populates="category")
@@ -295,6 +352,12 @@ class BlogPost(Base):
     author = relationship("User")
     category = relationship("BlogCategory", back_populates="posts")
     tags = relationship("BlogPostTag", back_populates="post")
+    
+    __table_args__ = (
+        Index("ix_blog_posts_status_published", "status", "published_at", "created_at", "id"),
+        Index("ix_blog_posts_author_created", "author_id", "created_at"),
+        Index("ix_blog_posts_created_at", "created_at", "id"),
+    )
 
 class BlogPostTag(Base):
     __tablename__ = "blog_post_tags"
@@ -307,6 +370,11 @@ class BlogPostTag(Base):
     # Relationships
     post = relationship("BlogPost", back_populates="tags")
     tag = relationship("BlogTag", back_populates="posts")
+    
+    __table_args__ = (
+        Index("ix_blog_post_tags_post", "post_id"),
+        Index("ix_blog_post_tags_tag", "tag_id"),
+    )
 
 # News/Useful Models
 class NewsSourceStatus(str, enum.Enum):
@@ -345,6 +413,7 @@ class NewsCategory(Base):
     name_ky = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     items = relationship("NewsItem", back_populates="category")
@@ -362,10 +431,18 @@ class NewsItem(Base):
     published_at = Column(DateTime(timezone=True), nullable=True)  # Дата публикации в источнике
     status = Column(Enum(NewsItemStatus), default=NewsItemStatus.ACTIVE)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     source = relationship("NewsSource", back_populates="items")
     category = relationship("NewsCategory", back_populates="items")
+    
+    __table_args__ = (
+        Index("ix_news_items_status_published", "status", "published_at", "created_at", "id"),
+        Index("ix_news_items_source", "source_id"),
+        Index("ix_news_items_category", "category_id"),
+        Index("ix_news_items_created_at", "created_at", "id"),
+    )
 
 # Products Models
 class ProductOrderStatus(str, enum.Enum):
@@ -386,6 +463,7 @@ class ProductCategory(Base):
     name_ky = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     products = relationship("Product", back_populates="category")
@@ -414,6 +492,16 @@ class Product(Base):
     category = relationship("ProductCategory", back_populates="products")
     images = relationship("ProductImage", back_populates="product", order_by="ProductImage.sort_order")
     order_items = relationship("ProductOrderItem", back_populates="product")
+    
+    __table_args__ = (
+        Index("ix_products_seller_created", "seller_id", "created_at"),
+        Index("ix_products_created_at", "created_at", "id"),
+        # Каталог показывает только активные товары
+        Index("ix_products_active_created", "created_at", "id",
+              sqlite_where=is_active == True, postgresql_where=is_active == True),
+        Index("ix_products_active_category_created", "category_id", "created_at", "id",
+              sqlite_where=is_active == True, postgresql_where=is_active == True),
+    )
 
 class ProductImage(Base):
     __tablename__ = "product_images"
@@ -426,6 +514,10 @@ class ProductImage(Base):
     
     # Relationships
     product = relationship("Product", back_populates="images")
+    
+    __table_args__ = (
+        Index("ix_product_images_product_sort", "product_id", "sort_order"),
+    )
 
 class ProductOrder(Base):
     __tablename__ = "product_orders"
@@ -445,6 +537,11 @@ class ProductOrder(Base):
     client = relationship("User", foreign_keys=[client_id])
     seller = relationship("User", foreign_keys=[seller_id])
     items = relationship("ProductOrderItem", back_populates="order")
+    
+    __table_args__ = (
+        Index("ix_product_orders_client_created", "client_id", "created_at", "id"),
+        Index("ix_product_orders_seller_created", "seller_id", "created_at", "id"),
+    )
 
 class ProductOrderItem(Base):
     __tablename__ = "product_order_items"
@@ -459,3 +556,88 @@ class ProductOrderItem(Base):
     # Relationships
     order = relationship("ProductOrder", back_populates="items")
     product = relationship("Product", back_populates="order_items")
+    
+    __table_args__ = (
+        Index("ix_product_order_items_order", "order_id"),
+    )
+
+class StatsCounter(Base):
+    """Счетчик снимка статистики админки (app.stats_snapshot)"""
+    __tablename__ = "stats_counters"
+    
+    name = Column(String, primary_key=True)
+    value = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    reconciled_at = Column(DateTime(timezone=True), nullable=False)
+
+class RefreshToken(Base):
+    """
+    Refresh-токен (app.refresh_tokens). Хранится только SHA-256 значения; family_id -
+    цепочка ротаций одного входа: повторное предъявление использованного токена отзывает всю цепочку.
+    """
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+class LoginThrottle(Base):
+    """
+    Состояние ограничения попыток входа (app.login_throttle) по ключу "ip:..." или "email:...":
+    корзина токенов и число неудачных входов подряд с блокировкой до blocked_until.
+    Время - секунды Unix, общие для всех воркеров.
+    """
+    __tablename__ = "login_throttle"
+    
+    key = Column(String(64), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True)
+    failures = Column(Integer, nullable=False, default=0)
+    blocked_until = Column(Float, nullable=False, default=0.0)
+
+class UserCounter(Base):
+    """
+    Счетчики кабинета пользователя (app.user_counters), отдельно по каждой стороне:
+    side = CLIENT - бронирования и отзывы, где он клиент, и его расходы; side = PROFESSIONAL -
+    где он мастер, его выручка и активные услуги.
+    """
+    __tablename__ = "user_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, autoincrement=False)
+    side = Column(Enum(UserRole), primary_key=True)
+    bookings_total = Column(Integer, nullable=False, default=0)
+    bookings_completed = Column(Integer, nullable=False, default=0)
+    bookings_pending = Column(Integer, nullable=False, default=0)
+    completed_amount = Column(Float, nullable=False, default=0.0)
+    reviews = Column(Integer, nullable=False, default=0)
+    services_active = Column(Integer, nullable=False, default=0)
+
+class BookingDailyRollup(Base):
+    """
+    Бронирования за день по категории, мастеру и статусу (app.rollups).
+    Строки с professional_id = 0 - сумма по всем мастерам.
+    """
+    __tablename__ = "booking_daily_rollups"
+    
+    # Порядок ключа - под выборку диапазона дней одного мастера (или всех)
+    professional_id = Column(Integer, primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True)
+    category = Column(Enum(ServiceCategory), primary_key=True)
+    status = Column(Enum(BookingStatus), primary_key=True)
+    bookings = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)  # Сумма завершенных бронирований
+
+# Полнотекстовый поиск (app.search): индексы создаются вместе с таблицами
+search.register(BlogPost.__table__, {
+    "title": search.TITLE, "title_ru": search.TITLE, "title_ky": search.TITLE, "content": search.BODY,
+})
+search.register(NewsItem.__table__, {"title": search.TITLE, "excerpt": search.BODY})
+search.register(Product.__table__, {
+    "name": search.TITLE, "name_ru": search.TITLE, "name_ky": search.TITLE,
+    "description": search.BODY, "description_ru": search.BODY, "description_ky": search.BODY,
+})
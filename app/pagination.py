@@ -0,0 +1,150 @@
+"""
+Курсорная (keyset) пагинация списков.
+
+Курсор - непрозрачный токен с ключом сортировки последней строки страницы
+(например, created_at и id). Следующая страница выбирается условием
+(created_at, id) < (курсор) по индексу, который заканчивается теми же колонками,
+поэтому глубокие страницы не просматривают и не отбрасывают предыдущие строки, как offset.
+
+Курсор следующей страницы отдается в заголовке X-Next-Cursor: тело ответа остается
+списком, и существующие клиенты не меняются. Если заголовка нет - страница последняя.
+skip остается для старых клиентов и игнорируется, если передан cursor.
+
+Выдача поиска сортируется по релевантности, у которой нет ключа для сравнения:
+там курсор хранит смещение (результаты поиска листают неглубоко).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, and_, func, select, tuple_, union_all
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Верхняя граница страницы для списков, которые раньше отдавались целиком
+MAX_PAGE_SIZE = 500
+
+class Keyset:
+    """
+    Ключ сортировки списка: колонки по убыванию, последняя - первичный ключ.
+
+    Первая колонка может допускать NULL (published_at): такие строки идут в конце
+    списка (NULLS LAST), как и раньше в SQLite при сортировке по убыванию.
+    """
+
+    def __init__(self, *columns, nullable_first: bool = False):
+        self.columns = columns
+        self.id_column = columns[-1]
+        self.nullable_first = nullable_first
+
+    def order_by(self) -> list:
+        clauses = [column.desc() for column in self.columns]
+        if self.nullable_first:
+            clauses[0] = clauses[0].nulls_last()
+        return clauses
+
+    def cursor(self, row) -> str:
+        values = [getattr(row, column.key) for column in self.columns]
+        return _encode([value.isoformat() if isinstance(value, datetime) else value for value in values])
+
+    def decode(self, cursor: str) -> list:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if not isinstance(payload, list) or len(payload) != len(self.columns):
+                raise ValueError("cursor length")
+            values = []
+            for column, value in zip(self.columns, payload):
+                if value is not None and isinstance(column.type, DateTime):
+                    value = datetime.fromisoformat(value)
+                values.append(value)
+            if not isinstance(values[-1], int) or any(value is None for value in values[1:]):
+                raise ValueError("cursor values")
+            if values[0] is None and not self.nullable_first:
+                raise ValueError("cursor values")
+        except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return values
+
+    def _anchor(self, columns, values, anchor_id: int) -> list:
+        # Значения берутся из самой строки-курсора: в SQLite время хранится текстом в разных
+        # форматах, и значение из токена могло бы не совпасть с сохраненным побайтно.
+        # Если строку удалили, используем значения из токена.
+        return [
+            func.coalesce(select(column).where(self.id_column == anchor_id).scalar_subquery(), value)
+            for column, value in zip(columns, values)
+        ] + [anchor_id]
+
+    def after(self, query, cursor: str, limit: int):
+        """Условие "строки после курсора" в порядке order_by() для страницы из limit строк"""
+        values = self.decode(cursor)
+        anchor_id = values[-1]
+        first, rest = self.columns[0], self.columns[1:-1]
+        if self.nullable_first and values[0] is None:
+            # Курсор уже в хвосте строк с NULL: дальше только они
+            return and_(first.is_(None), tuple_(*self.columns[1:]) < tuple_(*self._anchor(rest, values[1:-1], anchor_id)))
+        condition = tuple_(*self.columns) < tuple_(*self._anchor(self.columns[:-1], values[:-1], anchor_id))
+        if not self.nullable_first:
+            return condition
+        # "condition OR first IS NULL" индекс по диапазону не использует - проход шел бы
+        # с начала ленты. Поэтому id страницы выбираются двумя диапазонами: строки до
+        # курсора и начало хвоста с NULL, - а порядок и limit применяются к их объединению.
+        ids = query.with_entities(self.id_column) if isinstance(query, Query) else query.with_only_columns(self.id_column)
+        head = ids.filter(condition).order_by(*self.order_by()).limit(limit).subquery()
+        tail = ids.filter(first.is_(None)).order_by(*self.order_by()).limit(limit).subquery()
+        return self.id_column.in_(union_all(select(*head.c), select(*tail.c)))
+
+def paginate(query, keyset: Keyset, cursor: Optional[str], skip: int, limit: int):
+    """
+    Упорядочить запрос по ключу и выбрать страницу: по курсору или по устаревшему skip.
+    Берется на одну строку больше limit, чтобы понять, есть ли следующая страница.
+    """
+    page = query.order_by(*keyset.order_by())
+    if cursor:
+        page = page.filter(keyset.after(query, cursor, limit + 1))
+    elif skip:
+        page = page.offset(skip)
+    return page.limit(limit + 1)
+
+def _encode(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def _decode_offset(cursor: str) -> int:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = payload["offset"]
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("cursor offset")
+    except (ValueError, TypeError, KeyError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+def paginate_ranked(query, rank, id_column, cursor: Optional[str], skip: int, limit: int) -> Tuple[object, int]:
+    """Страница выдачи по релевантности (rank по возрастанию): (запрос, смещение страницы)"""
+    offset = _decode_offset(cursor) if cursor else skip
+    return query.order_by(rank, id_column.desc()).offset(offset).limit(limit + 1), offset
+
+def next_ranked_page(rows: list, offset: int, limit: int) -> Tuple[List, dict]:
+    if len(rows) <= limit:
+        return rows, {}
+    return rows[:limit], {NEXT_CURSOR_HEADER: _encode({"offset": offset + limit})}
+
+def next_page(rows: list, keyset: Keyset, limit: int) -> Tuple[List, dict]:
+    """Обрезать лишнюю строку и вернуть (строки, заголовки с курсором следующей страницы)"""
+    if len(rows) <= limit:
+        return rows, {}
+    rows = rows[:limit]
+    return rows, {NEXT_CURSOR_HEADER: keyset.cursor(rows[-1])}
+
+def select_page(query, keyset: Keyset, cursor: Optional[str], skip: int, limit: int, rank=None):
+    """
+    Запрос страницы и функция rows -> (строки, заголовки): по ключу keyset, а для
+    выдачи поиска (rank не None) - по релевантности.
+    """
+    if rank is None:
+        return paginate(query, keyset, cursor, skip, limit), lambda rows: next_page(rows, keyset, limit)
+    page, offset = paginate_ranked(query, rank, keyset.id_column, cursor, skip, limit)
+    return page, lambda rows: next_ranked_page(rows, offset, limit)
@@ -0,0 +1,84 @@
+"""
+Хэширование и проверка паролей bcrypt в отдельном пуле процессов.
+
+Один вызов bcrypt - сотни миллисекунд CPU под GIL: внутри воркера всплеск входов
+занимал бы потоки пула и тормозил все остальные эндпоинты. Асинхронные hash_password
+и verify_and_update отправляют работу в пул из PASSWORD_POOL_SIZE процессов
+(0 - в пул потоков текущего процесса) и ждут ее, не блокируя цикл событий.
+
+Очередь ограничена: если в пуле и в ожидании уже PASSWORD_POOL_SIZE + PASSWORD_QUEUE_LIMIT
+операций, новый запрос сразу получает 503 с Retry-After, а не ждет неограниченно.
+
+Стоимость задается BCRYPT_ROUNDS. Хэши с другой стоимостью остаются рабочими и
+пересохраняются с текущей при следующем успешном входе (verify_and_update).
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from anyio import to_thread
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", "2"))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0  # операции в пуле и в очереди; меняется только в цикле событий
+
+# Функции пула: выполняются в дочерних процессах, поэтому на уровне модуля
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_and_update_sync(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(пароль верен, новый хэш - если стоимость хэша отличается от BCRYPT_ROUNDS)"""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: fork процесса с потоками (пул потоков, фоновые задачи) может унаследовать занятые блокировки
+        _executor = ProcessPoolExecutor(PASSWORD_POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def shutdown():
+    """Остановить пул процессов (при остановке приложения)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def _run(function, *args):
+    global _executor, _pending
+    if _pending >= max(PASSWORD_POOL_SIZE, 0) + PASSWORD_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent password operations, retry later",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        if PASSWORD_POOL_SIZE <= 0:
+            return await to_thread.run_sync(function, *args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(_pool(), function, *args)
+        except BrokenProcessPool:
+            # Процесс пула завершился аварийно - пул пересоздается, операция повторяется один раз
+            _executor = None
+            return await loop.run_in_executor(_pool(), function, *args)
+    finally:
+        _pending -= 1
+
+async def hash_password(password: str) -> str:
+    return await _run(hash_password_sync, password)
+
+async def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update_sync, password, hashed_password)
@@ -0,0 +1,181 @@
+"""
+Учет SQL-запросов в рамках HTTP-запроса: количество, время в БД и поиск N+1.
+
+Хуки SQLAlchemy before/after_cursor_execute пишут в объект статистики текущего
+запроса (через contextvar), middleware добавляет заголовки X-DB-Queries,
+X-DB-Time-ms, X-DB-N-Plus-One и копит скользящую сводку по маршрутам.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз одинаковый по форме запрос может повториться, прежде чем считаться N+1
+NPLUSONE_THRESHOLD = int(os.getenv("DB_NPLUSONE_THRESHOLD", "3"))
+# Сколько последних запросов хранить в сводке по каждому маршруту
+ROUTE_WINDOW = int(os.getenv("DB_QUERY_STATS_WINDOW", "500"))
+
+_current_stats: ContextVar[Optional["RequestQueryStats"]] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))+\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса без значений: одинаковые запросы с разными параметрами совпадают"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("(?...)", shape)
+
+class RequestQueryStats:
+    """Статистика SQL одного HTTP-запроса"""
+
+    __slots__ = ("count", "duration", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+    def repeated_shapes(self, threshold: int = NPLUSONE_THRESHOLD) -> list:
+        """Формы запросов, повторившиеся threshold и более раз - вероятный N+1"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+def collect():
+    """Начать сбор статистики в текущем контексте; возвращает объект статистики и токен"""
+    stats = RequestQueryStats()
+    return stats, _current_stats.set(stats)
+
+def stop(token):
+    _current_stats.reset(token)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+def instrument(sync_engine):
+    """Подключить учет запросов к движку (для асинхронного - к его sync_engine)"""
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+class RouteQuerySummary:
+    """Скользящая сводка по маршрутам за последние ROUTE_WINDOW запросов"""
+
+    def __init__(self, window: int = ROUTE_WINDOW):
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self._window))
+        self._repeated = defaultdict(Counter)
+
+    def add(self, route: str, stats: RequestQueryStats):
+        repeated = stats.repeated_shapes()
+        with self._lock:
+            self._samples[route].append((stats.count, stats.duration_ms, bool(repeated)))
+            for shape, count in repeated:
+                self._repeated[route][shape] += 1
+
+    def snapshot(self) -> list:
+        with self._lock:
+            items = [(route, list(samples), self._repeated[route].most_common(5))
+                     for route, samples in self._samples.items()]
+        result = []
+        for route, samples, repeated in items:
+            counts = sorted(sample[0] for sample in samples)
+            times = [sample[1] for sample in samples]
+            result.append({
+                "route": route,
+                "requests": len(samples),
+                "queries_avg": round(sum(counts) / len(counts), 2),
+                "queries_p95": counts[min(len(counts) - 1, int(len(counts) * 0.95))],
+                "queries_max": counts[-1],
+                "db_time_ms_avg": round(sum(times) / len(times), 3),
+                "db_time_ms_max": round(max(times), 3),
+                "n_plus_one_requests": sum(1 for sample in samples if sample[2]),
+                "repeated_statements": [{"statement": shape, "requests": count} for shape, count in repeated],
+            })
+        result.sort(key=lambda item: item["queries_avg"], reverse=True)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._repeated.clear()
+
+route_summary = RouteQuerySummary()
+
+def route_template(scope) -> str:
+    """Шаблон маршрута запроса (/api/services/{service_id}), а не конкретный путь"""
+    route = scope.get("route")
+    if route is None:
+        return "<unmatched>"
+    path = scope.get("path", "")
+    path_regex = getattr(route, "path_regex", None)
+    if path_regex is not None and path_regex.match(path):
+        return route.path
+    # Маршрут из вложенного роутера знает только свой путь без префикса -
+    # восстанавливаем шаблон, подставляя имена параметров в сегменты пути
+    params = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join("{%s}" % params[segment] if segment in params else segment for segment in path.split("/"))
+
+class QueryStatsMiddleware:
+    """Добавляет в ответ статистику SQL запроса и копит сводку по маршрутам"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = collect()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                repeated = stats.repeated_shapes()
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.duration_ms:.2f}".encode()))
+                headers.append((b"x-db-n-plus-one", str(len(repeated)).encode()))
+                message["headers"] = headers
+                if repeated:
+                    logger.warning(
+                        "Likely N+1 in %s %s: %s",
+                        scope["method"], route_template(scope),
+                        "; ".join(f"{count}x {shape[:200]}" for shape, count in repeated)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stop(token)
+            route_summary.add(f"{scope['method']} {route_template(scope)}", stats)
@@ -0,0 +1,183 @@
+"""
+Refresh-токены с ротацией и список отозванных входов в памяти процесса.
+
+Вход (bcrypt) выдает короткий access-токен и долгий refresh-токен. По refresh-токену
+/api/auth/refresh выдает новую пару без проверки пароля, поэтому CPU на вход тратится
+только при новых сессиях, а не раз в ACCESS_TOKEN_EXPIRE_MINUTES на каждого пользователя.
+
+Каждый refresh-токен одноразовый: при обмене он помечается использованным, новый
+продолжает ту же цепочку (family_id). Повторное предъявление использованного токена
+означает, что его кто-то скопировал, - отзывается вся цепочка. В базе хранится только
+SHA-256 значения: токен - 256 случайных бит, медленный хэш ему не нужен.
+
+Access-токены несут family_id в "sid". Их проверка не обращается к базе: отозванные
+цепочки хранятся во множестве revoked_families, которое фоновая задача раз в
+REVOCATION_SYNC_INTERVAL секунд перечитывает из refresh_tokens. Отзыв в своем воркере
+действует сразу, в остальных - не позже чем через интервал синхронизации.
+
+Удаление истекших строк:
+    python -m app.refresh_tokens
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from anyio import to_thread
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "30"))
+
+TOKENS = models.RefreshToken.__table__
+
+def _utc(value: datetime) -> datetime:
+    # SQLite возвращает время без часового пояса - оно хранится в UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class RevocationList:
+    """Отозванные цепочки (family_id), потокобезопасно"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = frozenset()
+        self._added = {}  # family_id -> time.monotonic() отзыва в этом воркере
+
+    def __contains__(self, family_id: str) -> bool:
+        return family_id in self._families
+
+    def add(self, family_id: str):
+        with self._lock:
+            self._families = self._families | {family_id}
+            self._added[family_id] = time.monotonic()
+
+    def replace(self, families, started_at: float):
+        """Заменить множество прочитанным из базы; отзывы после started_at (чтение их не видело) сохраняются"""
+        with self._lock:
+            self._added = {family: added for family, added in self._added.items() if added >= started_at}
+            # Новое множество целиком: проверки в других потоках не видят его частично заполненным
+            self._families = frozenset(families) | frozenset(self._added)
+
+revoked_families = RevocationList()
+
+def _invalid_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def issue(db: AsyncSession, user_id: int, family_id: Optional[str] = None,
+          now: Optional[datetime] = None) -> Tuple[str, str]:
+    """Добавить в сессию новый refresh-токен; (значение, family_id). Сохраняет вызывающий commit"""
+    now = now or datetime.now(timezone.utc)
+    token = secrets.token_urlsafe(32)
+    family_id = family_id or secrets.token_hex(16)
+    db.add(models.RefreshToken(
+        user_id=user_id, family_id=family_id, token_hash=token_hash(token),
+        created_at=now, expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token, family_id
+
+async def revoke_family(db: AsyncSession, family_id: str, now: Optional[datetime] = None):
+    """Отозвать цепочку в базе и сразу в памяти этого воркера"""
+    now = now or datetime.now(timezone.utc)
+    await db.execute(
+        update(TOKENS).where(TOKENS.c.family_id == family_id, TOKENS.c.revoked_at.is_(None)).values(revoked_at=now)
+    )
+    await db.commit()
+    revoked_families.add(family_id)
+
+async def rotate(db: AsyncSession, token: str) -> Tuple[models.User, str, str]:
+    """Обменять refresh-токен на новый той же цепочки; (пользователь, новый токен, family_id)"""
+    now = datetime.now(timezone.utc)
+    row = (await db.execute(
+        select(models.RefreshToken, models.User)
+        .join(models.User, models.User.id == models.RefreshToken.user_id)
+        .where(models.RefreshToken.token_hash == token_hash(token))
+    )).first()
+    if row is None:
+        raise _invalid_token()
+    refresh, user = row
+    if refresh.revoked_at is not None or _utc(refresh.expires_at) <= now or user.is_active is False:
+        raise _invalid_token()
+
+    # Пометка условная: из двух одновременных обменов одного токена пройдет только один
+    result = await db.execute(
+        update(TOKENS).where(TOKENS.c.id == refresh.id, TOKENS.c.used_at.is_(None)).values(used_at=now)
+    )
+    if result.rowcount != 1:
+        logger.warning("Повторное использование refresh-токена пользователя %s, цепочка отозвана", user.id)
+        await revoke_family(db, refresh.family_id, now)
+        raise _invalid_token()
+
+    new_token, family_id = issue(db, user.id, refresh.family_id, now)
+    await db.commit()
+    return user, new_token, family_id
+
+async def revoke(db: AsyncSession, token: str) -> bool:
+    """Выход: отозвать цепочку, к которой относится токен"""
+    family_id = (await db.execute(
+        select(TOKENS.c.family_id).where(TOKENS.c.token_hash == token_hash(token))
+    )).scalar()
+    if family_id is None:
+        return False
+    await revoke_family(db, family_id)
+    return True
+
+def sync(connection, window: timedelta, now: Optional[datetime] = None):
+    """Перечитать отозванные цепочки; раньше now - window отозванные уже не имеют живых access-токенов"""
+    now = now or datetime.now(timezone.utc)
+    started_at = time.monotonic()
+    # Без DISTINCT: диапазон по индексу revoked_at, повторы схлопывает множество
+    families = connection.execute(
+        select(TOKENS.c.family_id).where(TOKENS.c.revoked_at >= now - window)
+    ).scalars().all()
+    revoked_families.replace(families, started_at)
+
+def sync_database(engine, window: timedelta):
+    with engine.connect() as connection:
+        sync(connection, window)
+
+async def sync_periodically(engine, window: timedelta, interval: float = REVOCATION_SYNC_INTERVAL):
+    """Фоновая задача: синхронизировать список отзыва при старте и раз в interval секунд"""
+    while True:
+        try:
+            await to_thread.run_sync(sync_database, engine, window)
+        except Exception:
+            logger.exception("Синхронизация отозванных refresh-токенов не удалась")
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
+
+def purge_expired(connection, now: Optional[datetime] = None) -> int:
+    """Удалить истекшие refresh-токены"""
+    now = now or datetime.now(timezone.utc)
+    return connection.execute(delete(TOKENS).where(TOKENS.c.expires_at < now)).rowcount
+
+if __name__ == "__main__":
+    from app.database import engine, Base
+
+    Base.metadata.create_all(bind=engine, tables=[TOKENS])
+    try:
+        with engine.begin() as connection:
+            removed = purge_expired(connection)
+        print(f"[OK] Удалено истекших refresh-токенов: {removed}")
+    except Exception as e:
+        print(f"[ERROR] Ошибка: {e}")
+        sys.exit(1)
@@ -0,0 +1,263 @@
+"""
+Дневные сводки бронирований для аналитики админки (/api/admin/analytics/timeseries).
+
+Таблица booking_daily_rollups хранит число бронирований и выручку завершенных по ключу
+(мастер, день создания, категория услуги, статус). Каждое бронирование учитывается
+дважды: в строке своего мастера и в строке professional_id = 0 (все мастера) - графики
+без фильтра по мастеру читают только эти строки, не суммируя тысячи мастеров.
+
+Сводки обновляются в транзакции записи, как и снимок статистики (app.stats_snapshot):
+при flush ORM-сессии считается изменение по добавленным, измененным (смена статуса)
+и удаленным бронированиям. Записи в обход ORM выравнивает пересборка из bookings
+пачками по batch дней, каждая пачка - своей транзакцией:
+    python -m app.rollups --batch-days 31 [--since 2024-01-01]
+
+На базе, созданной до появления сводок, таблица пуста, а изменения старых бронирований
+давали бы строки с отрицательными значениями. Поэтому при старте приложения, до
+установки обработчиков flush, ensure_built() собирает пустую таблицу из bookings.
+"""
+import argparse
+import logging
+import sys
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Date, case, cast, delete, event, func, inspect, insert, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models import BookingStatus
+from app.stats_snapshot import old_value
+
+logger = logging.getLogger(__name__)
+
+ALL_PROFESSIONALS = 0
+BATCH_DAYS = 31
+
+ROLLUPS = models.BookingDailyRollup.__table__
+_PENDING = "rollups.pending"
+
+def _day(created_at: Optional[datetime]) -> date:
+    if created_at is None:
+        # created_at новой строки ставит база - бронирование создано сейчас
+        return datetime.now(timezone.utc).date()
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+def _contribution(value, category_of) -> dict:
+    """Вклад бронирования: {(мастер, день, категория, статус): [бронирований, выручка]}"""
+    status, service_id = value("status"), value("service_id")
+    if status is None or service_id is None:
+        return {}
+    category = category_of(service_id)
+    if category is None:
+        return {}
+    status = BookingStatus(status)
+    revenue = (value("total_price") or 0) if status == BookingStatus.COMPLETED else 0
+    day = _day(value("created_at"))
+    return {
+        (professional_id, day, category, status): (1, revenue)
+        for professional_id in (value("professional_id"), ALL_PROFESSIONALS)
+    }
+
+def _add(deltas: dict, contribution: dict, sign: int):
+    for key, (bookings, revenue) in contribution.items():
+        deltas[key][0] += sign * bookings
+        deltas[key][1] += sign * revenue
+
+def _category_lookup(session):
+    services = models.Service.__table__
+    categories = {}
+
+    def category_of(service_id):
+        if service_id not in categories:
+            categories[service_id] = session.connection().execute(
+                select(services.c.category).where(services.c.id == service_id)
+            ).scalar()
+        return categories[service_id]
+
+    return category_of
+
+def _bookings(objects):
+    return [obj for obj in objects if isinstance(obj, models.Booking)]
+
+def _before_flush(session, flush_context, instances):
+    # Измененные и удаленные бронирования: прежние значения доступны только до flush
+    deltas = session.info[_PENDING] = defaultdict(lambda: [0, 0.0])
+    category_of = _category_lookup(session)
+    for booking in _bookings(session.dirty):
+        if not session.is_modified(booking):
+            continue
+        _add(deltas, _contribution(lambda name: getattr(booking, name), category_of), 1)
+        _add(deltas, _contribution(lambda name: old_value(booking, name), category_of), -1)
+    for booking in _bookings(session.deleted):
+        _add(deltas, _contribution(lambda name: old_value(booking, name), category_of), -1)
+
+def _after_flush(session, flush_context):
+    deltas = session.info.pop(_PENDING, None) or defaultdict(lambda: [0, 0.0])
+    new_bookings = _bookings(session.new)
+    if new_bookings:
+        category_of = _category_lookup(session)
+        for booking in new_bookings:
+            state = inspect(booking)
+            _add(deltas, _contribution(lambda name: state.dict.get(name), category_of), 1)
+    apply_deltas(session.connection(), deltas)
+
+def install():
+    """Обновлять сводки при flush любой ORM-сессии"""
+    if not event.contains(Session, "before_flush", _before_flush):
+        event.listen(Session, "before_flush", _before_flush)
+        event.listen(Session, "after_flush", _after_flush)
+
+def apply_deltas(connection, deltas: dict):
+    """Прибавить изменения к строкам сводки; отсутствующие строки создаются"""
+    # Постоянный порядок ключей: параллельные транзакции блокируют строки в одном порядке
+    rows = [
+        {"professional_id": key[0], "day": key[1], "category": key[2], "status": key[3],
+         "bookings": bookings, "revenue": revenue}
+        for key, (bookings, revenue) in sorted(deltas.items(), key=lambda item: (
+            item[0][0], item[0][1], item[0][2].value, item[0][3].value
+        ))
+        if bookings or revenue
+    ]
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(ROLLUPS)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ROLLUPS.c.professional_id, ROLLUPS.c.day, ROLLUPS.c.category, ROLLUPS.c.status],
+            set_={
+                "bookings": ROLLUPS.c.bookings + statement.excluded.bookings,
+                "revenue": ROLLUPS.c.revenue + statement.excluded.revenue,
+            },
+        )
+        connection.execute(statement, rows)
+        return
+    for row in rows:
+        result = connection.execute(
+            update(ROLLUPS).where(
+                ROLLUPS.c.professional_id == row["professional_id"], ROLLUPS.c.day == row["day"],
+                ROLLUPS.c.category == row["category"], ROLLUPS.c.status == row["status"],
+            ).values(bookings=ROLLUPS.c.bookings + row["bookings"], revenue=ROLLUPS.c.revenue + row["revenue"])
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(ROLLUPS), row)
+
+def _day_expression(dialect_name: str):
+    created_at = models.Booking.__table__.c.created_at
+    # SQLite хранит время текстом: date() дает 'YYYY-MM-DD', как и колонка Date
+    return func.date(created_at) if dialect_name == "sqlite" else cast(created_at, Date)
+
+def rebuild_range(connection, start: Optional[date] = None, end: Optional[date] = None):
+    """Пересобрать строки сводки за дни [start, end) из таблицы bookings"""
+    bookings = models.Booking.__table__
+    services = models.Service.__table__
+    day = _day_expression(connection.dialect.name)
+
+    target = delete(ROLLUPS)
+    source = select().select_from(bookings.join(services, services.c.id == bookings.c.service_id)).where(
+        bookings.c.created_at.is_not(None)
+    )
+    if start is not None:
+        target = target.where(ROLLUPS.c.day >= start)
+        source = source.where(bookings.c.created_at >= datetime.combine(start, time.min, timezone.utc))
+    if end is not None:
+        target = target.where(ROLLUPS.c.day < end)
+        source = source.where(bookings.c.created_at < datetime.combine(end, time.min, timezone.utc))
+
+    count = func.count()
+    revenue = func.coalesce(func.sum(case(
+        (bookings.c.status == BookingStatus.COMPLETED, bookings.c.total_price), else_=0.0
+    )), 0.0)
+    per_professional = source.add_columns(
+        bookings.c.professional_id, day, services.c.category, bookings.c.status, count, revenue
+    ).group_by(bookings.c.professional_id, day, services.c.category, bookings.c.status)
+    overall = source.add_columns(
+        literal(ALL_PROFESSIONALS), day, services.c.category, bookings.c.status, count, revenue
+    ).group_by(day, services.c.category, bookings.c.status)
+
+    connection.execute(target)
+    connection.execute(insert(ROLLUPS).from_select(
+        ["professional_id", "day", "category", "status", "bookings", "revenue"],
+        union_all(per_professional, overall),
+    ))
+
+def rebuild(engine, batch_days: int = BATCH_DAYS, since: Optional[date] = None, progress=None):
+    """Пересобрать сводки пачками по batch_days дней, каждая пачка - отдельной транзакцией"""
+    bookings = models.Booking.__table__
+    with engine.connect() as connection:
+        first, last = connection.execute(
+            select(func.min(bookings.c.created_at), func.max(bookings.c.created_at))
+        ).one()
+    if first is None:
+        with engine.begin() as connection:
+            connection.execute(delete(ROLLUPS) if since is None else delete(ROLLUPS).where(ROLLUPS.c.day >= since))
+        return 0
+
+    start = max(_day(first), since) if since else _day(first)
+    end = _day(last) + timedelta(days=1)
+    with engine.begin() as connection:
+        # Строки вне диапазона bookings (удаленные бронирования)
+        stale = delete(ROLLUPS).where((ROLLUPS.c.day < start) | (ROLLUPS.c.day >= end))
+        connection.execute(stale.where(ROLLUPS.c.day >= since) if since else stale)
+
+    batches = 0
+    while start < end:
+        batch_end = min(start + timedelta(days=batch_days), end)
+        with engine.begin() as connection:
+            rebuild_range(connection, start, batch_end)
+        batches += 1
+        if progress:
+            progress(start, batch_end)
+        start = batch_end
+    return batches
+
+def _built(connection) -> bool:
+    return connection.execute(select(ROLLUPS.c.day).limit(1)).first() is not None
+
+def ensure_built(engine) -> bool:
+    """Собрать сводки из bookings одной транзакцией, если таблица пуста; True - если собирались"""
+    try:
+        with engine.begin() as connection:
+            if _built(connection):
+                return False
+            rebuild_range(connection)
+    except DBAPIError:
+        # Одновременно стартующие воркеры: таблицу уже собрал другой
+        with engine.connect() as connection:
+            if _built(connection):
+                return False
+        raise
+    logger.info("Дневные сводки бронирований собраны из bookings")
+    return True
+
+def main(argv=None) -> int:
+    from app.database import DATABASE_URL, Base
+    from sqlalchemy import create_engine
+
+    parser = argparse.ArgumentParser(description="Пересборка дневных сводок бронирований")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--batch-days", type=int, default=BATCH_DAYS)
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="Пересобрать дни начиная с YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine, tables=[ROLLUPS])
+    try:
+        batches = rebuild(
+            engine, args.batch_days, args.since,
+            progress=lambda start, end: print(f"  {start} - {end - timedelta(days=1)}")
+        )
+    except Exception as e:
+        print(f"[ERROR] Ошибка: {e}")
+        return 1
+    print(f"[OK] Сводки пересобраны, пачек: {batches}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,21 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from datetime import datetime, timedelta
 from app.database import get_db
-from app import models, schemas
-from app.auth import get_current_active_user
+from app import models, schemas, query_stats, stats_snapshot
+from app.cache import reference_cache
+from app.auth import get_current_active_user, user_cache
 from app.models import UserRole, BookingStatus, ServiceCategory
+from app.pagination import Keyset, paginate, next_page
+from app.routers.bookings import booking_load_options, BOOKING_KEYSET
+from app.routers.reviews import REVIEW_KEYSET
+from app.eager_loading import load_options
 
 router = APIRouter()
 
+USER_KEYSET = Keyset(models.User.created_at, models.User.id)
+SERVICE_KEYSET = Keyset(models.Service.created_at, models.Service.id)
+
 def require_admin(current_user: models.User = Depends(get_current_active_user)):
     """Проверка прав администратора"""
     if current_user.role != UserRole.ADMIN:
@@ -19,68 +25,56 @@ def require_admin(current_user: models.User = Depends(get_current_active_user)):
 # Статистика
 @router.get("/stats")
 def get_statistics(
+    fresh: bool = Query(False, description="Пересчитать агрегаты по таблицам вместо чтения снимка"),
     current_user: models.User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Получить общую статистику системы"""
-    total_users = db.query(models.User).count()
-    total_clients = db.query(models.User).filter(models.User.role == UserRole.CLIENT).count()
-    total_professionals = db.query(models.User).filter(models.User.role == UserRole.PROFESSIONAL).count()
-    total_services = db.query(models.Service).filter(models.Service.is_active == True).count()
-    total_bookings = db.query(models.Booking).count()
-    total_reviews = db.query(models.Review).count()
-    
-    # Статистика по статусам бронирований
-    bookings_by_status = db.query(
-        models.Booking.status,
-        func.count(models.Booking.id).label('count')
-    ).group_by(models.Booking.status).all()
-    
-    # Доходы (сумма завершенных бронирований)
-    total_revenue = db.query(func.sum(models.Booking.total_price)).filter(
-        models.Booking.status == BookingStatus.COMPLETED
-    ).scalar() or 0
-    
-    # Бронирования за последние 30 дней
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_bookings = db.query(models.Booking).filter(
-        models.Booking.created_at >= thirty_days_ago
-    ).count()
-    
-    # Средний рейтинг мастеров
-    avg_rating = db.query(func.avg(models.User.rating)).filter(
-        models.User.role == UserRole.PROFESSIONAL,
-        models.User.rating > 0
-    ).scalar() or 0
-    
+    """Получить общую статистику системы из снимка счетчиков (app.stats_snapshot)"""
+    return stats_snapshot.snapshot_statistics(db, fresh=fresh)
+
+# Производительность
+@router.get("/perf/queries")
+def get_query_stats(
+    current_user: models.User = Depends(require_admin)
+):
+    """Сводка SQL-запросов по маршрутам: количество, время в БД, вероятные N+1"""
     return {
-        "users": {
-            "total": total_users,
-            "clients": total_clients,
-            "professionals": total_professionals
-        },
-        "services": {
-            "total": total_services
-        },
-        "bookings": {
-            "total": total_bookings,
-            "by_status": {status.value: count for status, count in bookings_by_status},
-            "recent_30_days": recent_bookings
-        },
-        "reviews": {
-            "total": total_reviews
-        },
-        "revenue": {
-            "total": float(total_revenue)
-        },
-        "average_rating": float(avg_rating)
+        "window": query_stats.ROUTE_WINDOW,
+        "n_plus_one_threshold": query_stats.NPLUSONE_THRESHOLD,
+        "routes": query_stats.route_summary.snapshot()
     }
 
+@router.delete("/perf/queries")
+def reset_query_stats(
+    current_user: models.User = Depends(require_admin)
+):
+    """Сбросить сводку SQL-запросов"""
+    query_stats.route_summary.reset()
+    return {"message": "Query stats reset"}
+
+@router.get("/perf/cache")
+def get_cache_stats(
+    current_user: models.User = Depends(require_admin)
+):
+    """Состояние кэшей справочных данных и пользователей: записи, попадания и промахи"""
+    return {**reference_cache.stats(), "users": user_cache.stats()}
+
+@router.delete("/perf/cache")
+def clear_cache(
+    current_user: models.User = Depends(require_admin)
+):
+    """Очистить кэши справочных данных и пользователей"""
+    reference_cache.clear()
+    user_cache.clear()
+    return {"message": "Reference and user caches cleared"}
+
 # Управление пользователями
 @router.get("/users", response_model=List[schemas.UserResponse])
 def get_all_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     role: Optional[UserRole] = None,
     search: Optional[str] = None,
     current_user: models.User = Depends(require_admin),
@@ -100,7 +94,8 @@ def get_all_users(
             (models.User.phone.ilike(search_filter))
         )
     
-    users = query.order_by(desc(models.User.created_at)).offset(skip).limit(limit).all()
+    users, headers = next_page(paginate(query, USER_KEYSET, cursor, skip, limit).all(), USER_KEYSET, limit)
+    response.headers.update(headers)
     return users
 
 @router.get("/users/{user_id}", response_model=schemas.UserResponse)
@@ -171,8 +166,10 @@ def activate_user(
 # Управление услугами
 @router.get("/services", response_model=List[schemas.ServiceResponse])
 def get_all_services(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     category: Optional[ServiceCategory] = None,
     professional_id: Optional[int] = None,
     is_active: Optional[bool] = None,
@@ -180,7 +177,7 @@ def get_all_services(
     db: Session = Depends(get_db)
 ):
     """Получить все услуги"""
-    query = db.query(models.Service)
+    query = db.query(models.Service).options(*load_options(models.Service, schemas.ServiceResponse))
     
     if category:
         query = query.filter(models.Service.category == category)
@@ -191,7 +188,8 @@ def get_all_services(
     if is_active is not None:
         query = query.filter(models.Service.is_active == is_active)
     
-    services = query.order_by(desc(models.Service.created_at)).offset(skip).limit(limit).all()
+    services, headers = next_page(paginate(query, SERVICE_KEYSET, cursor, skip, limit).all(), SERVICE_KEYSET, limit)
+    response.headers.update(headers)
     return services
 
 @router.delete("/services/{service_id}")
@@ -227,19 +225,22 @@ def activate_service(
 # Управление бронированиями
 @router.get("/bookings", response_model=List[schemas.BookingResponse])
 def get_all_bookings(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     status: Optional[BookingStatus] = None,
     current_user: models.User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Получить все бронирования"""
-    query = db.query(models.Booking)
+    query = db.query(models.Booking).options(*booking_load_options())
     
     if status:
         query = query.filter(models.Booking.status == status)
     
-    bookings = query.order_by(desc(models.Booking.created_at)).offset(skip).limit(limit).all()
+    bookings, headers = next_page(paginate(query, BOOKING_KEYSET, cursor, skip, limit).all(), BOOKING_KEYSET, limit)
+    response.headers.update(headers)
     return bookings
 
 @router.put("/bookings/{booking_id}", response_model=schemas.BookingResponse)
@@ -265,19 +266,22 @@ def update_booking(
 # Управление отзывами
 @router.get("/reviews", response_model=List[schemas.ReviewResponse])
 def get_all_reviews(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     professional_id: Optional[int] = None,
     current_user: models.User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Получить все отзывы"""
-    query = db.query(models.Review)
+    query = db.query(models.Review).options(*load_options(models.Review, schemas.ReviewResponse))
     
     if professional_id:
         query = query.filter(models.Review.professional_id == professional_id)
     
-    reviews = query.order_by(desc(models.Review.created_at)).offset(skip).limit(limit).all()
+    reviews, headers = next_page(paginate(query, REVIEW_KEYSET, cursor, skip, limit).all(), REVIEW_KEYSET, limit)
+    response.headers.update(headers)
     return reviews
 
 @router.delete("/reviews/{review_id}")
@@ -0,0 +1,120 @@
+"""
+Аналитика админки: динамика бронирований и выручки за любой период.
+
+Данные берутся только из дневных сводок (app.rollups): год по дням - не больше
+365 x категории x статусы строк по первичному ключу, таблица bookings не читается.
+"""
+import enum
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.database import get_read_db
+from app import models
+from app.auth import get_current_active_user
+from app.models import UserRole, BookingStatus, ServiceCategory
+from app.rollups import ALL_PROFESSIONALS
+
+router = APIRouter()
+
+# Ограничение периода: десять лет по дням - это уже 3650 точек графика
+MAX_RANGE_DAYS = 3660
+DEFAULT_RANGE_DAYS = 30
+
+class Granularity(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+def require_admin(current_user: models.User = Depends(get_current_active_user)):
+    """Проверка прав администратора"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Требуются права администратора")
+    return current_user
+
+def period_start(day: date, granularity: Granularity) -> date:
+    """Первый день периода: сам день, понедельник недели или первое число месяца"""
+    if granularity == Granularity.WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == Granularity.MONTH:
+        return day.replace(day=1)
+    return day
+
+def _periods(date_from: date, date_to: date, granularity: Granularity) -> list:
+    periods = []
+    current = period_start(date_from, granularity)
+    while current <= date_to:
+        periods.append(current)
+        if granularity == Granularity.DAY:
+            current += timedelta(days=1)
+        elif granularity == Granularity.WEEK:
+            current += timedelta(days=7)
+        else:
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return periods
+
+def timeseries_query(date_from: date, date_to: date, category: Optional[ServiceCategory] = None,
+                     professional_id: Optional[int] = None, status: Optional[BookingStatus] = None):
+    """Суммы сводок по дням и статусам за [date_from, date_to] - диапазон по первичному ключу"""
+    rollup = models.BookingDailyRollup
+    query = select(
+        rollup.day, rollup.status, func.sum(rollup.bookings), func.sum(rollup.revenue)
+    ).where(
+        rollup.professional_id == (professional_id or ALL_PROFESSIONALS),
+        rollup.day >= date_from,
+        rollup.day <= date_to,
+    )
+    if category:
+        query = query.where(rollup.category == category)
+    if status:
+        query = query.where(rollup.status == status)
+    return query.group_by(rollup.day, rollup.status)
+
+@router.get("/timeseries")
+def get_timeseries(
+    date_from: Optional[date] = Query(None, description="Первый день периода (по умолчанию 30 дней назад)"),
+    date_to: Optional[date] = Query(None, description="Последний день периода включительно (по умолчанию сегодня)"),
+    granularity: Granularity = Query(Granularity.DAY),
+    category: Optional[ServiceCategory] = None,
+    professional_id: Optional[int] = Query(None, ge=1),
+    status: Optional[BookingStatus] = None,
+    current_user: models.User = Depends(require_admin),
+    db: Session = Depends(get_read_db)
+):
+    """Бронирования и выручка завершенных по дням, неделям или месяцам (по дате создания)"""
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must not exceed {MAX_RANGE_DAYS} days")
+
+    points = {
+        period: {"bookings": 0, "by_status": {}, "revenue": 0.0}
+        for period in _periods(date_from, date_to, granularity)
+    }
+    query = timeseries_query(date_from, date_to, category, professional_id, status)
+    for day, row_status, bookings, revenue in db.execute(query):
+        if not bookings:
+            continue
+        point = points[period_start(day, granularity)]
+        point["bookings"] += bookings
+        point["by_status"][row_status.value] = point["by_status"].get(row_status.value, 0) + bookings
+        point["revenue"] += revenue or 0
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "granularity": granularity.value,
+        "points": [
+            {"period": period.isoformat(), **values}
+            for period, values in points.items()
+        ],
+        "totals": {
+            "bookings": sum(values["bookings"] for values in points.values()),
+            "revenue": sum(values["revenue"] for values in points.values()),
+        }
+    }
@@ -1,13 +1,19 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
+from app.cache import reference_cache
 from app.auth import get_current_active_user
 from app.models import UserRole, BlogPostStatus
+from app.pagination import Keyset, paginate, next_page
+from app.routers.blog import post_load_options, post_response
 
 router = APIRouter()
 
+# Модерация: все посты по времени создания, включая черновики без published_at
+POST_KEYSET = Keyset(models.BlogPost.created_at, models.BlogPost.id)
+
 def require_admin(current_user: models.User = Depends(get_current_active_user)):
     """Проверка прав администратора"""
     if current_user.role != UserRole.ADMIN:
@@ -34,6 +40,7 @@ def create_category(
     db_category = models.BlogCategory(**category.dict())
     db.add(db_category)
     db.commit()
+    reference_cache.invalidate("blog_categories")
     db.refresh(db_category)
     return db_category
 
@@ -57,6 +64,7 @@ def update_category(
             setattr(db_category, field, value)
     
     db.commit()
+    reference_cache.invalidate("blog_categories")
     db.refresh(db_category)
     return db_category
 
@@ -85,37 +93,30 @@ def create_tag(
     db_tag = models.BlogTag(**tag.dict())
     db.add(db_tag)
     db.commit()
+    reference_cache.invalidate("blog_tags")
     db.refresh(db_tag)
     return db_tag
 
 # Post moderation
 @router.get("/posts", response_model=List[schemas.BlogPostResponse])
 def get_posts(
+    response: Response,
     status: Optional[BlogPostStatus] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     current_user: models.User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Получить посты для модерации"""
-    query = db.query(models.BlogPost)
+    query = db.query(models.BlogPost).options(*post_load_options())
     
     if status:
         query = query.filter(models.BlogPost.status == status)
     
-    posts = query.order_by(models.BlogPost.created_at.desc()).offset(skip).limit(limit).all()
-    
-    result = []
-    for post in posts:
-        post_dict = schemas.BlogPostResponse.model_validate(post).model_dump()
-        # Загружаем теги
-        post_tags = db.query(models.BlogTag).join(models.BlogPostTag).filter(
-            models.BlogPostTag.post_id == post.id
-        ).all()
-        post_dict["tags"] = [schemas.BlogTagResponse.model_validate(tag).model_dump() for tag in post_tags]
-        result.append(post_dict)
-    
-    return result
+    posts, headers = next_page(paginate(query, POST_KEYSET, cursor, skip, limit).all(), POST_KEYSET, limit)
+    response.headers.update(headers)
+    return [post_response(post) for post in posts]
 
 @router.post("/posts/{post_id}/publish")
 def publish_post(
@@ -0,0 +1,191 @@
+"""
+Выгрузки для отчетов: пользователи, бронирования, отзывы и заказы товаров в CSV или NDJSON.
+
+Строки читаются потоком через асинхронный движок реплики (серверный курсор в PostgreSQL,
+yield_per пачками по EXPORT_BATCH_SIZE) и сразу отправляются клиенту: память не растет
+с размером выгрузки, а ожидание базы не занимает пул потоков и цикл событий.
+"""
+import csv
+import enum
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.database import async_read_engine
+from app import models
+from app.auth import get_current_active_user
+from app.models import UserRole, BookingStatus, ProductOrderStatus
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+class ExportFormat(str, enum.Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+def require_admin(current_user: models.User = Depends(get_current_active_user)):
+    """Проверка прав администратора"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Требуются права администратора")
+    return current_user
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _csv_cell(value):
+    value = _plain(value)
+    if value is None:
+        return ""
+    # Защита от формул в Excel: текст, начинающийся с =, @ или +/- не как число
+    if isinstance(value, str) and value and value[0] in "=@\t\r+-":
+        if value[0] not in "+-" or not value[1:].replace(" ", "").replace(".", "").isdigit():
+            return "'" + value
+    return value
+
+def _encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_csv_cell(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+def _encode_ndjson(columns, rows) -> str:
+    return "".join(
+        json.dumps({column: _plain(value) for column, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+async def stream_export(query, export_format: ExportFormat):
+    """Строки запроса пачками: одна пачка - одна часть тела ответа"""
+    async with async_read_engine.connect() as connection:
+        result = await connection.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        if export_format == ExportFormat.CSV:
+            yield _encode_csv([columns])
+        async for rows in result.partitions():
+            if export_format == ExportFormat.CSV:
+                yield _encode_csv(rows)
+            else:
+                yield _encode_ndjson(columns, rows)
+
+def export_response(entity: str, query, export_format: ExportFormat) -> StreamingResponse:
+    filename = f"{entity}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format.value}"
+    return StreamingResponse(
+        stream_export(query.order_by(query.selected_columns.id), export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+def _created_between(query, column, date_from: Optional[datetime], date_to: Optional[datetime]):
+    if date_from:
+        query = query.where(column >= date_from)
+    if date_to:
+        query = query.where(column < date_to)
+    return query
+
+@router.get("/users")
+async def export_users(
+    format: ExportFormat = Query(ExportFormat.CSV),
+    role: Optional[UserRole] = None,
+    search: Optional[str] = None,
+    date_from: Optional[datetime] = Query(None, description="created_at >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="created_at < date_to"),
+    current_user: models.User = Depends(require_admin)
+):
+    """Выгрузить пользователей (без хэшей паролей)"""
+    table = models.User.__table__
+    query = select(*[column for column in table.columns if column.name != "hashed_password"])
+
+    if role:
+        query = query.where(table.c.role == role)
+
+    if search:
+        search_filter = f"%{search}%"
+        query = query.where(
+            (table.c.full_name.ilike(search_filter)) |
+            (table.c.email.ilike(search_filter)) |
+            (table.c.phone.ilike(search_filter))
+        )
+
+    query = _created_between(query, table.c.created_at, date_from, date_to)
+    return export_response("users", query, format)
+
+@router.get("/bookings")
+async def export_bookings(
+    format: ExportFormat = Query(ExportFormat.CSV),
+    status: Optional[BookingStatus] = None,
+    professional_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    date_from: Optional[datetime] = Query(None, description="created_at >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="created_at < date_to"),
+    current_user: models.User = Depends(require_admin)
+):
+    """Выгрузить бронирования"""
+    table = models.Booking.__table__
+    query = select(table)
+
+    if status:
+        query = query.where(table.c.status == status)
+
+    if professional_id:
+        query = query.where(table.c.professional_id == professional_id)
+
+    if client_id:
+        query = query.where(table.c.client_id == client_id)
+
+    query = _created_between(query, table.c.created_at, date_from, date_to)
+    return export_response("bookings", query, format)
+
+@router.get("/reviews")
+async def export_reviews(
+    format: ExportFormat = Query(ExportFormat.CSV),
+    professional_id: Optional[int] = None,
+    date_from: Optional[datetime] = Query(None, description="created_at >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="created_at < date_to"),
+    current_user: models.User = Depends(require_admin)
+):
+    """Выгрузить отзывы"""
+    table = models.Review.__table__
+    query = select(table)
+
+    if professional_id:
+        query = query.where(table.c.professional_id == professional_id)
+
+    query = _created_between(query, table.c.created_at, date_from, date_to)
+    return export_response("reviews", query, format)
+
+@router.get("/product-orders")
+async def export_product_orders(
+    format: ExportFormat = Query(ExportFormat.CSV),
+    status: Optional[ProductOrderStatus] = None,
+    seller_id: Optional[int] = None,
+    date_from: Optional[datetime] = Query(None, description="created_at >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="created_at < date_to"),
+    current_user: models.User = Depends(require_admin)
+):
+    """Выгрузить заказы товаров"""
+    table = models.ProductOrder.__table__
+    query = select(table)
+
+    if status:
+        query = query.where(table.c.status == status)
+
+    if seller_id:
+        query = query.where(table.c.seller_id == seller_id)
+
+    query = _created_between(query, table.c.created_at, date_from, date_to)
+    return export_response("product_orders", query, format)
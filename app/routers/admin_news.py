@@ -1,13 +1,18 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
+from app.cache import reference_cache
 from app.auth import get_current_active_user
 from app.models import UserRole, NewsItemStatus
+from app.pagination import Keyset, paginate, next_page
+from app.eager_loading import load_options
 
 router = APIRouter()
 
+ITEM_KEYSET = Keyset(models.NewsItem.created_at, models.NewsItem.id)
+
 def require_admin(current_user: models.User = Depends(get_current_active_user)):
     """Проверка прав администратора"""
     if current_user.role != UserRole.ADMIN:
@@ -34,6 +39,7 @@ def create_source(
     db_source = models.NewsSource(**source.dict())
     db.add(db_source)
     db.commit()
+    reference_cache.invalidate("news_sources")
     db.refresh(db_source)
     return db_source
 
@@ -58,6 +64,7 @@ def update_source(
             setattr(db_source, field, value)
     
     db.commit()
+    reference_cache.invalidate("news_sources")
     db.refresh(db_source)
     return db_source
 
@@ -73,6 +80,7 @@ def activate_source(
         raise HTTPException(status_code=404, detail="Source not found")
     source.is_active = True
     db.commit()
+    reference_cache.invalidate("news_sources")
     return {"message": "Source activated"}
 
 @router.post("/sources/{source_id}/deactivate")
@@ -87,6 +95,7 @@ def deactivate_source(
         raise HTTPException(status_code=404, detail="Source not found")
     source.is_active = False
     db.commit()
+    reference_cache.invalidate("news_sources")
     return {"message": "Source deactivated"}
 
 # Category management
@@ -109,25 +118,29 @@ def create_category(
     db_category = models.NewsCategory(**category.dict())
     db.add(db_category)
     db.commit()
+    reference_cache.invalidate("news_categories")
     db.refresh(db_category)
     return db_category
 
 # Item management
 @router.get("/items", response_model=List[schemas.NewsItemResponse])
 def get_items(
+    response: Response,
     status: Optional[NewsItemStatus] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     current_user: models.User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Получить новости для управления"""
-    query = db.query(models.NewsItem)
+    query = db.query(models.NewsItem).options(*load_options(models.NewsItem, schemas.NewsItemResponse))
     
     if status:
         query = query.filter(models.NewsItem.status == status)
     
-    items = query.order_by(models.NewsItem.created_at.desc()).offset(skip).limit(limit).all()
+    items, headers = next_page(paginate(query, ITEM_KEYSET, cursor, skip, limit).all(), ITEM_KEYSET, limit)
+    response.headers.update(headers)
     return items
 
 @router.post("/items/{item_id}/hide")
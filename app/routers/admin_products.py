@@ -1,10 +1,13 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
+from app.cache import reference_cache
 from app.auth import get_current_active_user
 from app.models import UserRole
+from app.pagination import paginate, next_page
+from app.routers.products import product_load_options, PRODUCT_KEYSET
 
 router = APIRouter()
 
@@ -16,25 +19,19 @@ def require_admin(current_user: models.User = Depends(get_current_active_user)):
 
 @router.get("/products", response_model=List[schemas.ProductResponse])
 def get_products(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     current_user: models.User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Получить все товары для модерации"""
-    products = db.query(models.Product).order_by(models.Product.created_at.desc()).offset(skip).limit(limit).all()
-    
-    result = []
-    for product in products:
-        product_dict = schemas.ProductResponse.model_validate(product).model_dump()
-        # Загружаем изображения
-        images = db.query(models.ProductImage).filter(
-            models.ProductImage.product_id == product.id
-        ).order_by(models.ProductImage.sort_order).all()
-        product_dict["images"] = [schemas.ProductImageResponse.model_validate(img).model_dump() for img in images]
-        result.append(product_dict)
-    
-    return result
+    query = db.query(models.Product).options(*product_load_options())
+    products, headers = next_page(paginate(query, PRODUCT_KEYSET, cursor, skip, limit).all(), PRODUCT_KEYSET, limit)
+    response.headers.update(headers)
+    # Изображения загружены через selectinload и уже отсортированы по sort_order
+    return products
 
 @router.post("/products/{product_id}/activate")
 def activate_product(
@@ -83,6 +80,7 @@ def create_category(
     db_category = models.ProductCategory(**category.dict())
     db.add(db_category)
     db.commit()
+    reference_cache.invalidate("product_categories")
     db.refresh(db_category)
     return db_category
 
@@ -106,5 +104,6 @@ def update_category(
             setattr(db_category, field, value)
     
     db.commit()
+    reference_cache.invalidate("product_categories")
     db.refresh(db_category)
     return db_category
@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.database import get_db
 from app import models, schemas
+from app.cache import reference_cache
+from app.serialization import json_response
 from app.auth import get_current_active_user
 from app.models import UserRole, HabitCategory
 
@@ -35,6 +37,7 @@ def create_template(
     db_template = models.TrackerProgramTemplate(**template.dict())
     db.add(db_template)
     db.commit()
+    reference_cache.invalidate("tracker_programs")
     db.refresh(db_template)
     return db_template
 
@@ -59,6 +62,7 @@ def update_template(
             setattr(db_template, field, value)
     
     db.commit()
+    reference_cache.invalidate("tracker_programs")
     db.refresh(db_template)
     return db_template
 
@@ -78,6 +82,7 @@ def activate_template(
     
     template.is_active = True
     db.commit()
+    reference_cache.invalidate("tracker_programs")
     return {"message": "Template activated"}
 
 @router.post("/templates/{template_id}/deactivate")
@@ -96,6 +101,7 @@ def deactivate_template(
     
     template.is_active = False
     db.commit()
+    reference_cache.invalidate("tracker_programs")
     return {"message": "Template deactivated"}
 
 @router.delete("/templates/{template_id}")
@@ -128,6 +134,7 @@ def delete_template(
     # Удаляем шаблон
     db.delete(template)
     db.commit()
+    reference_cache.invalidate("tracker_programs")
     return {"message": "Template deleted"}
 
 # Управление привычками
@@ -145,39 +152,38 @@ def get_habits(
     
     habits = query.all()
     
-    # Добавляем информацию о привязанных днях для каждой привычки
+    # Привязки всех привычек к дням и программам одним запросом
+    links = db.query(
+        models.TrackerProgramDayHabit.habit_id,
+        models.TrackerProgramDayHabit.program_day_id,
+        models.TrackerProgramTemplate.id,
+        models.TrackerProgramTemplate.name
+    ).outerjoin(
+        models.TrackerProgramDay,
+        models.TrackerProgramDay.id == models.TrackerProgramDayHabit.program_day_id
+    ).outerjoin(
+        models.TrackerProgramTemplate,
+        models.TrackerProgramTemplate.id == models.TrackerProgramDay.program_template_id
+    ).filter(
+        models.TrackerProgramDayHabit.habit_id.in_([habit.id for habit in habits])
+    ).order_by(models.TrackerProgramDayHabit.id).all() if habits else []
+    
+    day_ids_by_habit = {}
+    programs_by_habit = {}
+    for habit_id, day_id, program_id, program_name in links:
+        day_ids_by_habit.setdefault(habit_id, []).append(day_id)
+        if program_id is not None:
+            programs_by_habit.setdefault(habit_id, {})[program_id] = program_name
+    
+    # Добавляем информацию о привязанных днях и программах для каждой привычки
     result = []
     for habit in habits:
         habit_dict = schemas.TrackerHabitResponse.model_validate(habit).model_dump()
-        
-        # Получаем дни, к которым привязана привычка, и определяем программы
-        day_habits = db.query(models.TrackerProgramDayHabit).filter(
-            models.TrackerProgramDayHabit.habit_id == habit.id
-        ).all()
-        
-        day_ids = [dh.program_day_id for dh in day_habits]
-        habit_dict["day_ids"] = day_ids
-        
-        # Определяем программы, к которым относится привычка (через дни)
-        program_ids = set()
-        for day_id in day_ids:
-            program_day = db.query(models.TrackerProgramDay).filter(
-                models.TrackerProgramDay.id == day_id
-            ).first()
-            if program_day:
-                program_ids.add(program_day.program_template_id)
-        
-        # Получаем информацию о программах
-        programs_info = []
-        for program_id in program_ids:
-            program = db.query(models.TrackerProgramTemplate).filter(
-                models.TrackerProgramTemplate.id == program_id
-            ).first()
-            if program:
-                programs_info.append({"id": program.id, "name": program.name})
-        
-        habit_dict["programs"] = programs_info
-        
+        habit_dict["day_ids"] = day_ids_by_habit.get(habit.id, [])
+        habit_dict["programs"] = [
+            {"id": program_id, "name": name}
+            for program_id, name in programs_by_habit.get(habit.id, {}).items()
+        ]
         result.append(habit_dict)
     
     return result
@@ -368,24 +374,30 @@ def get_template_days(
         models.TrackerProgramDay.program_template_id == template_id
     ).order_by(models.TrackerProgramDay.day_number).all()
     
-    # Загружаем привычки для каждого дня
-    result = []
-    for day in days:
-        day_habits = db.query(models.TrackerProgramDayHabit).filter(
-            models.TrackerProgramDayHabit.program_day_id == day.id
+    # Загружаем привычки всех дней одним запросом
+    habits_by_day = {}
+    if days:
+        day_habits = db.query(models.TrackerProgramDayHabit.program_day_id, models.TrackerHabit).join(
+            models.TrackerHabit,
+            models.TrackerHabit.id == models.TrackerProgramDayHabit.habit_id
+        ).filter(
+            models.TrackerProgramDayHabit.program_day_id.in_([day.id for day in days])
         ).order_by(models.TrackerProgramDayHabit.sort_order).all()
-        
-        habits = []
-        for dh in day_habits:
-            habit = db.query(models.TrackerHabit).filter(models.TrackerHabit.id == dh.habit_id).first()
-            if habit:
-                habits.append(schemas.TrackerHabitResponse.model_validate(habit))
-        
-        day_dict = schemas.TrackerProgramDayResponse.model_validate(day).model_dump()
-        day_dict["habits"] = habits
-        result.append(day_dict)
+        for day_id, habit in day_habits:
+            habits_by_day.setdefault(day_id, []).append(habit)
     
-    return result
+    result = []
+    for day in days:
+        day_data = {
+            field: getattr(day, field)
+            for field in schemas.TrackerProgramDayResponse.model_fields
+            if field != "habits"
+        }
+        day_data["habits"] = habits_by_day.get(day.id, [])
+        result.append(day_data)
+    
+    # Дни и привычки валидируются по схеме один раз и сразу сериализуются
+    return json_response(List[schemas.TrackerProgramDayResponse], result)
 
 @router.post("/templates/{template_id}/days", response_model=schemas.TrackerProgramDayResponse)
 def create_template_day(
@@ -421,6 +433,7 @@ def create_template_day(
     )
     db.add(db_day)
     db.commit()
+    reference_cache.invalidate("tracker_programs")
     db.refresh(db_day)
     
     # Добавляем привычки к дню
@@ -501,4 +514,5 @@ def delete_template_day(
     
     db.delete(day)
     db.commit()
+    reference_cache.invalidate("tracker_programs")
     return {"message": "Day deleted"}
@@ -1,32 +1,39 @@
+import logging
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models, schemas
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app import models, schemas, login_throttle, refresh_tokens
 from app.auth import (
     authenticate_user,
     create_access_token,
+    cache_user,
+    token_data,
     get_current_active_user,
-    get_password_hash,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.passwords import hash_password
+from app.structured_logging import SAMPLED
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user exists
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = (await db.execute(select(models.User.id).where(models.User.email == user.email))).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    db_user = db.query(models.User).filter(models.User.phone == user.phone).first()
+    db_user = (await db.execute(select(models.User.id).where(models.User.phone == user.phone))).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Phone already registered")
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+    # Create new user: bcrypt считается в пуле процессов (app.passwords)
+    hashed_password = await hash_password(user.password)
     db_user = models.User(
         email=user.email,
         phone=user.phone,
@@ -36,23 +43,31 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         is_active=True
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
+def _access_token(user: models.User, family_id: str) -> str:
+    return create_access_token(
+        data=token_data(user, family_id), expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
 @router.post("/login", response_model=schemas.Token)
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        print(f"Login attempt for: {form_data.username}")
-        print(f"Password received: {'*' * len(form_data.password) if form_data.password else 'None'}")
+        logger.debug("Попытка входа", extra={"email": form_data.username})
+        
+        # Ограничение попыток по IP и email (429) - до bcrypt
+        await login_throttle.check(db, request.client.host if request.client else None, form_data.username)
         
-        user = authenticate_user(db, form_data.username, form_data.password)
+        user = await authenticate_user(db, form_data.username, form_data.password)
         
         if not user:
-            print(f"Authentication failed for: {form_data.username}")
+            await login_throttle.record_failure(db, form_data.username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -61,33 +76,44 @@ def login(
         
         # Проверяем, что пользователь активен
         if user.is_active is False:
-            print(f"User {form_data.username} is inactive")
+            logger.info("Вход неактивного пользователя", extra={"user_id": user.id})
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Account is inactive",
             )
         
-        print(f"Creating token for user: {user.email}")
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
-        )
-        print(f"Token created successfully for: {user.email}")
-        return {"access_token": access_token, "token_type": "bearer"}
+        await login_throttle.record_success(db, form_data.username)
+        # Новый вход - новая цепочка refresh-токенов
+        refresh_token, family_id = refresh_tokens.issue(db, user.id)
+        await db.commit()
+        access_token = _access_token(user, family_id)
+        cache_user(user)
+        logger.info("Вход выполнен", extra={"user_id": user.id, **SAMPLED})
+        return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
     except HTTPException:
         # Перехватываем HTTPException и пробрасываем дальше
         raise
     except Exception as e:
-        # Логируем ошибку для отладки
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Login error: {e}")
-        print(error_trace)
+        # Трейсбек форматирует фоновый писатель логов
+        logger.exception("Ошибка входа")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error during login: {str(e)}"
         )
 
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh(request: schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Новая пара токенов по refresh-токену без проверки пароля; старый refresh-токен больше не действует"""
+    user, refresh_token, family_id = await refresh_tokens.rotate(db, request.refresh_token)
+    cache_user(user)
+    return {"access_token": _access_token(user, family_id), "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout")
+async def logout(request: schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Выход: отозвать refresh-токены входа и выданные по ним access-токены"""
+    await refresh_tokens.revoke(db, request.refresh_token)
+    return {"message": "Logged out"}
+
 @router.get("/me", response_model=schemas.UserResponse)
 def read_users_me(current_user: models.User = Depends(get_current_active_user)):
     return current_user
@@ -1,30 +1,69 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db, get_async_read_db
 from app import models, schemas
+from app.cache import reference_cache
+from app.serialization import dump_json, json_response
+from app.compression import PrecompressedBody, precompressed_response
+from app.http_cache import conditional_response, CACHE_CONTROL_DETAIL, CACHE_CONTROL_PRIVATE
+from app.pagination import Keyset, select_page
+from app.search import apply_search
+from app.eager_loading import load_options
 from app.auth import get_current_active_user, get_current_user_optional
 from app.models import UserRole, BlogPostStatus
 
 router = APIRouter()
 
+# Лента: по дате публикации, посты без нее (черновики) - в конце
+POST_KEYSET = Keyset(
+    models.BlogPost.published_at, models.BlogPost.created_at, models.BlogPost.id, nullable_first=True
+)
+
+def post_load_options():
+    """Связи, нужные для ответа поста: автор, категория и теги одним пакетом запросов"""
+    return load_options(models.BlogPost, schemas.BlogPostResponse, through={"tags": "tag"})
+
+def post_data(post: models.BlogPost) -> dict:
+    """Данные для ответа поста: теги берутся из связей BlogPostTag"""
+    data = {
+        field: getattr(post, field)
+        for field in schemas.BlogPostResponse.model_fields
+        if field != "tags"
+    }
+    data["tags"] = [post_tag.tag for post_tag in post.tags if post_tag.tag is not None]
+    return data
+
+def post_response(post: models.BlogPost) -> schemas.BlogPostResponse:
+    return schemas.BlogPostResponse.model_validate(post_data(post))
+
 # Public endpoints
 @router.get("/categories", response_model=List[schemas.BlogCategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, db: Session = Depends(get_db)):
     """Получить все активные категории блога"""
-    categories = db.query(models.BlogCategory).filter(
-        models.BlogCategory.is_active == True
-    ).all()
-    return categories
+    def load():
+        categories = db.query(models.BlogCategory).filter(
+            models.BlogCategory.is_active == True
+        ).all()
+        return PrecompressedBody(dump_json(List[schemas.BlogCategoryResponse], categories))
+    
+    return precompressed_response(
+        request, reference_cache.get_or_load("blog_categories", load, tags=("blog_categories",))
+    )
 
 @router.get("/tags", response_model=List[schemas.BlogTagResponse])
-def get_tags(db: Session = Depends(get_db)):
+def get_tags(request: Request, db: Session = Depends(get_db)):
     """Получить все теги"""
-    tags = db.query(models.BlogTag).all()
-    return tags
+    def load():
+        tags = db.query(models.BlogTag).all()
+        return PrecompressedBody(dump_json(List[schemas.BlogTagResponse], tags))
+    
+    return precompressed_response(request, reference_cache.get_or_load("blog_tags", load, tags=("blog_tags",)))
 
 @router.get("/posts", response_model=List[schemas.BlogPostResponse])
-def get_posts(
+async def get_posts(
     category_id: Optional[int] = Query(None),
     tag_id: Optional[int] = Query(None),
     author_id: Optional[int] = Query(None),
@@ -32,11 +71,12 @@ def get_posts(
     status: Optional[BlogPostStatus] = Query(BlogPostStatus.PUBLISHED),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[models.User] = Depends(get_current_user_optional)
 ):
     """Получить список постов блога"""
-    query = db.query(models.BlogPost)
+    query = select(models.BlogPost).options(*post_load_options())
     
     # Фильтр по статусу: только опубликованные для неавторизованных, или все для автора/админа
     if current_user is None or current_user.role != UserRole.ADMIN:
@@ -54,41 +94,32 @@ def get_posts(
     if author_id:
         query = query.filter(models.BlogPost.author_id == author_id)
     
-    if search:
-        query = query.filter(
-            (models.BlogPost.title.contains(search)) |
-            (models.BlogPost.title_ru.contains(search)) |
-            (models.BlogPost.title_ky.contains(search))
-        )
+    # С поиском выдача идет по релевантности, иначе - по дате публикации
+    query, rank = apply_search(query, models.BlogPost, search, db.bind.dialect.name)
     
     if tag_id:
         query = query.join(models.BlogPostTag).filter(
             models.BlogPostTag.tag_id == tag_id
         )
     
-    posts = query.order_by(models.BlogPost.published_at.desc(), models.BlogPost.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # Загружаем связанные данные
-    result = []
-    for post in posts:
-        post_dict = schemas.BlogPostResponse.model_validate(post).model_dump()
-        # Загружаем теги
-        post_tags = db.query(models.BlogTag).join(models.BlogPostTag).filter(
-            models.BlogPostTag.post_id == post.id
-        ).all()
-        post_dict["tags"] = [schemas.BlogTagResponse.model_validate(tag).model_dump() for tag in post_tags]
-        result.append(post_dict)
-    
-    return result
+    page, finish = select_page(query, POST_KEYSET, cursor, skip, limit, rank)
+    result = await db.execute(page)
+    posts, headers = finish(result.scalars().all())
+    # Теги загружены вместе с постами через selectinload
+    return json_response(List[schemas.BlogPostResponse], [post_data(post) for post in posts], headers=headers)
 
 @router.get("/posts/{post_id}", response_model=schemas.BlogPostResponse)
 def get_post(
     post_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: Optional[models.User] = Depends(get_current_user_optional)
 ):
     """Получить детали поста"""
-    post = db.query(models.BlogPost).filter(models.BlogPost.id == post_id).first()
+    post = db.query(models.BlogPost).options(*post_load_options()).filter(
+        models.BlogPost.id == post_id
+    ).first()
     
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -100,14 +131,13 @@ def get_post(
         if current_user.role != UserRole.ADMIN and current_user.id != post.author_id:
             raise HTTPException(status_code=403, detail="Access denied")
     
-    post_dict = schemas.BlogPostResponse.model_validate(post).model_dump()
-    # Загружаем теги
-    post_tags = db.query(models.BlogTag).join(models.BlogPostTag).filter(
-        models.BlogPostTag.post_id == post.id
-    ).all()
-    post_dict["tags"] = [schemas.BlogTagResponse.model_validate(tag).model_dump() for tag in post_tags]
-    
-    return post_dict
+    # Неопубликованный пост виден только автору и админу - общим кэшам его хранить нельзя
+    cache_control = CACHE_CONTROL_DETAIL if post.status == BlogPostStatus.PUBLISHED else CACHE_CONTROL_PRIVATE
+    rows = [post, post.author, post.category, *(post_tag.tag for post_tag in post.tags)]
+    not_modified = conditional_response(request, response, rows, cache_control)
+    if not_modified:
+        return not_modified
+    return post_response(post)
 
 # Authenticated endpoints
 @router.post("/posts", response_model=schemas.BlogPostResponse)
@@ -142,8 +172,9 @@ def create_post(
                 post_tag = models.BlogPostTag(post_id=db_post.id, tag_id=tag_id)
                 db.add(post_tag)
         db.commit()
+        db.refresh(db_post)
     
-    return db_post
+    return post_response(db_post)
 
 @router.put("/posts/{post_id}", response_model=schemas.BlogPostResponse)
 def update_post(
@@ -182,7 +213,7 @@ def update_post(
     
     db.commit()
     db.refresh(db_post)
-    return db_post
+    return post_response(db_post)
 
 @router.post("/posts/{post_id}/submit")
 def submit_post(
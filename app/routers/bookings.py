@@ -1,22 +1,35 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
 from app.auth import get_current_active_user
 from app.models import BookingStatus, UserRole
+from app.pagination import Keyset, paginate, next_page
+from app.eager_loading import load_options
 
 router = APIRouter()
 
+def booking_load_options():
+    """Связи, нужные для ответа бронирования: услуга с мастером, клиент и мастер"""
+    return load_options(models.Booking, schemas.BookingResponse)
+
+# Ленты бронирований: новые сверху
+BOOKING_KEYSET = Keyset(models.Booking.created_at, models.Booking.id)
+# Бронирования клиента и мастера: по дате записи
+BOOKING_DATE_KEYSET = Keyset(models.Booking.booking_date, models.Booking.id)
+
 @router.get("/", response_model=List[schemas.BookingResponse])
 def read_bookings(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     status: BookingStatus = None,
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.Booking)
+    query = db.query(models.Booking).options(*booking_load_options())
     
     if current_user.role == UserRole.CLIENT:
         query = query.filter(models.Booking.client_id == current_user.id)
@@ -26,7 +39,8 @@ def read_bookings(
     if status:
         query = query.filter(models.Booking.status == status)
     
-    bookings = query.offset(skip).limit(limit).all()
+    bookings, headers = next_page(paginate(query, BOOKING_KEYSET, cursor, skip, limit).all(), BOOKING_KEYSET, limit)
+    response.headers.update(headers)
     return bookings
 
 @router.get("/{booking_id}", response_model=schemas.BookingResponse)
@@ -1,12 +1,15 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import desc
 from datetime import datetime, timedelta
 from app.database import get_db
-from app import models, schemas
+from app import models, schemas, user_counters
 from app.auth import get_current_active_user
 from app.models import UserRole, BookingStatus
+from app.pagination import MAX_PAGE_SIZE, paginate, next_page
+from app.routers.bookings import booking_load_options, BOOKING_DATE_KEYSET
+from app.eager_loading import load_options
 
 router = APIRouter()
 
@@ -23,67 +26,52 @@ def get_client_stats(
     db: Session = Depends(get_db)
 ):
     """Получить статистику клиента"""
-    total_bookings = db.query(models.Booking).filter(
-        models.Booking.client_id == current_user.id
-    ).count()
-    
-    completed_bookings = db.query(models.Booking).filter(
-        models.Booking.client_id == current_user.id,
-        models.Booking.status == BookingStatus.COMPLETED
-    ).count()
-    
-    pending_bookings = db.query(models.Booking).filter(
-        models.Booking.client_id == current_user.id,
-        models.Booking.status == BookingStatus.PENDING
-    ).count()
-    
-    total_spent = db.query(func.sum(models.Booking.total_price)).filter(
-        models.Booking.client_id == current_user.id,
-        models.Booking.status == BookingStatus.COMPLETED
-    ).scalar() or 0
+    counters = user_counters.counters_for(db, current_user.id, UserRole.CLIENT)
     
-    # Бронирования за последние 30 дней
+    # Бронирования за последние 30 дней - скользящее окно, диапазон по индексу
     thirty_days_ago = datetime.now() - timedelta(days=30)
     recent_bookings = db.query(models.Booking).filter(
         models.Booking.client_id == current_user.id,
         models.Booking.created_at >= thirty_days_ago
     ).count()
     
-    total_reviews = db.query(models.Review).filter(
-        models.Review.client_id == current_user.id
-    ).count()
-    
     return {
         "bookings": {
-            "total": total_bookings,
-            "completed": completed_bookings,
-            "pending": pending_bookings,
+            "total": counters["bookings_total"],
+            "completed": counters["bookings_completed"],
+            "pending": counters["bookings_pending"],
             "recent_30_days": recent_bookings
         },
         "spending": {
-            "total": float(total_spent)
+            "total": float(counters["completed_amount"])
         },
         "reviews": {
-            "total": total_reviews
+            "total": counters["reviews"]
         }
     }
 
 # Бронирования клиента
 @router.get("/bookings", response_model=List[schemas.BookingResponse])
 def get_my_bookings(
+    response: Response,
     status: BookingStatus = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(require_client),
     db: Session = Depends(get_db)
 ):
     """Получить бронирования клиента"""
-    query = db.query(models.Booking).filter(
+    query = db.query(models.Booking).options(*booking_load_options()).filter(
         models.Booking.client_id == current_user.id
     )
     
     if status:
         query = query.filter(models.Booking.status == status)
     
-    bookings = query.order_by(desc(models.Booking.booking_date)).all()
+    bookings, headers = next_page(
+        paginate(query, BOOKING_DATE_KEYSET, cursor, 0, limit).all(), BOOKING_DATE_KEYSET, limit
+    )
+    response.headers.update(headers)
     return bookings
 
 @router.get("/bookings/{booking_id}", response_model=schemas.BookingResponse)
@@ -110,7 +98,7 @@ def get_my_reviews(
     db: Session = Depends(get_db)
 ):
     """Получить отзывы клиента"""
-    reviews = db.query(models.Review).filter(
+    reviews = db.query(models.Review).options(*load_options(models.Review, schemas.ReviewResponse)).filter(
         models.Review.client_id == current_user.id
     ).order_by(desc(models.Review.created_at)).all()
     return reviews
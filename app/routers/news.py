@@ -1,40 +1,65 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db, get_async_read_db
 from app import models, schemas
+from app.cache import reference_cache
+from app.compression import PrecompressedBody, precompressed_response
+from app.serialization import dump_json
+from app.http_cache import conditional_response, CACHE_CONTROL_LIST
+from app.pagination import Keyset, select_page
+from app.search import apply_search
+from app.eager_loading import load_options
 from app.models import NewsItemStatus
 
 router = APIRouter()
 
+# Лента: по дате публикации в источнике, новости без нее - в конце
+ITEM_KEYSET = Keyset(
+    models.NewsItem.published_at, models.NewsItem.created_at, models.NewsItem.id, nullable_first=True
+)
+
 @router.get("/categories", response_model=List[schemas.NewsCategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, db: Session = Depends(get_db)):
     """Получить все активные категории новостей"""
-    categories = db.query(models.NewsCategory).filter(
-        models.NewsCategory.is_active == True
-    ).all()
-    return categories
+    def load():
+        categories = db.query(models.NewsCategory).filter(
+            models.NewsCategory.is_active == True
+        ).all()
+        return PrecompressedBody(dump_json(List[schemas.NewsCategoryResponse], categories))
+    
+    return precompressed_response(
+        request, reference_cache.get_or_load("news_categories", load, tags=("news_categories",))
+    )
 
 @router.get("/sources", response_model=List[schemas.NewsSourceResponse])
-def get_sources(db: Session = Depends(get_db)):
+def get_sources(request: Request, db: Session = Depends(get_db)):
     """Получить все активные источники"""
-    sources = db.query(models.NewsSource).filter(
-        models.NewsSource.is_active == True
-    ).all()
-    return sources
+    def load():
+        sources = db.query(models.NewsSource).filter(
+            models.NewsSource.is_active == True
+        ).all()
+        return PrecompressedBody(dump_json(List[schemas.NewsSourceResponse], sources))
+    
+    return precompressed_response(request, reference_cache.get_or_load("news_sources", load, tags=("news_sources",)))
 
 @router.get("/items", response_model=List[schemas.NewsItemResponse])
-def get_items(
+async def get_items(
+    request: Request,
+    response: Response,
     category_id: Optional[int] = Query(None),
     source_id: Optional[int] = Query(None),
     language: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Получить ленту новостей"""
-    query = db.query(models.NewsItem).filter(
+    query = select(models.NewsItem).options(*load_options(models.NewsItem, schemas.NewsItemResponse)).filter(
         models.NewsItem.status == NewsItemStatus.ACTIVE
     )
     
@@ -49,20 +74,29 @@ def get_items(
             models.NewsSource.language == language
         )
     
-    if search:
-        query = query.filter(models.NewsItem.title.contains(search))
+    # С поиском выдача идет по релевантности, иначе - по дате публикации
+    query, rank = apply_search(query, models.NewsItem, search, db.bind.dialect.name)
     
-    items = query.order_by(
-        models.NewsItem.published_at.desc(),
-        models.NewsItem.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    page, finish = select_page(query, ITEM_KEYSET, cursor, skip, limit, rank)
+    result = await db.execute(page)
+    items, headers = finish(result.scalars().all())
+    response.headers.update(headers)
     
+    rows = [row for item in items for row in (item, item.source, item.category)]
+    not_modified = conditional_response(
+        request, response, rows, CACHE_CONTROL_LIST,
+        extra=(category_id, source_id, language, search, skip, cursor, limit, bool(headers)), with_last_modified=False
+    )
+    if not_modified:
+        return not_modified
     return items
 
 @router.get("/items/{item_id}", response_model=schemas.NewsItemResponse)
-def get_item(item_id: int, db: Session = Depends(get_db)):
+def get_item(item_id: int, db: Session = Depends(get_read_db)):
     """Получить детали новости"""
-    item = db.query(models.NewsItem).filter(models.NewsItem.id == item_id).first()
+    item = db.query(models.NewsItem).options(*load_options(models.NewsItem, schemas.NewsItemResponse)).filter(
+        models.NewsItem.id == item_id
+    ).first()
     
     if not item:
         raise HTTPException(status_code=404, detail="News item not found")
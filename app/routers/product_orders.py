@@ -3,11 +3,20 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
+from app.serialization import json_response
 from app.auth import get_current_active_user
 from app.models import UserRole, ProductOrderStatus
+from app.pagination import Keyset, MAX_PAGE_SIZE, paginate, next_page
+from app.eager_loading import load_options
 
 router = APIRouter()
 
+def order_load_options():
+    """Связи, нужные для ответа заказа: клиент, продавец и позиции с товарами"""
+    return load_options(models.ProductOrder, schemas.ProductOrderResponse)
+
+ORDER_KEYSET = Keyset(models.ProductOrder.created_at, models.ProductOrder.id)
+
 @router.post("/orders", response_model=schemas.ProductOrderResponse)
 def create_order(
     order: schemas.ProductOrderCreate,
@@ -87,6 +96,8 @@ def create_order(
 @router.get("/orders", response_model=List[schemas.ProductOrderResponse])
 def get_my_orders(
     status: Optional[ProductOrderStatus] = Query(None),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -94,23 +105,12 @@ def get_my_orders(
     if current_user.role != UserRole.CLIENT:
         raise HTTPException(status_code=403, detail="Only clients can view their orders")
     
-    query = db.query(models.ProductOrder).filter(
+    query = db.query(models.ProductOrder).options(*order_load_options()).filter(
         models.ProductOrder.client_id == current_user.id
     )
     
     if status:
         query = query.filter(models.ProductOrder.status == status)
     
-    orders = query.order_by(models.ProductOrder.created_at.desc()).all()
-    
-    result = []
-    for order in orders:
-        order_dict = schemas.ProductOrderResponse.model_validate(order).model_dump()
-        # Загружаем товары
-        items = db.query(models.ProductOrderItem).filter(
-            models.ProductOrderItem.order_id == order.id
-        ).all()
-        order_dict["items"] = [schemas.ProductOrderItemResponse.model_validate(item).model_dump() for item in items]
-        result.append(order_dict)
-    
-    return result
+    orders, headers = next_page(paginate(query, ORDER_KEYSET, cursor, 0, limit).all(), ORDER_KEYSET, limit)
+    return json_response(List[schemas.ProductOrderResponse], orders, headers=headers)
@@ -1,22 +1,42 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db, get_async_read_db
 from app import models, schemas
+from app.cache import reference_cache
+from app.serialization import dump_json, json_response
+from app.compression import PrecompressedBody, precompressed_response
+from app.http_cache import conditional_response, CACHE_CONTROL_DETAIL
+from app.pagination import Keyset, select_page
+from app.search import apply_search
+from app.eager_loading import load_options
 from app.models import ProductOrderStatus
 
 router = APIRouter()
 
+def product_load_options():
+    """Связи, нужные для ответа товара: продавец, категория и изображения"""
+    return load_options(models.Product, schemas.ProductResponse)
+
+PRODUCT_KEYSET = Keyset(models.Product.created_at, models.Product.id)
+
 @router.get("/categories", response_model=List[schemas.ProductCategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, db: Session = Depends(get_db)):
     """Получить все активные категории товаров"""
-    categories = db.query(models.ProductCategory).filter(
-        models.ProductCategory.is_active == True
-    ).all()
-    return categories
+    def load():
+        categories = db.query(models.ProductCategory).filter(
+            models.ProductCategory.is_active == True
+        ).all()
+        return PrecompressedBody(dump_json(List[schemas.ProductCategoryResponse], categories))
+    
+    return precompressed_response(
+        request, reference_cache.get_or_load("product_categories", load, tags=("product_categories",))
+    )
 
 @router.get("/products", response_model=List[schemas.ProductResponse])
-def get_products(
+async def get_products(
     category_id: Optional[int] = Query(None),
     seller_id: Optional[int] = Query(None),
     min_price: Optional[float] = Query(None),
@@ -25,10 +45,11 @@ def get_products(
     in_stock: Optional[bool] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Получить каталог товаров"""
-    query = db.query(models.Product).filter(models.Product.is_active == True)
+    query = select(models.Product).options(*product_load_options()).filter(models.Product.is_active == True)
     
     if category_id:
         query = query.filter(models.Product.category_id == category_id)
@@ -42,12 +63,8 @@ def get_products(
     if max_price:
         query = query.filter(models.Product.price <= max_price)
     
-    if search:
-        query = query.filter(
-            (models.Product.name.contains(search)) |
-            (models.Product.name_ru.contains(search)) |
-            (models.Product.name_ky.contains(search))
-        )
+    # С поиском выдача идет по релевантности, иначе - новые товары первыми
+    query, rank = apply_search(query, models.Product, search, db.bind.dialect.name)
     
     if in_stock:
         if in_stock:
@@ -61,24 +78,18 @@ def get_products(
                 (models.Product.stock_qty == 0)
             )
     
-    products = query.order_by(models.Product.created_at.desc()).offset(skip).limit(limit).all()
-    
-    result = []
-    for product in products:
-        product_dict = schemas.ProductResponse.model_validate(product).model_dump()
-        # Загружаем изображения
-        images = db.query(models.ProductImage).filter(
-            models.ProductImage.product_id == product.id
-        ).order_by(models.ProductImage.sort_order).all()
-        product_dict["images"] = [schemas.ProductImageResponse.model_validate(img).model_dump() for img in images]
-        result.append(product_dict)
-    
-    return result
+    page, finish = select_page(query, PRODUCT_KEYSET, cursor, skip, limit, rank)
+    result = await db.execute(page)
+    products, headers = finish(result.scalars().all())
+    # Изображения загружены через selectinload и уже отсортированы по sort_order
+    return json_response(List[schemas.ProductResponse], products, headers=headers)
 
 @router.get("/products/{product_id}", response_model=schemas.ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+def get_product(product_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """Получить детали товара"""
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    product = db.query(models.Product).options(*product_load_options()).filter(
+        models.Product.id == product_id
+    ).first()
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -86,17 +97,15 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
     if not product.is_active:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    product_dict = schemas.ProductResponse.model_validate(product).model_dump()
-    # Загружаем изображения
-    images = db.query(models.ProductImage).filter(
-        models.ProductImage.product_id == product.id
-    ).order_by(models.ProductImage.sort_order).all()
-    product_dict["images"] = [schemas.ProductImageResponse.model_validate(img).model_dump() for img in images]
-    
-    return product_dict
+    not_modified = conditional_response(
+        request, response, [product, product.seller, product.category, *product.images], CACHE_CONTROL_DETAIL
+    )
+    if not_modified:
+        return not_modified
+    return product
 
 @router.get("/sellers", response_model=List[schemas.UserResponse])
-def get_sellers(db: Session = Depends(get_db)):
+def get_sellers(db: Session = Depends(get_read_db)):
     """Получить список продавцов"""
     sellers = db.query(models.User).join(models.Product).filter(
         models.Product.is_active == True
@@ -1,12 +1,15 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import desc
 from datetime import datetime, timedelta
 from app.database import get_db
-from app import models, schemas
+from app import models, schemas, user_counters
 from app.auth import get_current_active_user
 from app.models import UserRole, BookingStatus, ServiceCategory
+from app.pagination import MAX_PAGE_SIZE, paginate, next_page
+from app.routers.bookings import booking_load_options, BOOKING_DATE_KEYSET
+from app.eager_loading import load_options
 
 router = APIRouter()
 
@@ -23,31 +26,9 @@ def get_professional_stats(
     db: Session = Depends(get_db)
 ):
     """Получить статистику мастера"""
-    total_services = db.query(models.Service).filter(
-        models.Service.professional_id == current_user.id,
-        models.Service.is_active == True
-    ).count()
-    
-    total_bookings = db.query(models.Booking).filter(
-        models.Booking.professional_id == current_user.id
-    ).count()
-    
-    completed_bookings = db.query(models.Booking).filter(
-        models.Booking.professional_id == current_user.id,
-        models.Booking.status == BookingStatus.COMPLETED
-    ).count()
+    counters = user_counters.counters_for(db, current_user.id, UserRole.PROFESSIONAL)
     
-    pending_bookings = db.query(models.Booking).filter(
-        models.Booking.professional_id == current_user.id,
-        models.Booking.status == BookingStatus.PENDING
-    ).count()
-    
-    total_revenue = db.query(func.sum(models.Booking.total_price)).filter(
-        models.Booking.professional_id == current_user.id,
-        models.Booking.status == BookingStatus.COMPLETED
-    ).scalar() or 0
-    
-    # Бронирования за последние 30 дней
+    # Бронирования за последние 30 дней - скользящее окно, диапазон по индексу
     thirty_days_ago = datetime.now() - timedelta(days=30)
     recent_bookings = db.query(models.Booking).filter(
         models.Booking.professional_id == current_user.id,
@@ -60,16 +41,16 @@ def get_professional_stats(
     
     return {
         "services": {
-            "total": total_services
+            "total": counters["services_active"]
         },
         "bookings": {
-            "total": total_bookings,
-            "completed": completed_bookings,
-            "pending": pending_bookings,
+            "total": counters["bookings_total"],
+            "completed": counters["bookings_completed"],
+            "pending": counters["bookings_pending"],
             "recent_30_days": recent_bookings
         },
         "revenue": {
-            "total": float(total_revenue)
+            "total": float(counters["completed_amount"])
         },
         "rating": {
             "average": float(avg_rating),
@@ -84,7 +65,7 @@ def get_my_services(
     db: Session = Depends(get_db)
 ):
     """Получить все услуги мастера"""
-    services = db.query(models.Service).filter(
+    services = db.query(models.Service).options(*load_options(models.Service, schemas.ServiceResponse)).filter(
         models.Service.professional_id == current_user.id
     ).order_by(desc(models.Service.created_at)).all()
     return services
@@ -148,19 +129,25 @@ def delete_my_service(
 # Бронирования мастера
 @router.get("/bookings", response_model=List[schemas.BookingResponse])
 def get_my_bookings(
+    response: Response,
     status: BookingStatus = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(require_professional),
     db: Session = Depends(get_db)
 ):
     """Получить бронирования мастера"""
-    query = db.query(models.Booking).filter(
+    query = db.query(models.Booking).options(*booking_load_options()).filter(
         models.Booking.professional_id == current_user.id
     )
     
     if status:
         query = query.filter(models.Booking.status == status)
     
-    bookings = query.order_by(desc(models.Booking.booking_date)).all()
+    bookings, headers = next_page(
+        paginate(query, BOOKING_DATE_KEYSET, cursor, 0, limit).all(), BOOKING_DATE_KEYSET, limit
+    )
+    response.headers.update(headers)
     return bookings
 
 @router.put("/bookings/{booking_id}/status", response_model=schemas.BookingResponse)
@@ -191,7 +178,7 @@ def get_my_reviews(
     db: Session = Depends(get_db)
 ):
     """Получить отзывы о мастере"""
-    reviews = db.query(models.Review).filter(
+    reviews = db.query(models.Review).options(*load_options(models.Review, schemas.ReviewResponse)).filter(
         models.Review.professional_id == current_user.id
     ).order_by(desc(models.Review.created_at)).all()
     return reviews
@@ -3,8 +3,12 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
+from app.serialization import json_response
 from app.auth import get_current_active_user
 from app.models import UserRole, ProductOrderStatus
+from app.routers.products import product_load_options
+from app.pagination import MAX_PAGE_SIZE, paginate, next_page
+from app.routers.product_orders import order_load_options, ORDER_KEYSET
 
 router = APIRouter()
 
@@ -20,21 +24,11 @@ def get_my_products(
     db: Session = Depends(get_db)
 ):
     """Получить мои товары"""
-    products = db.query(models.Product).filter(
+    products = db.query(models.Product).options(*product_load_options()).filter(
         models.Product.seller_id == current_user.id
     ).order_by(models.Product.created_at.desc()).all()
-    
-    result = []
-    for product in products:
-        product_dict = schemas.ProductResponse.model_validate(product).model_dump()
-        # Загружаем изображения
-        images = db.query(models.ProductImage).filter(
-            models.ProductImage.product_id == product.id
-        ).order_by(models.ProductImage.sort_order).all()
-        product_dict["images"] = [schemas.ProductImageResponse.model_validate(img).model_dump() for img in images]
-        result.append(product_dict)
-    
-    return result
+    # Изображения загружены через selectinload и уже отсортированы по sort_order
+    return products
 
 @router.post("/products", response_model=schemas.ProductResponse)
 def create_product(
@@ -130,30 +124,21 @@ def delete_product(
 @router.get("/orders", response_model=List[schemas.ProductOrderResponse])
 def get_my_orders(
     status: Optional[ProductOrderStatus] = Query(None),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     current_user: models.User = Depends(require_professional),
     db: Session = Depends(get_db)
 ):
     """Получить заказы продавца"""
-    query = db.query(models.ProductOrder).filter(
+    query = db.query(models.ProductOrder).options(*order_load_options()).filter(
         models.ProductOrder.seller_id == current_user.id
     )
     
     if status:
         query = query.filter(models.ProductOrder.status == status)
     
-    orders = query.order_by(models.ProductOrder.created_at.desc()).all()
-    
-    result = []
-    for order in orders:
-        order_dict = schemas.ProductOrderResponse.model_validate(order).model_dump()
-        # Загружаем товары
-        items = db.query(models.ProductOrderItem).filter(
-            models.ProductOrderItem.order_id == order.id
-        ).all()
-        order_dict["items"] = [schemas.ProductOrderItemResponse.model_validate(item).model_dump() for item in items]
-        result.append(order_dict)
-    
-    return result
+    orders, headers = next_page(paginate(query, ORDER_KEYSET, cursor, 0, limit).all(), ORDER_KEYSET, limit)
+    return json_response(List[schemas.ProductOrderResponse], orders, headers=headers)
 
 @router.put("/orders/{order_id}/status")
 def update_order_status(
@@ -1,32 +1,41 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app import models, schemas
 from app.auth import get_current_active_user
 from app.models import BookingStatus
+from app.pagination import Keyset, paginate, next_page
+from app.eager_loading import load_options
 
 router = APIRouter()
 
+REVIEW_KEYSET = Keyset(models.Review.created_at, models.Review.id)
+
 @router.get("/", response_model=List[schemas.ReviewResponse])
 def read_reviews(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     professional_id: int = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(models.Review)
+    query = db.query(models.Review).options(*load_options(models.Review, schemas.ReviewResponse))
     
     if professional_id:
         query = query.filter(models.Review.professional_id == professional_id)
     
-    reviews = query.offset(skip).limit(limit).order_by(models.Review.created_at.desc()).all()
+    reviews, headers = next_page(paginate(query, REVIEW_KEYSET, cursor, skip, limit).all(), REVIEW_KEYSET, limit)
+    response.headers.update(headers)
     return reviews
 
 @router.get("/{review_id}", response_model=schemas.ReviewResponse)
-def read_review(review_id: int, db: Session = Depends(get_db)):
-    review = db.query(models.Review).filter(models.Review.id == review_id).first()
+def read_review(review_id: int, db: Session = Depends(get_read_db)):
+    review = db.query(models.Review).options(*load_options(models.Review, schemas.ReviewResponse)).filter(
+        models.Review.id == review_id
+    ).first()
     if review is None:
         raise HTTPException(status_code=404, detail="Review not found")
     return review
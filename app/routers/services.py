@@ -1,22 +1,26 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.database import get_db, get_read_db, get_async_read_db
 from app import models, schemas
+from app.http_cache import conditional_response, CACHE_CONTROL_DETAIL
 from app.auth import get_current_active_user
 from app.models import ServiceCategory, UserRole
+from app.eager_loading import load_options
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.ServiceResponse])
-def read_services(
+async def read_services(
     skip: int = 0,
     limit: int = 100,
     category: ServiceCategory = None,
     professional_id: int = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    query = db.query(models.Service).options(joinedload(models.Service.professional)).filter(models.Service.is_active == True)
+    query = select(models.Service).options(*load_options(models.Service, schemas.ServiceResponse)).filter(models.Service.is_active == True)
     
     if category:
         query = query.filter(models.Service.category == category)
@@ -24,18 +28,27 @@ def read_services(
     if professional_id:
         query = query.filter(models.Service.professional_id == professional_id)
     
-    services = query.offset(skip).limit(limit).all()
+    result = await db.execute(query.offset(skip).limit(limit))
+    services = result.scalars().all()
     return services
 
+# Категории услуг - перечисление, список строится один раз при импорте
+SERVICE_CATEGORIES = [{"value": cat.value, "name": cat.name} for cat in ServiceCategory]
+
 @router.get("/categories")
 def get_categories():
-    return [{"value": cat.value, "name": cat.name} for cat in ServiceCategory]
+    return SERVICE_CATEGORIES
 
 @router.get("/{service_id}", response_model=schemas.ServiceResponse)
-def read_service(service_id: int, db: Session = Depends(get_db)):
-    service = db.query(models.Service).filter(models.Service.id == service_id).first()
+def read_service(service_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    service = db.query(models.Service).options(*load_options(models.Service, schemas.ServiceResponse)).filter(
+        models.Service.id == service_id
+    ).first()
     if service is None:
         raise HTTPException(status_code=404, detail="Service not found")
+    not_modified = conditional_response(request, response, [service, service.professional], CACHE_CONTROL_DETAIL)
+    if not_modified:
+        return not_modified
     return service
 
 @router.post("/", response_model=schemas.ServiceResponse)
@@ -1,77 +1,96 @@
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select, func
 from datetime import datetime
-from app.database import get_db
+from app.database import get_db, get_read_db, get_async_db
 from app import models, schemas
+from app.cache import reference_cache
+from app.compression import PrecompressedBody, precompressed_response
+from app.serialization import dump_json
 from app.auth import get_current_active_user
 from app.models import DayStatus, ProgramStatus, HabitCategory
 
 router = APIRouter()
 
+# Тексты лендинга трекера не зависят от данных в базе
+TRACKER_PUBLIC_INFO = {
+    "title": "Beauty Tracker - 30 Days of Self-Care",
+    "title_ru": "Beauty Tracker - 30 дней заботы о себе",
+    "title_ky": "Beauty Tracker - Өзүңүзгө кам көрүүнүн 30 күнү",
+    "description": "A gentle 30-day program of daily beauty and self-care habits. Each day brings a simple, manageable plan to help you build consistency without overwhelm.",
+    "description_ru": "Мягкая 30-дневная программа ежедневных привычек красоты и заботы о себе. Каждый день приносит простой, выполнимый план, который поможет вам выработать регулярность без перегрузки.",
+    "description_ky": "Күн сайын сулуулук жана өзүңүзгө кам көрүү кылык-жоруктарынын жумшак 30 күндүк программасы. Ар бир күн жөнөкөй, аткарууга мүмкүн болгон планды алып келет, ал сизге чыңалуусуз туруктуулукту түзүүгө жардам берет.",
+    "benefits": [
+        "Build consistent self-care habits",
+        "Simple daily tasks that don't overwhelm",
+        "Track your progress over 30 days",
+        "Focus on face, body, and lifestyle"
+    ],
+    "benefits_ru": [
+        "Выработайте регулярные привычки заботы о себе",
+        "Простые ежедневные задачи, которые не перегружают",
+        "Отслеживайте свой прогресс в течение 30 дней",
+        "Фокус на лице, теле и образе жизни"
+    ],
+    "benefits_ky": [
+        "Өзүңүзгө кам көрүүнүн туруктуу кылык-жоруктарын түзүү",
+        "Чыңалуусуз күн сайын жөнөкөй милдеттер",
+        "30 күн бою прогрессиңизди көзөмөлдөө",
+        "Бет, дене жана жашоо образына багыттоо"
+    ]
+}
+
+TRACKER_PUBLIC_BODY = PrecompressedBody(dump_json(schemas.TrackerPublicInfo, TRACKER_PUBLIC_INFO))
+
 # Публичные endpoints
 @router.get("/public/programs")
-def get_public_programs(db: Session = Depends(get_db)):
+def get_public_programs(request: Request, db: Session = Depends(get_db)):
     """Получить список ВСЕХ АКТИВНЫХ программ для гостей (только is_active == True)"""
-    # Фильтруем только активные программы
-    templates = db.query(models.TrackerProgramTemplate).filter(
-        models.TrackerProgramTemplate.is_active == True
-    ).order_by(models.TrackerProgramTemplate.id).all()
-    
-    result = []
-    for template in templates:
-        # Подсчитываем количество дней для каждой программы
-        days_count = db.query(models.TrackerProgramDay).filter(
-            models.TrackerProgramDay.program_template_id == template.id
-        ).count()
+    def load():
+        # Фильтруем только активные программы
+        templates = db.query(models.TrackerProgramTemplate).filter(
+            models.TrackerProgramTemplate.is_active == True
+        ).order_by(models.TrackerProgramTemplate.id).all()
+    
+        # Количество дней всех программ одним запросом
+        days_counts = dict(db.query(
+            models.TrackerProgramDay.program_template_id,
+            func.count(models.TrackerProgramDay.id)
+        ).filter(
+            models.TrackerProgramDay.program_template_id.in_([template.id for template in templates])
+        ).group_by(models.TrackerProgramDay.program_template_id).all()) if templates else {}
+    
+        result = []
+        for template in templates:
+            days_count = days_counts.get(template.id, 0)
         
-        # Возвращаем только активные программы
-        result.append({
-            "id": template.id,
-            "name": template.name,
-            "description": template.description,
-            "description_ru": template.description_ru,
-            "description_ky": template.description_ky,
-            "days_count": days_count,
-            "version": template.version,
-            "is_active": True  # Явно указываем, что все программы активны
-        })
+            # Возвращаем только активные программы
+            result.append({
+                "id": template.id,
+                "name": template.name,
+                "description": template.description,
+                "description_ru": template.description_ru,
+                "description_ky": template.description_ky,
+                "days_count": days_count,
+                "version": template.version,
+                "is_active": True  # Явно указываем, что все программы активны
+            })
+    
+        return PrecompressedBody(dump_json(List[dict], result))
     
-    return result
+    return precompressed_response(
+        request, reference_cache.get_or_load("tracker_public_programs", load, tags=("tracker_programs",))
+    )
 
 @router.get("/public", response_model=schemas.TrackerPublicInfo)
-def get_public_info(db: Session = Depends(get_db)):
+def get_public_info(request: Request):
     """Получить публичную информацию о трекере для лендинга"""
-    return {
-        "title": "Beauty Tracker - 30 Days of Self-Care",
-        "title_ru": "Beauty Tracker - 30 дней заботы о себе",
-        "title_ky": "Beauty Tracker - Өзүңүзгө кам көрүүнүн 30 күнү",
-        "description": "A gentle 30-day program of daily beauty and self-care habits. Each day brings a simple, manageable plan to help you build consistency without overwhelm.",
-        "description_ru": "Мягкая 30-дневная программа ежедневных привычек красоты и заботы о себе. Каждый день приносит простой, выполнимый план, который поможет вам выработать регулярность без перегрузки.",
-        "description_ky": "Күн сайын сулуулук жана өзүңүзгө кам көрүү кылык-жоруктарынын жумшак 30 күндүк программасы. Ар бир күн жөнөкөй, аткарууга мүмкүн болгон планды алып келет, ал сизге чыңалуусуз туруктуулукту түзүүгө жардам берет.",
-        "benefits": [
-            "Build consistent self-care habits",
-            "Simple daily tasks that don't overwhelm",
-            "Track your progress over 30 days",
-            "Focus on face, body, and lifestyle"
-        ],
-        "benefits_ru": [
-            "Выработайте регулярные привычки заботы о себе",
-            "Простые ежедневные задачи, которые не перегружают",
-            "Отслеживайте свой прогресс в течение 30 дней",
-            "Фокус на лице, теле и образе жизни"
-        ],
-        "benefits_ky": [
-            "Өзүңүзгө кам көрүүнүн туруктуу кылык-жоруктарын түзүү",
-            "Чыңалуусуз күн сайын жөнөкөй милдеттер",
-            "30 күн бою прогрессиңизди көзөмөлдөө",
-            "Бет, дене жана жашоо образына багыттоо"
-        ]
-    }
+    return precompressed_response(request, TRACKER_PUBLIC_BODY)
 
 @router.get("/public/programs/{program_id}/demo-day")
-def get_demo_day(program_id: int, db: Session = Depends(get_db)):
+def get_demo_day(program_id: int, db: Session = Depends(get_read_db)):
     """Получить пример дня для демонстрации конкретной программы (без персональных данных)"""
     # Проверяем, что программа существует и активна
     template = db.query(models.TrackerProgramTemplate).filter(
@@ -91,15 +110,10 @@ def get_demo_day(program_id: int, db: Session = Depends(get_db)):
     if not day:
         raise HTTPException(status_code=404, detail="Demo day not found")
     
-    # Получаем привычки для этого дня
-    day_habits = db.query(models.TrackerProgramDayHabit).filter(
-        models.TrackerProgramDayHabit.program_day_id == day.id
-    ).order_by(models.TrackerProgramDayHabit.sort_order).all()
-    
+    # Получаем привычки для этого дня одним запросом
     habits = []
-    for dh in day_habits:
-        habit = db.query(models.TrackerHabit).filter(models.TrackerHabit.id == dh.habit_id).first()
-        if habit and habit.is_active:
+    for habit in db.execute(_day_habits_query(day)).scalars().all():
+        if habit.is_active:
             habits.append({
                 "id": habit.id,
                 "category": habit.category.value,
@@ -189,48 +203,56 @@ def get_current_program(
     return program
 
 @router.get("/days/current", response_model=schemas.TrackerUserDayResponse)
-def get_current_day(
+async def get_current_day(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получить текущий открытый день"""
-    program = db.query(models.TrackerUserProgram).filter(
-        models.TrackerUserProgram.user_id == current_user.id,
-        models.TrackerUserProgram.status == ProgramStatus.ACTIVE
-    ).first()
+    program = (await db.execute(
+        select(models.TrackerUserProgram).filter(
+            models.TrackerUserProgram.user_id == current_user.id,
+            models.TrackerUserProgram.status == ProgramStatus.ACTIVE
+        )
+    )).scalars().first()
     
     if not program:
         raise HTTPException(status_code=404, detail="No active program found")
     
     # Находим текущий открытый день
-    current_day = db.query(models.TrackerUserDay).filter(
-        models.TrackerUserDay.user_program_id == program.id,
-        models.TrackerUserDay.status == DayStatus.OPEN
-    ).first()
+    current_day = (await db.execute(
+        select(models.TrackerUserDay).filter(
+            models.TrackerUserDay.user_program_id == program.id,
+            models.TrackerUserDay.status == DayStatus.OPEN
+        )
+    )).scalars().first()
     
     if not current_day:
         # Если нет открытого дня, ищем последний завершенный/пропущенный
-        last_day = db.query(models.TrackerUserDay).filter(
-            models.TrackerUserDay.user_program_id == program.id,
-            models.TrackerUserDay.status.in_([DayStatus.COMPLETED, DayStatus.SKIPPED])
-        ).order_by(models.TrackerUserDay.day_number.desc()).first()
+        last_day = (await db.execute(
+            select(models.TrackerUserDay).filter(
+                models.TrackerUserDay.user_program_id == program.id,
+                models.TrackerUserDay.status.in_([DayStatus.COMPLETED, DayStatus.SKIPPED])
+            ).order_by(models.TrackerUserDay.day_number.desc())
+        )).scalars().first()
         
         if last_day and last_day.day_number < 30:
             # Открываем следующий день
-            next_day = db.query(models.TrackerUserDay).filter(
-                models.TrackerUserDay.user_program_id == program.id,
-                models.TrackerUserDay.day_number == last_day.day_number + 1
-            ).first()
+            next_day = (await db.execute(
+                select(models.TrackerUserDay).filter(
+                    models.TrackerUserDay.user_program_id == program.id,
+                    models.TrackerUserDay.day_number == last_day.day_number + 1
+                )
+            )).scalars().first()
             
             if next_day:
                 next_day.status = DayStatus.OPEN
                 next_day.opened_at = datetime.utcnow()
-                db.commit()
+                await db.commit()
                 current_day = next_day
         else:
             raise HTTPException(status_code=404, detail="No current day available")
     
-    return _build_day_response(current_day, program, db)
+    return await _build_day_response_async(current_day, program, db)
 
 @router.get("/days/{day_number}", response_model=schemas.TrackerUserDayResponse)
 def get_day(
@@ -488,42 +510,53 @@ def get_progress(
         "allowed_skips": program.allowed_skips
     }
 
-def _build_day_response(user_day: models.TrackerUserDay, program: models.TrackerUserProgram, db: Session) -> dict:
-    """Вспомогательная функция для построения ответа дня"""
-    # Получаем данные дня из шаблона
-    program_day = db.query(models.TrackerProgramDay).filter(
+def _program_day_query(program: models.TrackerUserProgram, day_number: int):
+    return select(models.TrackerProgramDay).filter(
         models.TrackerProgramDay.program_template_id == program.program_template_id,
-        models.TrackerProgramDay.day_number == user_day.day_number
-    ).first()
+        models.TrackerProgramDay.day_number == day_number
+    )
+
+def _day_habits_query(program_day: models.TrackerProgramDay):
+    # Привычки дня одним запросом, в порядке sort_order
+    return select(models.TrackerHabit).join(
+        models.TrackerProgramDayHabit,
+        models.TrackerProgramDayHabit.habit_id == models.TrackerHabit.id
+    ).filter(
+        models.TrackerProgramDayHabit.program_day_id == program_day.id
+    ).order_by(models.TrackerProgramDayHabit.sort_order)
+
+def _day_logs_query(user_day: models.TrackerUserDay):
+    return select(models.TrackerUserDayLog).filter(
+        models.TrackerUserDayLog.user_day_id == user_day.id
+    ).order_by(models.TrackerUserDayLog.id)
+
+def _assemble_day_response(
+    user_day: models.TrackerUserDay,
+    program_day: Optional[models.TrackerProgramDay],
+    habits: List[models.TrackerHabit],
+    logs: List[models.TrackerUserDayLog]
+) -> dict:
+    """Собрать ответ дня из уже загруженных данных"""
+    logs_by_habit = {}
+    for log in logs:
+        logs_by_habit.setdefault(log.habit_id, log)
     
-    # Получаем привычки для этого дня
     habits_data = []
-    if program_day:
-        day_habits = db.query(models.TrackerProgramDayHabit).filter(
-            models.TrackerProgramDayHabit.program_day_id == program_day.id
-        ).order_by(models.TrackerProgramDayHabit.sort_order).all()
-        
-        for dh in day_habits:
-            habit = db.query(models.TrackerHabit).filter(models.TrackerHabit.id == dh.habit_id).first()
-            if habit:
-                # Проверяем, есть ли лог для этой привычки
-                log = db.query(models.TrackerUserDayLog).filter(
-                    models.TrackerUserDayLog.user_day_id == user_day.id,
-                    models.TrackerUserDayLog.habit_id == habit.id
-                ).first()
-                
-                habits_data.append({
-                    "id": habit.id,
-                    "category": habit.category.value,
-                    "title": habit.title,
-                    "title_ru": habit.title_ru,
-                    "title_ky": habit.title_ky,
-                    "description": habit.description,
-                    "description_ru": habit.description_ru,
-                    "description_ky": habit.description_ky,
-                    "completed": log.completed if log else False,
-                    "log_id": log.id if log else None
-                })
+    for habit in habits:
+        # Проверяем, есть ли лог для этой привычки
+        log = logs_by_habit.get(habit.id)
+        habits_data.append({
+            "id": habit.id,
+            "category": habit.category.value,
+            "title": habit.title,
+            "title_ru": habit.title_ru,
+            "title_ky": habit.title_ky,
+            "description": habit.description,
+            "description_ru": habit.description_ru,
+            "description_ky": habit.description_ky,
+            "completed": log.completed if log else False,
+            "log_id": log.id if log else None
+        })
     
     return {
         "id": user_day.id,
@@ -536,3 +569,28 @@ def _build_day_response(user_day: models.TrackerUserDay, program: models.Tracker
         "focus_text_ky": program_day.focus_text_ky if program_day else None,
         "habits": habits_data
     }
+
+def _build_day_response(user_day: models.TrackerUserDay, program: models.TrackerUserProgram, db: Session) -> dict:
+    """Вспомогательная функция для построения ответа дня"""
+    # Получаем данные дня из шаблона
+    program_day = db.execute(_program_day_query(program, user_day.day_number)).scalars().first()
+    
+    habits = []
+    logs = []
+    if program_day:
+        habits = db.execute(_day_habits_query(program_day)).scalars().all()
+        logs = db.execute(_day_logs_query(user_day)).scalars().all()
+    
+    return _assemble_day_response(user_day, program_day, habits, logs)
+
+async def _build_day_response_async(user_day: models.TrackerUserDay, program: models.TrackerUserProgram, db: AsyncSession) -> dict:
+    """Асинхронный вариант _build_day_response"""
+    program_day = (await db.execute(_program_day_query(program, user_day.day_number))).scalars().first()
+    
+    habits = []
+    logs = []
+    if program_day:
+        habits = (await db.execute(_day_habits_query(program_day))).scalars().all()
+        logs = (await db.execute(_day_logs_query(user_day))).scalars().all()
+    
+    return _assemble_day_response(user_day, program_day, habits, logs)
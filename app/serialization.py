@@ -0,0 +1,32 @@
+"""
+Сериализация ответа за один проход: данные (ORM-объекты или словари) валидируются
+по схеме ответа один раз и сразу превращаются в JSON-байты в pydantic-core.
+
+Обработчик, который возвращает json_response(...), обходит повторную валидацию
+FastAPI по response_model (а для синхронных обработчиков - еще и лишний переход
+в пул потоков). response_model в декораторе остается, поэтому OpenAPI-схема не меняется.
+"""
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+@lru_cache(maxsize=None)
+def type_adapter(response_type) -> TypeAdapter:
+    """TypeAdapter строится один раз на тип: сборка схемы валидатора дорогая"""
+    return TypeAdapter(response_type)
+
+def dump_json(response_type, data: Any) -> bytes:
+    adapter = type_adapter(response_type)
+    # by_alias=True - как у FastAPI при сериализации по response_model
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True), by_alias=True)
+
+def json_response(response_type, data: Any, status_code: int = 200, headers: dict = None) -> Response:
+    """Готовый JSON-ответ по схеме response_type (например, List[schemas.ProductResponse])"""
+    return Response(
+        content=dump_json(response_type, data),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
@@ -0,0 +1,340 @@
+"""
+Снимок статистики админки (/api/admin/stats).
+
+Счетчики хранятся в таблице stats_counters (имя -> значение) и обновляются в той же
+транзакции, что и запись: при каждом flush ORM-сессии считается вклад добавленных,
+измененных и удаленных пользователей, услуг, бронирований и отзывов, и счетчики
+увеличиваются одним UPSERT (value = value + delta). Эндпоинт читает готовые значения
+одним запросом, сколько бы строк ни было в таблицах.
+
+Записи в обход ORM-сессии (generate_dataset, ручной SQL) и сдвиг окна "бронирования
+за 30 дней" счетчики не отражают - их выравнивает сверка: все агрегаты пересчитываются
+одним сгруппированным запросом и записываются поверх (UPSERT) под блокировкой счетчиков,
+так что изменения параллельных транзакций не теряются. Сверка выполняется фоновой
+задачей раз в STATS_RECONCILE_INTERVAL секунд (0 - отключить) и вручную:
+    python -m app.stats_snapshot
+
+Счетчик, которого еще не было в таблице, изменение создает с reconciled_at =
+NEVER_RECONCILED. На обновленной базе так появляются первые счетчики после выката -
+с одними изменениями без исторических строк; встретив такой счетчик, эндпоинт
+сначала выполняет сверку, а не показывает неполные итоги как только что сверенные.
+"""
+import asyncio
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from anyio import to_thread
+from sqlalchemy import String, case, cast, delete, event, func, inspect, insert, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models import UserRole, BookingStatus
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "900"))
+RECENT_DAYS = 30
+
+COUNTERS = models.StatsCounter.__table__
+_PENDING = "stats_snapshot.pending"
+# reconciled_at счетчика, созданного изменением, а не сверкой: его значение - только
+# сумма изменений с момента создания, а не агрегат по таблице
+NEVER_RECONCILED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _utc(value: datetime) -> datetime:
+    # SQLite возвращает время без часового пояса - оно хранится в UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+# Вклад одной строки в счетчики; value(name) - значение атрибута строки
+
+def _user(value, now) -> dict:
+    counters = {"users.total": 1}
+    role = value("role")
+    if role is not None:
+        role = UserRole(role)
+        counters[f"users.role.{role.value}"] = 1
+        rating = value("rating") or 0
+        if role == UserRole.PROFESSIONAL and rating > 0:
+            counters["rating.sum"] = rating
+            counters["rating.count"] = 1
+    return counters
+
+def _service(value, now) -> dict:
+    return {"services.active": 1} if value("is_active") else {}
+
+def _booking(value, now) -> dict:
+    counters = {"bookings.total": 1}
+    status = value("status")
+    if status is not None:
+        status = BookingStatus(status)
+        counters[f"bookings.status.{status.value}"] = 1
+        if status == BookingStatus.COMPLETED:
+            counters["revenue.total"] = value("total_price") or 0
+    created_at = value("created_at")
+    # Новая строка еще не знает created_at (его ставит база) - она создана сейчас
+    if created_at is None or _utc(created_at) >= now - timedelta(days=RECENT_DAYS):
+        counters["bookings.recent"] = 1
+    return counters
+
+def _review(value, now) -> dict:
+    return {"reviews.total": 1}
+
+CONTRIBUTIONS = {
+    models.User: _user,
+    models.Service: _service,
+    models.Booking: _booking,
+    models.Review: _review,
+}
+
+def old_value(obj, name):
+    """Значение атрибута до изменений в этой сессии"""
+    state = inspect(obj)
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added and state.key is not None:
+        # Атрибут присвоили, не загрузив (например, после commit объект истек):
+        # прежнее значение еще лежит в базе
+        table = obj.__table__
+        return state.session.connection().execute(
+            select(table.c[name]).where(table.c.id == state.key[1][0])
+        ).scalar()
+    return getattr(obj, name)
+
+def _add(deltas: dict, counters: dict, sign: int):
+    for name, value in counters.items():
+        deltas[name] += sign * value
+
+def _before_flush(session, flush_context, instances):
+    # Измененные и удаленные строки: прежние значения доступны только до flush
+    deltas = session.info[_PENDING] = defaultdict(float)
+    now = datetime.now(timezone.utc)
+    for obj in session.dirty:
+        contribution = CONTRIBUTIONS.get(type(obj))
+        if contribution is None or not session.is_modified(obj):
+            continue
+        _add(deltas, contribution(lambda name: getattr(obj, name), now), 1)
+        _add(deltas, contribution(lambda name: old_value(obj, name), now), -1)
+    for obj in session.deleted:
+        contribution = CONTRIBUTIONS.get(type(obj))
+        if contribution is not None:
+            _add(deltas, contribution(lambda name: old_value(obj, name), now), -1)
+
+def _after_flush(session, flush_context):
+    # Новые строки: значения по умолчанию проставлены только после INSERT
+    deltas = session.info.pop(_PENDING, None) or defaultdict(float)
+    now = datetime.now(timezone.utc)
+    for obj in session.new:
+        contribution = CONTRIBUTIONS.get(type(obj))
+        if contribution is not None:
+            state = inspect(obj)
+            _add(deltas, contribution(lambda name: state.dict.get(name), now), 1)
+    apply_deltas(session.connection(), deltas, now)
+
+def install():
+    """Обновлять счетчики при flush любой ORM-сессии (синхронной и асинхронной)"""
+    if not event.contains(Session, "before_flush", _before_flush):
+        event.listen(Session, "before_flush", _before_flush)
+        event.listen(Session, "after_flush", _after_flush)
+
+def apply_deltas(connection, deltas: dict, now: datetime):
+    """Прибавить изменения к счетчикам; отсутствующие счетчики создаются несверенными"""
+    # Порядок имен постоянный: параллельные транзакции блокируют строки в одном порядке
+    rows = [
+        {"name": name, "value": delta, "updated_at": now, "reconciled_at": NEVER_RECONCILED}
+        for name, delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(COUNTERS)
+        statement = statement.on_conflict_do_update(
+            index_elements=[COUNTERS.c.name],
+            set_={"value": COUNTERS.c.value + statement.excluded.value, "updated_at": statement.excluded.updated_at},
+        )
+        connection.execute(statement, rows)
+        return
+    for row in rows:
+        result = connection.execute(
+            update(COUNTERS).where(COUNTERS.c.name == row["name"]).values(
+                value=COUNTERS.c.value + row["value"], updated_at=now
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(COUNTERS), row)
+
+def _members(enum_class) -> dict:
+    # Enum-колонка хранит имя члена перечисления; значения - на случай старых баз
+    return {**{member.value: member for member in enum_class}, **{member.name: member for member in enum_class}}
+
+_ROLES = _members(UserRole)
+_STATUSES = _members(BookingStatus)
+
+def compute(connection, now: Optional[datetime] = None) -> dict:
+    """Все агрегаты по таблицам одним сгруппированным запросом"""
+    now = now or datetime.now(timezone.utc)
+    User, Service, Booking, Review = models.User, models.Service, models.Booking, models.Review
+    rated = User.rating > 0
+    statement = union_all(
+        select(
+            literal("users"), cast(User.role, String), func.count(),
+            func.sum(case((rated, User.rating), else_=0.0)), func.count(case((rated, 1)))
+        ).group_by(User.role),
+        select(literal("services"), literal(""), func.count(), literal(0.0), literal(0)).where(
+            Service.is_active == True
+        ),
+        select(
+            literal("bookings"), cast(Booking.status, String), func.count(), func.sum(Booking.total_price),
+            func.count(case((Booking.created_at >= now - timedelta(days=RECENT_DAYS), 1)))
+        ).group_by(Booking.status),
+        select(literal("reviews"), literal(""), func.count(), literal(0.0), literal(0)).select_from(Review),
+    )
+
+    counters = defaultdict(float)
+    for name in ("users.total", "services.active", "bookings.total", "bookings.recent", "reviews.total",
+                 "revenue.total", "rating.sum", "rating.count"):
+        counters[name] = 0.0
+    for entity, group, rows, amount, extra in connection.execute(statement):
+        if entity == "users":
+            counters["users.total"] += rows
+            role = _ROLES.get(group)
+            if role is not None:
+                counters[f"users.role.{role.value}"] += rows
+                if role == UserRole.PROFESSIONAL:
+                    counters["rating.sum"] += amount or 0
+                    counters["rating.count"] += extra
+        elif entity == "services":
+            counters["services.active"] += rows
+        elif entity == "bookings":
+            counters["bookings.total"] += rows
+            counters["bookings.recent"] += extra
+            status = _STATUSES.get(group)
+            if status is not None:
+                counters[f"bookings.status.{status.value}"] += rows
+                if status == BookingStatus.COMPLETED:
+                    counters["revenue.total"] += amount or 0
+        elif entity == "reviews":
+            counters["reviews.total"] += rows
+    return dict(counters)
+
+def reconcile(connection, now: Optional[datetime] = None) -> dict:
+    """Пересчитать снимок по таблицам и записать его поверх текущего (в транзакции connection)"""
+    now = now or datetime.now(timezone.utc)
+    # Сначала блокировка счетчиков (в SQLite - всей базы на запись) до commit: UPSERT из
+    # параллельных flush ждет сверки, а уже записанные ими строки видны compute() ниже
+    connection.execute(update(COUNTERS).values(value=COUNTERS.c.value))
+    counters = compute(connection, now)
+    rows = [
+        {"name": name, "value": value, "updated_at": now, "reconciled_at": now}
+        for name, value in sorted(counters.items())
+    ]
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(COUNTERS)
+        statement = statement.on_conflict_do_update(
+            index_elements=[COUNTERS.c.name],
+            set_={name: statement.excluded[name] for name in ("value", "updated_at", "reconciled_at")},
+        )
+        connection.execute(statement, rows)
+    else:
+        for row in rows:
+            result = connection.execute(update(COUNTERS).where(COUNTERS.c.name == row["name"]).values(**row))
+            if result.rowcount == 0:
+                connection.execute(insert(COUNTERS), row)
+    # Счетчики, которых сверка больше не дает (например, статус без бронирований)
+    connection.execute(delete(COUNTERS).where(COUNTERS.c.name.not_in(list(counters))))
+    return counters
+
+def reconcile_database(engine) -> dict:
+    with engine.begin() as connection:
+        return reconcile(connection)
+
+async def reconcile_periodically(engine, interval: float = RECONCILE_INTERVAL):
+    """Фоновая задача: сверять снимок раз в interval секунд"""
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await to_thread.run_sync(reconcile_database, engine)
+        except Exception:
+            logger.exception("Сверка снимка статистики не удалась")
+
+def statistics(counters: dict, updated_at: datetime, reconciled_at: datetime, fresh: bool) -> dict:
+    """Ответ /api/admin/stats из счетчиков"""
+    def count(name: str) -> int:
+        return int(round(counters.get(name, 0)))
+
+    now = datetime.now(timezone.utc)
+    rating_count = counters.get("rating.count", 0)
+    return {
+        "users": {
+            "total": count("users.total"),
+            "clients": count(f"users.role.{UserRole.CLIENT.value}"),
+            "professionals": count(f"users.role.{UserRole.PROFESSIONAL.value}")
+        },
+        "services": {
+            "total": count("services.active")
+        },
+        "bookings": {
+            "total": count("bookings.total"),
+            "by_status": {
+                status.value: count(f"bookings.status.{status.value}")
+                for status in BookingStatus if count(f"bookings.status.{status.value}")
+            },
+            "recent_30_days": count("bookings.recent")
+        },
+        "reviews": {
+            "total": count("reviews.total")
+        },
+        "revenue": {
+            "total": float(counters.get("revenue.total", 0))
+        },
+        "average_rating": float(counters.get("rating.sum", 0) / rating_count) if rating_count else 0.0,
+        "snapshot": {
+            "fresh": fresh,
+            "updated_at": updated_at.isoformat(),
+            "reconciled_at": reconciled_at.isoformat(),
+            "seconds_since_reconcile": round((now - reconciled_at).total_seconds(), 1)
+        }
+    }
+
+def snapshot_statistics(db: Session, fresh: bool = False) -> dict:
+    """Статистика из снимка или, если fresh, пересчитанная по таблицам"""
+    now = datetime.now(timezone.utc)
+    if fresh:
+        return statistics(compute(db.connection(), now), now, now, fresh=True)
+
+    rows = db.execute(select(COUNTERS)).all()
+    if not rows or any(_utc(row.reconciled_at) <= NEVER_RECONCILED for row in rows):
+        # Снимок еще не строился (база создана до его появления) или в нем есть счетчики,
+        # созданные изменениями без сверки (например, первые записи после обновления)
+        counters = reconcile(db.connection(), now)
+        db.commit()
+        return statistics(counters, now, now, fresh=True)
+
+    return statistics(
+        {row.name: row.value for row in rows},
+        max(_utc(row.updated_at) for row in rows),
+        min(_utc(row.reconciled_at) for row in rows),
+        fresh=False,
+    )
+
+if __name__ == "__main__":
+    from app.database import engine, Base
+
+    Base.metadata.create_all(bind=engine, tables=[COUNTERS])
+    try:
+        counters = reconcile_database(engine)
+        for name, value in sorted(counters.items()):
+            print(f"  {name}: {value:g}")
+        print("[OK] Снимок статистики пересчитан")
+    except Exception as e:
+        print(f"[ERROR] Ошибка: {e}")
+        sys.exit(1)
@@ -0,0 +1,177 @@
+"""
+Структурированные логи без записи в stdout на пути запроса.
+
+configure_logging() заменяет обработчики корневого логгера одним QueueHandler: в потоке
+запроса запись только дополняется request_id и кладется в очередь, а форматирование
+JSON (вместе с трейсбеком исключения) и запись в stdout выполняет фоновый поток
+QueueListener. Очередь ограничена LOG_QUEUE_SIZE записями; если писатель не успевает,
+новые записи отбрасываются (счетчик log_records_dropped_total), а запрос не ждет.
+
+Настройка:
+    LOG_LEVEL=INFO                                  уровень корневого логгера
+    LOG_LEVELS=app.auth=DEBUG,sqlalchemy=WARNING    уровни отдельных логгеров
+    LOG_FORMAT=json|text                            text - для чтения глазами при разработке
+    LOG_SAMPLE_RATE=0.1                             доля записей частых успешных путей
+
+Частые успешные события (успешный вход и т.п.) логируются с extra=SAMPLED: из них
+пишется только доля LOG_SAMPLE_RATE; предупреждения и ошибки не отбрасываются никогда.
+
+RequestIdMiddleware берет X-Request-ID из запроса (или создает новый), возвращает его
+в ответе и добавляет во все записи, сделанные при обработке запроса.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from prometheus_client import Counter
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# extra для частых успешных событий: пишется доля LOG_SAMPLE_RATE
+SAMPLED = {"sampled": True}
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Записи лога, отброшенные из-за переполненной очереди"
+)
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+# Чужой X-Request-ID принимается, только если он не сломает строку лога
+_VALID_REQUEST_ID = re.compile(r"[\w.:-]{1,64}")
+
+# Атрибуты любой LogRecord; остальные пришли из extra и попадают в JSON полями
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, сообщение, request_id и поля extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "sampled":
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+class _RequestContextFilter(logging.Filter):
+    """request_id текущего запроса и выборка частых записей - в потоке, где сделана запись"""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and record.levelno < logging.WARNING:
+            if random.random() >= self.sample_rate:
+                return False
+            record.sample_rate = self.sample_rate
+        request_id = _request_id.get()
+        if request_id is not None and not hasattr(record, "request_id"):
+            record.request_id = request_id
+        return True
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler без форматирования в потоке запроса и без ожидания места в очереди"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы подставляются сейчас (объекты могут измениться), трейсбек форматирует писатель
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+_listener: Optional[QueueListener] = None
+
+def _parse_levels(value: str) -> dict:
+    levels = {}
+    for item in value.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, log_format: str = LOG_FORMAT,
+                      sample_rate: float = LOG_SAMPLE_RATE, queue_size: int = LOG_QUEUE_SIZE):
+    """Направить корневой логгер через очередь в фоновый писатель stdout (повторный вызов ничего не меняет)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(
+        JsonFormatter() if log_format == "json"
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s", defaults={"request_id": "-"})
+    )
+    handler = _NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(_RequestContextFilter(sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, logger_level in _parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = QueueListener(handler.queue, writer, respect_handler_level=True)
+    _listener.start()
+    # Дописать оставшиеся в очереди записи при выходе процесса
+    atexit.register(_listener.stop)
+
+class RequestIdMiddleware:
+    """X-Request-ID: из заголовка запроса или новый; доступен логам через contextvar и возвращается в ответе"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.lower().encode("latin-1"), request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
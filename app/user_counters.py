@@ -0,0 +1,299 @@
+"""
+Счетчики кабинетов клиента и мастера (/api/client/stats, /api/professional/stats).
+
+Строка user_counters на пользователя и сторону: бронирования (всего, завершенные,
+ожидающие), сумма завершенных, отзывы и активные услуги. Стороны не смешиваются:
+бронирование и отзыв попадают в строку клиента (side = CLIENT, сумма - расходы) и в
+строку мастера (side = PROFESSIONAL, сумма - выручка). Мастер, записавшийся к другому
+мастеру, видит эту запись только в клиентской строке, а не в своей выручке.
+
+Строки обновляются в транзакции записи тем же способом, что и снимок статистики
+админки (app.stats_snapshot): при flush ORM-сессии - по созданным, измененным
+(смена статуса в bookings, professional.update_booking_status, admin.update_booking)
+и удаленным строкам. Записи в обход ORM выравнивает пересборка пачками пользователей -
+фоновой задачей раз в USER_COUNTERS_RECONCILE_INTERVAL секунд (0 - отключить) и вручную:
+    python -m app.user_counters --batch-size 10000
+
+Пересборка идет параллельно с запросами: сначала она блокирует строки пачки, потом
+считает агрегаты и записывает их UPSERT-ом, поэтому изменение из параллельной
+транзакции либо уже видно агрегату, либо применяется к строке после пересборки.
+
+На базе, созданной до появления счетчиков, таблица пуста: первый flush создал бы строку
+с одним своим изменением (например, bookings_pending = -1 после подтверждения старого
+бронирования). Поэтому при старте приложения, до установки обработчиков flush,
+ensure_built() собирает пустую таблицу из bookings, reviews и services (таблицу прежнего
+формата, без side, - пересоздает).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from collections import defaultdict
+
+from anyio import to_thread
+from sqlalchemy import and_, case, delete, event, func, inspect, insert, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models import BookingStatus, UserRole
+from app.stats_snapshot import old_value
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10000
+RECONCILE_INTERVAL = float(os.getenv("USER_COUNTERS_RECONCILE_INTERVAL", "3600"))
+
+COUNTERS = models.UserCounter.__table__
+COLUMNS = ("bookings_total", "bookings_completed", "bookings_pending", "completed_amount", "reviews", "services_active")
+CLIENT, PROFESSIONAL = UserRole.CLIENT, UserRole.PROFESSIONAL
+_PENDING = "user_counters.pending"
+
+# Вклад одной строки: [((user_id, сторона), {колонка: значение})]; value(name) - значение атрибута
+
+def _booking(value) -> list:
+    status = value("status")
+    status = BookingStatus(status) if status is not None else None
+    counters = {
+        "bookings_total": 1,
+        "bookings_completed": int(status == BookingStatus.COMPLETED),
+        "bookings_pending": int(status == BookingStatus.PENDING),
+        "completed_amount": (value("total_price") or 0) if status == BookingStatus.COMPLETED else 0,
+    }
+    return [((value("client_id"), CLIENT), counters), ((value("professional_id"), PROFESSIONAL), counters)]
+
+def _review(value) -> list:
+    return [((value("client_id"), CLIENT), {"reviews": 1}), ((value("professional_id"), PROFESSIONAL), {"reviews": 1})]
+
+def _service(value) -> list:
+    return [((value("professional_id"), PROFESSIONAL), {"services_active": 1})] if value("is_active") else []
+
+CONTRIBUTIONS = {
+    models.Booking: _booking,
+    models.Review: _review,
+    models.Service: _service,
+}
+
+def _add(deltas: dict, contribution: list, sign: int):
+    for key, counters in contribution:
+        if key[0] is None:
+            continue
+        for name, delta in counters.items():
+            deltas[key][name] += sign * delta
+
+def _before_flush(session, flush_context, instances):
+    # Измененные и удаленные строки: прежние значения доступны только до flush
+    deltas = session.info[_PENDING] = defaultdict(lambda: defaultdict(float))
+    for obj in session.dirty:
+        contribution = CONTRIBUTIONS.get(type(obj))
+        if contribution is None or not session.is_modified(obj):
+            continue
+        _add(deltas, contribution(lambda name: getattr(obj, name)), 1)
+        _add(deltas, contribution(lambda name: old_value(obj, name)), -1)
+    for obj in session.deleted:
+        contribution = CONTRIBUTIONS.get(type(obj))
+        if contribution is not None:
+            _add(deltas, contribution(lambda name: old_value(obj, name)), -1)
+
+def _after_flush(session, flush_context):
+    deltas = session.info.pop(_PENDING, None) or defaultdict(lambda: defaultdict(float))
+    for obj in session.new:
+        contribution = CONTRIBUTIONS.get(type(obj))
+        if contribution is not None:
+            state = inspect(obj)
+            _add(deltas, contribution(lambda name: state.dict.get(name)), 1)
+    apply_deltas(session.connection(), deltas)
+
+def install():
+    """Обновлять счетчики пользователей при flush любой ORM-сессии"""
+    if not event.contains(Session, "before_flush", _before_flush):
+        event.listen(Session, "before_flush", _before_flush)
+        event.listen(Session, "after_flush", _after_flush)
+
+def _upsert(dialect: str, set_excluded):
+    """INSERT ... ON CONFLICT (user_id, side) DO UPDATE; set_excluded(excluded) -> значения колонок"""
+    statement = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(COUNTERS)
+    return statement.on_conflict_do_update(
+        index_elements=[COUNTERS.c.user_id, COUNTERS.c.side], set_=set_excluded(statement.excluded)
+    )
+
+def _row_filter(row: dict):
+    return and_(COUNTERS.c.user_id == row["user_id"], COUNTERS.c.side == row["side"])
+
+def apply_deltas(connection, deltas: dict):
+    """Прибавить изменения к строкам пользователей; отсутствующие строки создаются"""
+    # Порядок строк постоянный: параллельные транзакции блокируют строки в одном порядке
+    rows = [
+        {"user_id": user_id, "side": side, **{
+            name: counters.get(name, 0) if name == "completed_amount" else int(counters.get(name, 0))
+            for name in COLUMNS
+        }}
+        for (user_id, side), counters in sorted(deltas.items(), key=lambda item: (item[0][0], item[0][1].value))
+        if any(counters.values())
+    ]
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        connection.execute(
+            _upsert(dialect, lambda excluded: {name: COUNTERS.c[name] + excluded[name] for name in COLUMNS}), rows
+        )
+        return
+    for row in rows:
+        result = connection.execute(
+            update(COUNTERS).where(_row_filter(row)).values(**{name: COUNTERS.c[name] + row[name] for name in COLUMNS})
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(COUNTERS), row)
+
+def counters_for(db: Session, user_id: int, side: UserRole) -> dict:
+    """Счетчики пользователя на одной стороне (CLIENT или PROFESSIONAL) одним запросом; нули, если строки нет"""
+    row = db.execute(select(COUNTERS).where(COUNTERS.c.user_id == user_id, COUNTERS.c.side == side)).first()
+    return {name: (getattr(row, name) if row is not None else 0) for name in COLUMNS}
+
+def _aggregates(first_id: int = None, last_id: int = None):
+    """Счетчики пользователей с id в [first_id, last_id] по сторонам одним сгруппированным запросом"""
+    bookings, reviews, services = models.Booking.__table__, models.Review.__table__, models.Service.__table__
+
+    def in_range(column):
+        conditions = []
+        if first_id is not None:
+            conditions.append(column >= first_id)
+        if last_id is not None:
+            conditions.append(column <= last_id)
+        return conditions
+
+    def side_of(side):
+        return literal(side, COUNTERS.c.side.type)
+
+    completed = bookings.c.status == BookingStatus.COMPLETED
+    parts = []
+    for user_column, side in ((bookings.c.client_id, CLIENT), (bookings.c.professional_id, PROFESSIONAL)):
+        parts.append(select(
+            user_column.label("user_id"),
+            side_of(side).label("side"),
+            func.count().label("bookings_total"),
+            func.sum(case((completed, 1), else_=0)).label("bookings_completed"),
+            func.sum(case((bookings.c.status == BookingStatus.PENDING, 1), else_=0)).label("bookings_pending"),
+            func.sum(case((completed, bookings.c.total_price), else_=0.0)).label("completed_amount"),
+            literal(0).label("reviews"),
+            literal(0).label("services_active"),
+        ).where(*in_range(user_column)).group_by(user_column))
+    for user_column, side in ((reviews.c.client_id, CLIENT), (reviews.c.professional_id, PROFESSIONAL)):
+        parts.append(select(
+            user_column, side_of(side), literal(0), literal(0), literal(0), literal(0.0), func.count(), literal(0)
+        ).where(*in_range(user_column)).group_by(user_column))
+    parts.append(select(
+        services.c.professional_id, side_of(PROFESSIONAL),
+        literal(0), literal(0), literal(0), literal(0.0), literal(0), func.count()
+    ).where(services.c.is_active == True, *in_range(services.c.professional_id)).group_by(services.c.professional_id))
+
+    combined = union_all(*parts).subquery()
+    # WHERE true: без него SQLite не отличает ON CONFLICT от продолжения SELECT
+    return select(
+        combined.c.user_id, combined.c.side, *[func.sum(combined.c[name]) for name in COLUMNS]
+    ).where(literal(True)).group_by(combined.c.user_id, combined.c.side)
+
+def rebuild_range(connection, first_id: int = None, last_id: int = None):
+    """Пересобрать строки пользователей с id в [first_id, last_id] (без границ - все)"""
+    in_range = []
+    if first_id is not None:
+        in_range.append(COUNTERS.c.user_id >= first_id)
+    if last_id is not None:
+        in_range.append(COUNTERS.c.user_id <= last_id)
+
+    # Обнуление блокирует строки пачки (в SQLite - всю базу на запись) до commit: UPSERT
+    # параллельных транзакций ждет пересборки, а их уже записанные изменения видны агрегату ниже
+    connection.execute(update(COUNTERS).where(*in_range).values(**{name: 0 for name in COLUMNS}))
+    aggregates = _aggregates(first_id, last_id)
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        connection.execute(_upsert(dialect, lambda excluded: {name: excluded[name] for name in COLUMNS}).from_select(
+            ["user_id", "side", *COLUMNS], aggregates
+        ))
+    else:
+        connection.execute(delete(COUNTERS).where(*in_range))
+        connection.execute(insert(COUNTERS).from_select(["user_id", "side", *COLUMNS], aggregates))
+    # Строки, которых нет в агрегате (удаленные бронирования, отзывы, услуги), остались нулевыми
+    connection.execute(delete(COUNTERS).where(*in_range, *[COUNTERS.c[name] == 0 for name in COLUMNS]))
+
+def rebuild(engine, batch_size: int = BATCH_SIZE, progress=None) -> int:
+    """Пересобрать счетчики всех пользователей пачками по batch_size id, каждая - своей транзакцией"""
+    with engine.connect() as connection:
+        last = connection.execute(select(func.max(models.User.__table__.c.id))).scalar()
+    with engine.begin() as connection:
+        # Строки удаленных пользователей
+        connection.execute(delete(COUNTERS).where(COUNTERS.c.user_id > (last or 0)))
+    batches = 0
+    for first_id in range(1, (last or 0) + 1, batch_size):
+        last_id = first_id + batch_size - 1
+        with engine.begin() as connection:
+            rebuild_range(connection, first_id, last_id)
+        batches += 1
+        if progress:
+            progress(first_id, min(last_id, last))
+    return batches
+
+def _built(connection) -> bool:
+    return connection.execute(select(COUNTERS.c.user_id).limit(1)).first() is not None
+
+def _recreate_outdated(engine):
+    # Таблица прежнего формата (одна строка на пользователя, без side) - производные данные
+    columns = {column["name"] for column in inspect(engine).get_columns(COUNTERS.name)}
+    if columns and "side" not in columns:
+        logger.info("Таблица %s прежнего формата пересоздается", COUNTERS.name)
+        COUNTERS.drop(engine, checkfirst=True)
+    COUNTERS.create(engine, checkfirst=True)
+
+def ensure_built(engine) -> bool:
+    """Собрать счетчики всех пользователей одной транзакцией, если таблица пуста; True - если собирались"""
+    try:
+        _recreate_outdated(engine)
+        with engine.begin() as connection:
+            if _built(connection):
+                return False
+            rebuild_range(connection)
+    except DBAPIError:
+        # Одновременно стартующие воркеры: таблицу уже собрал другой
+        with engine.connect() as connection:
+            if _built(connection):
+                return False
+        raise
+    logger.info("Счетчики кабинетов собраны из bookings, reviews и services")
+    return True
+
+async def reconcile_periodically(engine, interval: float = RECONCILE_INTERVAL):
+    """Фоновая задача: пересобирать счетчики раз в interval секунд"""
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await to_thread.run_sync(rebuild, engine)
+        except Exception:
+            logger.exception("Сверка счетчиков кабинетов не удалась")
+
+def main(argv=None) -> int:
+    from app.database import DATABASE_URL, Base
+    from sqlalchemy import create_engine
+
+    parser = argparse.ArgumentParser(description="Пересборка счетчиков кабинетов пользователей")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine, tables=[COUNTERS])
+    try:
+        _recreate_outdated(engine)
+        batches = rebuild(engine, args.batch_size, progress=lambda first, last: print(f"  пользователи {first} - {last}"))
+    except Exception as e:
+        print(f"[ERROR] Ошибка: {e}")
+        return 1
+    print(f"[OK] Счетчики пересобраны, пачек: {batches}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
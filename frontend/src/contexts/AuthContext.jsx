@@ -1,6 +1,6 @@
 import { createContext, useState, useContext, useEffect, useCallback } from 'react'
 import axios from 'axios'
-import api from '../services/api'
+import api, { onTokensChanged } from '../services/api'
 
 const AuthContext = createContext()
 
@@ -18,13 +18,28 @@ export const AuthProvider = ({ children }) => {
   const [token, setToken] = useState(localStorage.getItem('token'))
 
   const logout = useCallback(() => {
+    const refreshToken = localStorage.getItem('refreshToken')
+    if (refreshToken) {
+      // Отзываем вход на сервере; ответ не ждем
+      axios.post('/api/auth/logout', { refresh_token: refreshToken }).catch(() => {})
+    }
     setToken(null)
     setUser(null)
     localStorage.removeItem('token')
+    localStorage.removeItem('refreshToken')
     localStorage.removeItem('user')
     delete api.defaults.headers.common['Authorization']
   }, [])
 
+  // Токены, обновленные перехватчиком api (обмен refresh-токена) или другой вкладкой
+  useEffect(() => onTokensChanged((accessToken) => {
+    setToken(accessToken)
+    if (!accessToken) {
+      setUser(null)
+      localStorage.removeItem('user')
+    }
+  }), [])
+
   const fetchUser = useCallback(async () => {
     try {
       const response = await api.get('/auth/me')
@@ -85,13 +100,16 @@ export const AuthProvider = ({ children }) => {
         }
       )
       
-      const { access_token } = response.data
+      const { access_token, refresh_token } = response.data
       if (!access_token) {
         throw new Error('No access token received')
       }
       
       setToken(access_token)
       localStorage.setItem('token', access_token)
+      if (refresh_token) {
+        localStorage.setItem('refreshToken', refresh_token)
+      }
       api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`
       
       // Загружаем данные пользователя и ждем завершения
@@ -23,6 +23,98 @@ if (token) {
   api.defaults.headers.common['Authorization'] = `Bearer ${token}`
 }
 
+// Access-токен живет недолго: при 401 обмениваем refresh-токен на новую пару и повторяем запрос.
+// Повторный обмен того же refresh-токена сервер считает кражей и отзывает вход, поэтому:
+// одновременные 401 вкладки ждут один обмен, а между вкладками обмен идет под Web Lock -
+// вкладка, получившая блокировку второй, берет уже сохраненную первой пару из localStorage.
+const REFRESH_LOCK = 'auth-refresh'
+let refreshing = null
+const tokenListeners = new Set()
+
+// Подписка на смену access-токена (null - вход завершен); AuthContext держит по ней свое состояние
+export const onTokensChanged = (listener) => {
+  tokenListeners.add(listener)
+  return () => tokenListeners.delete(listener)
+}
+
+const notifyTokens = (accessToken) => {
+  if (accessToken) {
+    api.defaults.headers.common['Authorization'] = `Bearer ${accessToken}`
+  } else {
+    delete api.defaults.headers.common['Authorization']
+  }
+  tokenListeners.forEach(listener => listener(accessToken))
+}
+
+const withTabLock = (callback) => (
+  typeof navigator !== 'undefined' && navigator.locks
+    ? navigator.locks.request(REFRESH_LOCK, callback)
+    : callback()
+)
+
+const rotateTokens = async (staleRefreshToken) => {
+  const refreshToken = localStorage.getItem('refreshToken')
+  if (!refreshToken) {
+    throw new Error('Not authenticated')
+  }
+  if (refreshToken !== staleRefreshToken) {
+    // Другая вкладка уже обменяла токен, пока мы ждали блокировку
+    return localStorage.getItem('token')
+  }
+  const { data } = await axios.post('/api/auth/refresh', { refresh_token: refreshToken })
+  localStorage.setItem('token', data.access_token)
+  localStorage.setItem('refreshToken', data.refresh_token)
+  return data.access_token
+}
+
+const refreshAccessToken = (refreshToken) => {
+  refreshing = refreshing || withTabLock(() => rotateTokens(refreshToken))
+    .then(accessToken => {
+      notifyTokens(accessToken)
+      return accessToken
+    })
+    .finally(() => {
+      refreshing = null
+    })
+  return refreshing
+}
+
+// Другие вкладки: новый токен после их обмена или выход (token удален)
+if (typeof window !== 'undefined') {
+  window.addEventListener('storage', (event) => {
+    if (event.key === 'token' || event.key === null) {
+      notifyTokens(localStorage.getItem('token'))
+    }
+  })
+}
+
+api.interceptors.response.use(
+  response => response,
+  async error => {
+    const original = error.config
+    const refreshToken = localStorage.getItem('refreshToken')
+    const url = original?.url || ''
+    if (error.response?.status !== 401 || !refreshToken || original._retried ||
+        url.includes('/auth/login') || url.includes('/auth/refresh') || url.includes('/auth/logout')) {
+      return Promise.reject(error)
+    }
+    original._retried = true
+    try {
+      const accessToken = await refreshAccessToken(refreshToken)
+      original.headers['Authorization'] = `Bearer ${accessToken}`
+      return api(original)
+    } catch (refreshError) {
+      if (refreshError.response?.status === 401) {
+        // Вход отозван или истек: завершаем его во всех вкладках
+        localStorage.removeItem('token')
+        localStorage.removeItem('refreshToken')
+        notifyTokens(null)
+      }
+      return Promise.reject(error)
+    }
+  }
+)
+
 // Перехватчик для использования мок-данных
 // В production всегда используем мок-данные
 const isProduction = import.meta.env.MODE === 'production' || 